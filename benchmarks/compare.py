@@ -0,0 +1,63 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def load_results(path: Path) -> dict[tuple, dict]:
+    """Load a results file keyed by (size, transport, operation)."""
+    report = json.loads(path.read_text())
+    return {(r["size"], r["transport"], r["operation"]): r for r in report["results"]}
+
+
+def compare(baseline: dict[tuple, dict], current: dict[tuple, dict], metric: str, threshold: float) -> list[dict]:
+    """Compare a latency metric between two result sets.
+
+    Args:
+        baseline: Baseline results keyed by (size, transport, operation)
+        current: Current results keyed the same way
+        metric: Latency field to compare, e.g. "p95_ms"
+        threshold: Relative slowdown above which a row counts as a regression
+
+    Returns:
+        One row per operation present in both sets, with the relative change
+        and whether it regressed
+    """
+    rows = []
+    for key in sorted(baseline.keys() & current.keys()):
+        before = baseline[key][metric]
+        after = current[key][metric]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            "size": key[0], "transport": key[1], "operation": key[2],
+            "before": before, "after": after, "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--metric", default="p95_ms", help="Latency metric to compare (default: p95_ms)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown (default: 0.2)")
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.current), args.metric, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['size']:>7} {row['transport']:<9} {row['operation']:<34} "
+              f"{row['before']:>10.3f} -> {row['after']:>10.3f} ms  {row['change']:+7.1%}  {flag}")
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Concurrent-client load test for the preferences MCP server.
+
+Starts the server with the HTTP transport (or targets an existing one) and
+drives it with an increasing number of concurrent client sessions, each
+issuing a mix of resource reads, tool calls and prompt requests for a fixed
+duration. Throughput should grow with the number of clients until the
+worker pool is saturated, rather than flatlining at the single-client rate.
+
+Usage:
+    python -m benchmarks.load_test --concurrency 1,2,4,8,16 --duration 5 --processes 4
+    python -m benchmarks.load_test --url http://localhost:8000/mcp
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from fastmcp import Client
+
+
+# Request mix issued by every simulated client, in order.
+REQUEST_MIX = [
+    ("resource", "preferences://catalog", None),
+    ("resource", "preferences://guide/style", None),
+    ("resource", "preferences://devcontainer/ubuntu-python-uv/dockerfile", None),
+    ("tool", "search_preferences", {"query": "python"}),
+    ("tool", "list_all_preferences", {}),
+    ("prompt", "coding_style_guidelines", None),
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Return the pct-th percentile of a list of values (nearest rank).
+
+    Args:
+        values: Sample values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def issue(client: Client, kind: str, target: str, args):
+    """Issue a single request of the given kind."""
+    if kind == "resource":
+        await client.read_resource(target)
+    elif kind == "tool":
+        await client.call_tool(target, args)
+    else:
+        await client.get_prompt(target, args)
+
+
+async def run_client(url: str, deadline: float, latencies: list[float], errors: list[str]):
+    """Issue the request mix in a loop until the deadline passes."""
+    async with Client(url) as client:
+        i = 0
+        while time.perf_counter() < deadline:
+            kind, target, args = REQUEST_MIX[i % len(REQUEST_MIX)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                await issue(client, kind, target, args)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{target}: {e}")
+
+
+async def _run_clients(url: str, clients: int, duration: float) -> tuple[list[float], list[str]]:
+    latencies: list[float] = []
+    errors: list[str] = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(run_client(url, deadline, latencies, errors) for _ in range(clients)))
+    return latencies, errors
+
+
+def _run_clients_in_process(url: str, clients: int, duration: float) -> tuple[list[float], list[str]]:
+    return asyncio.run(_run_clients(url, clients, duration))
+
+
+def run_level(url: str, concurrency: int, duration: float, processes: int = 1) -> dict:
+    """Run one load level and summarise it.
+
+    Client sessions are spread over several processes so that the load
+    generator itself does not become the bottleneck.
+
+    Args:
+        url: MCP endpoint URL
+        concurrency: Number of concurrent client sessions
+        duration: Seconds to run for
+        processes: Number of client processes
+
+    Returns:
+        Dictionary with request counts, throughput and latency percentiles
+    """
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    latencies: list[float] = []
+    errors: list[str] = []
+    start = time.perf_counter()
+    if processes == 1:
+        latencies, errors = _run_clients_in_process(url, concurrency, duration)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for part_latencies, part_errors in pool.map(_run_clients_in_process, [url] * processes, shares,
+                                                        [duration] * processes):
+                latencies.extend(part_latencies)
+                errors.extend(part_errors)
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def free_port() -> int:
+    """Return a free TCP port on localhost."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def http_server(repo_path: str = None, extra_args: list[str] = None, startup_timeout: float = 60):
+    """Run the server with the HTTP transport in a subprocess.
+
+    Args:
+        repo_path: Value for REPO_PATH, or None to use the default
+        extra_args: Additional command line arguments for the server
+        startup_timeout: Seconds to wait for the server to accept connections
+
+    Yields:
+        The MCP endpoint URL
+    """
+    port = free_port()
+    env = dict(os.environ)
+    if repo_path:
+        env["REPO_PATH"] = repo_path
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mcp_server.server", "--transport", "http",
+         "--host", "127.0.0.1", "--port", str(port), *(extra_args or [])],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Server did not start within {startup_timeout} seconds")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run_levels(url: str, levels: list[int], duration: float, processes: int) -> list[dict]:
+    """Run every load level in turn and print each summary as a JSON line."""
+    results = []
+    for concurrency in levels:
+        result = run_level(url, concurrency, duration, processes)
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Load test the preferences MCP server over HTTP")
+    parser.add_argument("--url", help="MCP endpoint of a running server (default: start one)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per load level")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Client processes to spread sessions over (default: CPU count)")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    if args.url:
+        run_levels(args.url, levels, args.duration, args.processes)
+    else:
+        with http_server() as url:
+            run_levels(url, levels, args.duration, args.processes)
+
+
+if __name__ == "__main__":
+    main()
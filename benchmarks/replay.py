@@ -0,0 +1,245 @@
+"""Replay a recorded traffic trace against the preferences MCP server.
+
+Re-issues the requests of a trace written by the server's record mode
+(--record) in their original order and at their original pace, sped up by
+--rate, over --concurrency client sessions. Each request is held back until
+its scheduled time and until a session is free, so a server that cannot
+keep up shows as schedule lag rather than as a lower request rate.
+
+Reports latency percentiles, errors and error rates per operation, next to
+the latencies recorded in the trace, plus overall throughput and schedule
+lag. Results are written in the format of benchmarks.run, so two replays
+of the same trace can be compared with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.replay traffic.jsonl --rate 4 --concurrency 16
+    python -m benchmarks.replay traffic.jsonl --url http://localhost:8000/mcp --rate 0 --output after.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from fastmcp import Client
+
+from .load_test import http_server, issue, percentile
+from .run import environment
+
+
+def load_trace(path: Path) -> list[dict]:
+    """Load a trace, ordered by arrival time.
+
+    Args:
+        path: JSONL trace written in record mode
+
+    Returns:
+        Request records
+
+    Raises:
+        ValueError: If a line is not a request record
+    """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if record["kind"] not in ("tool", "resource", "prompt") or not isinstance(record["t"], (int, float)):
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"{path}:{number}: not a request record")
+            records.append(record)
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+def wait_until_ready(url: str, timeout: float = 1800):
+    """Wait for the server behind an MCP endpoint to finish warming up.
+
+    Replaying against a server that is still scanning the repository would
+    measure its warm-up rather than the traffic.
+
+    Args:
+        url: MCP endpoint URL, ending in /mcp
+        timeout: Seconds to wait
+
+    Raises:
+        RuntimeError: If /ready does not answer 200 in time
+    """
+    ready = url.rsplit("/", 1)[0] + "/ready"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(ready, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{ready} did not report ready within {timeout} seconds")
+        time.sleep(0.2)
+
+
+def operation(record: dict) -> str:
+    """Return the label a request is reported under, as in benchmarks.run."""
+    name = record.get("handler") or record["name"]
+    return f"prompt:{name}" if record["kind"] == "prompt" else name
+
+
+async def replay(client_target, records: list[dict], rate: float, concurrency: int) -> tuple[list[dict], dict]:
+    """Replay requests and measure them.
+
+    Args:
+        client_target: MCP endpoint URL or in-process server
+        records: Request records ordered by arrival time
+        rate: Speed-up over the recorded pace; 0 issues requests as fast as
+            the sessions allow
+        concurrency: Number of client sessions, and so of requests in flight
+
+    Returns:
+        Per-operation result rows and an overall summary
+    """
+    latencies: dict[str, list[float]] = defaultdict(list)
+    recorded: dict[str, list[float]] = defaultdict(list)
+    counts: Counter = Counter()
+    errors: Counter = Counter()
+    messages: Counter = Counter()
+    lags: list[float] = []
+    delays: list[float] = []
+
+    async def send(client: Client, record: dict, scheduled: float):
+        label = operation(record)
+        started = time.perf_counter()
+        lags.append(started - scheduled)
+        try:
+            await issue(client, record["kind"], record["name"], record.get("args"))
+            latencies[label].append(time.perf_counter() - started)
+        except Exception as e:
+            errors[label] += 1
+            messages[f"{label}: {type(e).__name__}"] += 1
+        finally:
+            delays.append(time.perf_counter() - scheduled)
+            sessions.put_nowait(client)
+
+    clients = [Client(client_target) for _ in range(concurrency)]
+    for client in clients:
+        await client.__aenter__()
+    try:
+        sessions: asyncio.Queue = asyncio.Queue()
+        for client in clients:
+            sessions.put_nowait(client)
+
+        tasks = []
+        first = records[0]["t"] if records else 0.0
+        start = time.perf_counter()
+        for record in records:
+            label = operation(record)
+            counts[label] += 1
+            if "ms" in record and "error" not in record:
+                recorded[label].append(record["ms"] / 1000)
+            scheduled = start + (record["t"] - first) / rate if rate else time.perf_counter()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            client = await sessions.get()
+            tasks.append(asyncio.create_task(send(client, record, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+
+    rows = []
+    for label in sorted(counts):
+        values = latencies[label]
+        rows.append({
+            "operation": label,
+            "count": counts[label],
+            "errors": errors[label],
+            "error_rate": round(errors[label] / counts[label], 4),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "recorded_p50_ms": round(percentile(recorded[label], 50) * 1000, 3),
+            "recorded_p95_ms": round(percentile(recorded[label], 95) * 1000, 3),
+            "throughput_rps": round(counts[label] / elapsed, 1) if elapsed else 0.0
+        })
+
+    total = len(records)
+    span = records[-1]["t"] - first if records else 0.0
+    summary = {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "target_rps": round(total / span * rate, 1) if span and rate else None,
+        # Time from a request's scheduled start to its issue, and to its response.
+        "lag_p50_ms": round(percentile(lags, 50) * 1000, 3),
+        "lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+        "scheduled_p99_ms": round(percentile(delays, 99) * 1000, 3),
+        "top_errors": dict(messages.most_common(10))
+    }
+    return rows, summary
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic trace against the preferences MCP server")
+    parser.add_argument("trace", type=Path, help="JSONL trace written with mcp_server.server --record")
+    parser.add_argument("--url", help="MCP endpoint of a running server (default: start one)")
+    parser.add_argument("--repo", help="Repository for the server started when --url is not given (default: REPO_PATH)")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="Multiple of the recorded request rate; 0 for as fast as possible (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client sessions, and so requests in flight")
+    parser.add_argument("--limit", type=int, help="Replay only the first LIMIT requests")
+    parser.add_argument("--output", type=Path, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    if args.rate < 0:
+        parser.error("--rate must not be negative")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    try:
+        records = load_trace(args.trace)[:args.limit]
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    def run(url: str) -> tuple[list[dict], dict]:
+        wait_until_ready(url)
+        return asyncio.run(replay(url, records, args.rate, args.concurrency))
+
+    if args.url:
+        rows, summary = run(args.url)
+    else:
+        with http_server(repo_path=args.repo) as url:
+            rows, summary = run(url)
+
+    for row in rows:
+        print(json.dumps(row), file=sys.stderr, flush=True)
+    print(json.dumps(summary), file=sys.stderr, flush=True)
+
+    parameters = {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k != "output"}
+    report = {
+        "environment": environment(),
+        "parameters": parameters,
+        # Keyed like benchmarks.run results, with the trace in place of the repository size.
+        "results": [{"size": args.trace.name, "transport": "replay", **row} for row in rows],
+        "summary": summary
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
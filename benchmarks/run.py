@@ -0,0 +1,163 @@
+"""Reproducible latency and throughput benchmarks for the preferences MCP server.
+
+For each repository size, generates (or reuses) a synthetic repository,
+serves it through the in-process FastMCP client and/or the HTTP transport,
+and measures the main tools, the file resource and every prompt. Results are
+written as JSON so runs can be compared with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.run --sizes 10,1000 --output results.json
+    python -m benchmarks.run --sizes 50000 --transports http --iterations 50
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastmcp import Client
+
+from .load_test import http_server, issue, percentile
+from .synthetic import generate_repository, template_name
+
+
+def operations() -> list[tuple[str, str, str, dict]]:
+    """Return the benchmarked operations as (label, kind, target, arguments)."""
+    first, second = template_name(0), template_name(1)
+    return [
+        ("search_preferences", "tool", "search_preferences", {"query": "python"}),
+        ("list_all_preferences", "tool", "list_all_preferences", {}),
+        ("compare_devcontainers", "tool", "compare_devcontainers", {"name1": first, "name2": second}),
+        ("get_file_content", "resource", f"preferences://files/templates/devcontainers/{first}/Dockerfile", None),
+        ("prompt:coding_style_guidelines", "prompt", "coding_style_guidelines", None),
+        ("prompt:devcontainer_preferences", "prompt", "devcontainer_preferences", None),
+        ("prompt:repository_guide", "prompt", "repository_guide", None),
+    ]
+
+
+async def measure(client: Client, kind: str, target: str, args, iterations: int, concurrency: int,
+                  warmup: int = 3) -> dict:
+    """Measure one operation.
+
+    Args:
+        client: Connected client
+        kind: "tool", "resource" or "prompt"
+        target: Tool name, resource URI or prompt name
+        args: Tool arguments
+        iterations: Number of measured requests
+        concurrency: Number of requests kept in flight
+        warmup: Number of unmeasured requests issued first
+
+    Returns:
+        Dictionary with count, errors, latency percentiles and throughput
+    """
+    for _ in range(warmup):
+        await issue(client, kind, target, args)
+
+    latencies: list[float] = []
+    errors = 0
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                await issue(client, kind, target, args)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run_suite(client_target, size: int, transport: str, iterations: int, concurrency: int) -> list[dict]:
+    """Run every operation against one server and return the result rows."""
+    rows = []
+    async with Client(client_target) as client:
+        for label, kind, target, args in operations():
+            result = await measure(client, kind, target, args, iterations, concurrency)
+            row = {"size": size, "transport": transport, "operation": label, **result}
+            print(json.dumps(row), file=sys.stderr, flush=True)
+            rows.append(row)
+    return rows
+
+
+def environment() -> dict:
+    """Describe the machine and revision the benchmark ran on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the preferences MCP server on synthetic repositories")
+    parser.add_argument("--sizes", default="10,1000,50000", help="Comma-separated template counts")
+    parser.add_argument("--transports", default="inprocess,http", help="Comma-separated: inprocess, http")
+    parser.add_argument("--iterations", type=int, default=200, help="Measured requests per operation")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests kept in flight per operation")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic repositories")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "preferences-bench",
+                        help="Where synthetic repositories are generated and reused")
+    parser.add_argument("--output", type=Path, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    transports = args.transports.split(",")
+    report = {"environment": environment(), "parameters": vars(args) | {"workdir": str(args.workdir)}, "results": []}
+    report["parameters"].pop("output")
+
+    for size in sizes:
+        start = time.perf_counter()
+        repo = generate_repository(args.workdir / f"templates-{size}", max(size, 2), args.seed)
+        print(f"Repository with {size} templates ready in {time.perf_counter() - start:.1f}s: {repo}",
+              file=sys.stderr, flush=True)
+
+        if "inprocess" in transports:
+            from mcp_server.server import create_server
+
+            server = create_server(repo)
+            report["results"] += asyncio.run(run_suite(server, size, "inprocess", args.iterations, args.concurrency))
+
+        if "http" in transports:
+            with http_server(repo_path=str(repo), startup_timeout=1800) as url:
+                report["results"] += asyncio.run(run_suite(url, size, "http", args.iterations, args.concurrency))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Synthetic preference repositories for benchmarking.
+
+Generates a repository with the same layout as this one (guides at the root
+and templates under templates/devcontainers) but with an arbitrary number of
+templates. Template files have realistic sizes and vocabulary so search and
+indexing costs resemble a real repository. Generation is deterministic for a
+given template count and seed.
+
+Usage:
+    python -m benchmarks.synthetic /tmp/prefs-1k --templates 1000
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+
+# Marker written once a repository is fully generated.
+MARKER = ".synthetic.json"
+
+BASE_IMAGES = ["ubuntu:24.04", "ubuntu:22.04", "debian:bookworm", "python:3.12-slim", "node:22-bookworm"]
+APT_PACKAGES = [
+    "git", "curl", "wget", "sudo", "zsh", "vim", "less", "jq", "build-essential", "ca-certificates",
+    "openssh-client", "gnupg", "unzip", "locales", "tzdata", "postgresql-client", "redis-tools"
+]
+LANGUAGES = [
+    ("python", "uv", "python3.12"), ("python", "poetry", "python3.11"), ("node", "npm", "nodejs"),
+    ("node", "pnpm", "nodejs"), ("go", "go", "golang"), ("rust", "cargo", "rustc")
+]
+EXTENSIONS = [
+    "ms-python.python", "charliermarsh.ruff", "dbaeumer.vscode-eslint", "esbenp.prettier-vscode",
+    "golang.go", "rust-lang.rust-analyzer", "eamodio.gitlens", "ms-azuretools.vscode-docker"
+]
+WORDS = (
+    "configure the development environment so that the container matches production closely and every "
+    "contributor gets the same toolchain versions caches volumes and shell setup without manual steps"
+).split()
+
+
+def _comment_block(rng: random.Random, lines: int, prefix: str = "#") -> str:
+    return "\n".join(f"{prefix} " + " ".join(rng.choices(WORDS, k=rng.randint(6, 14))) + "." for _ in range(lines))
+
+
+def _dockerfile(rng: random.Random, name: str, language: tuple[str, str, str]) -> str:
+    lang, tool, package = language
+    packages = sorted(set(rng.sample(APT_PACKAGES, rng.randint(5, 10)) + [package]))
+    return f"""#
+# VSCode devcontainer for development with: {lang} + {tool} ({name})
+#
+{_comment_block(rng, rng.randint(4, 10))}
+ARG BASE_IMAGE={rng.choice(BASE_IMAGES)}
+FROM ${{BASE_IMAGE}}
+
+ARG USERNAME=dev
+ARG USER_UID=1000
+ARG USER_GID=$USER_UID
+
+ENV DEBIAN_FRONTEND=noninteractive
+RUN apt-get update && apt-get install -y --no-install-recommends \\
+    {" ".join(packages)} \\
+    && rm -rf /var/lib/apt/lists/*
+
+RUN groupadd --gid $USER_GID $USERNAME \\
+    && useradd --uid $USER_UID --gid $USER_GID -m $USERNAME -s /bin/zsh \\
+    && echo "$USERNAME ALL=(root) NOPASSWD:ALL" > /etc/sudoers.d/$USERNAME
+
+{_comment_block(rng, rng.randint(2, 6))}
+RUN curl -fsSL https://example.com/install-{tool}.sh | sh
+USER $USERNAME
+WORKDIR /workspace
+"""
+
+
+def _devcontainer_json(rng: random.Random, name: str, language: tuple[str, str, str], compose: bool) -> str:
+    config = {
+        "name": name,
+        "remoteUser": "dev",
+        "forwardPorts": sorted(rng.sample([3000, 5173, 8000, 8080, 443, 5432], rng.randint(1, 3))),
+        "customizations": {
+            "vscode": {
+                "extensions": sorted(rng.sample(EXTENSIONS, rng.randint(2, 5))),
+                "settings": {"editor.rulers": [120], "files.trimTrailingWhitespace": True}
+            }
+        },
+        "postCreateCommand": f"{language[1]} install"
+    }
+    if compose:
+        config.update({"dockerComposeFile": "docker-compose.yml", "service": "dev", "workspaceFolder": "/workspace"})
+    else:
+        config["build"] = {"dockerfile": "Dockerfile"}
+    return json.dumps(config, indent=4) + "\n"
+
+
+def _compose(rng: random.Random, name: str) -> str:
+    return f"""services:
+  dev:
+    build:
+      context: .
+      dockerfile: Dockerfile
+    container_name: {name}
+    volumes:
+      - ..:/workspace:cached
+      - cache-{name}:/home/dev/.cache
+    environment:
+      - TZ=Europe/London
+    command: sleep infinity
+{_comment_block(rng, rng.randint(1, 4), prefix="  #")}
+
+volumes:
+  cache-{name}:
+"""
+
+
+def _guide(rng: random.Random, title: str, sections: int) -> str:
+    parts = [f"# {title}\n"]
+    for i in range(sections):
+        parts.append(f"## Section {i + 1}\n\n" + _comment_block(rng, rng.randint(3, 8), prefix="-") + "\n")
+    return "\n".join(parts)
+
+
+def template_name(index: int) -> str:
+    """Return the name of the index-th synthetic template."""
+    return f"tpl-{index:05d}"
+
+
+def generate_repository(path: Path, templates: int, seed: int = 0) -> Path:
+    """Generate a synthetic preferences repository.
+
+    Existing repositories generated with the same parameters are reused.
+
+    Args:
+        path: Directory to generate into
+        templates: Number of devcontainer templates
+        seed: Random seed
+
+    Returns:
+        Resolved path of the repository
+    """
+    path = path.resolve()
+    params = {"templates": templates, "seed": seed}
+    marker = path / MARKER
+    if marker.exists() and json.loads(marker.read_text()) == params:
+        return path
+
+    rng = random.Random(seed)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "STYLE.md").write_text(_guide(rng, "Coding Style Guide", 12))
+    (path / "CLAUDE.md").write_text(_guide(rng, "Repository Guide", 6))
+    (path / "README.md").write_text(_guide(rng, "Preferences", 8))
+
+    for index in range(templates):
+        name = template_name(index)
+        language = rng.choice(LANGUAGES)
+        compose = rng.random() < 0.6
+        directory = path / "templates" / "devcontainers" / name
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "Dockerfile").write_text(_dockerfile(rng, name, language))
+        (directory / "devcontainer.json").write_text(_devcontainer_json(rng, name, language, compose))
+        if compose:
+            (directory / "docker-compose.yml").write_text(_compose(rng, name))
+        if rng.random() < 0.2:
+            port = rng.choice([3000, 8000])
+            (directory / "Caddyfile").write_text(f":443 {{\n    reverse_proxy localhost:{port}\n}}\n")
+
+    marker.write_text(json.dumps(params))
+    return path
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic preferences repository")
+    parser.add_argument("path", type=Path, help="Directory to generate into")
+    parser.add_argument("--templates", type=int, default=1000, help="Number of devcontainer templates")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    print(generate_repository(args.path, args.templates, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Request coalescing and per-handler concurrency limits.
+
+When many sessions start at once they tend to make the same calls within a
+few milliseconds of each other. Identical requests (same handler, same
+arguments, same credentials) that arrive while one of them is still being
+served wait for that one and share its result instead of repeating the work.
+Handlers whose result depends on who calls them, like the admin-only
+get_profile or fetch_resource, which reads through the caller's session, are
+never coalesced.
+
+Requests that do need to run are admitted per handler: at most a fixed
+number run concurrently, a bounded number wait for a slot, and anything
+beyond that is rejected at once with ServerBusyError rather than queueing
+up behind a slow disk. The default limits apply to every handler and can be
+overridden per handler:
+
+    HANDLER_CONCURRENCY=4 HANDLER_QUEUE_DEPTH=16
+    HANDLER_LIMITS="search_preferences=2:8,preferences://files/{filepath*}{?offset,length,cursor}=4:32"
+
+Handlers are named by their metrics label: the tool or prompt name, or the
+resource URI template. Coalesced and rejected requests, and the running and
+queued requests of each handler, are reported through /metrics.
+
+All state lives on the event loop thread, so no locks are needed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from typing import Any, Awaitable, Callable, Container, Hashable, Optional
+
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .executor import ServerBusyError
+from .metrics import HandlerMetrics, MetricsRegistry, current_handler
+
+
+# Default number of requests a handler runs at the same time.
+DEFAULT_CONCURRENCY = 8
+
+# Default number of requests allowed to wait for one of a handler's slots.
+DEFAULT_QUEUE_DEPTH = 32
+
+# Handlers whose requests are never coalesced, because their result depends
+# on the caller's rights or session.
+UNSHARED_HANDLERS = frozenset({"get_profile", "fetch_resource"})
+
+# Commas that separate limits, as opposed to those inside the braces of a
+# URI template such as {?offset,length,cursor}.
+_LIMIT_SEPARATOR = re.compile(r",(?![^{]*\})")
+
+
+def parse_limits(spec: str) -> dict[str, tuple[int, int]]:
+    """Parse per-handler limits of the form "name=concurrency:queue,...".
+
+    Names may contain "=", ":" and, within braces, "," themselves (URI
+    templates do), so items are only split at commas outside braces, each
+    item at its last "=" and the limits at their ":".
+
+    Args:
+        spec: Comma-separated limits; empty for none
+
+    Returns:
+        Mapping of handler name to (concurrency, queue depth)
+
+    Raises:
+        ValueError: If an item is malformed or a limit is out of range
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in _LIMIT_SEPARATOR.split(spec))):
+        name, sep, values = item.rpartition("=")
+        concurrency, _, queue = values.partition(":")
+        try:
+            parsed = (int(concurrency), int(queue or DEFAULT_QUEUE_DEPTH))
+        except ValueError:
+            parsed = None
+        if not sep or not name or parsed is None or parsed[0] < 1 or parsed[1] < 0:
+            raise ValueError(f"Invalid handler limit '{item}'; expected name=concurrency:queue")
+        limits[name] = parsed
+    return limits
+
+
+class SingleFlight:
+    """Shares the result of a computation among identical concurrent calls."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Run fn, or wait for the call with the same key already in flight.
+
+        The computation runs in its own task, so a caller that is cancelled
+        does not cancel it for the others still waiting.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function computing the result
+
+        Returns:
+            The result, and whether it was shared from another call
+
+        Raises:
+            Whatever fn raises, for every caller sharing the call
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller went away.
+            task.exception()
+
+
+class HandlerLimiter:
+    """Concurrency slots and a bounded wait queue for one handler.
+
+    Args:
+        concurrency: Requests allowed to run at the same time
+        queue_depth: Requests allowed to wait for a slot
+        metrics: Handler metrics whose running, queued and rejected counts
+            are kept up to date
+    """
+
+    def __init__(self, concurrency: int, queue_depth: int, metrics: HandlerMetrics):
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.metrics = metrics
+        self.running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        """Take a slot, waiting for one if the queue has room.
+
+        Raises:
+            ServerBusyError: If every slot is taken and the queue is full
+        """
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+            self._publish()
+            return
+        if len(self._waiters) >= self.queue_depth:
+            self.metrics.rejected += 1
+            raise ServerBusyError("Server is busy, please retry shortly")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled.
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._publish()
+            raise
+
+    def release(self):
+        """Give a slot back, handing it straight to the longest waiter."""
+        if self._waiters:
+            # The slot stays taken; running does not change.
+            self._waiters.popleft().set_result(None)
+        else:
+            self.running -= 1
+        self._publish()
+
+    def _publish(self):
+        self.metrics.running = self.running
+        self.metrics.queued = len(self._waiters)
+
+
+class AdmissionMiddleware(Middleware):
+    """Coalesces identical requests and caps concurrency per handler.
+
+    Must be added after MetricsMiddleware, which names the handler, and
+    before middleware that attaches metadata to results, so that shared
+    results carry it too.
+
+    Args:
+        registry: Metrics registry to record admission counters in
+        concurrency: Default requests per handler running at the same time
+        queue_depth: Default requests per handler waiting for a slot
+        limits: Per-handler (concurrency, queue depth) overrides
+        unshared: Handlers whose requests are never coalesced
+    """
+
+    def __init__(self, registry: MetricsRegistry, concurrency: int = DEFAULT_CONCURRENCY,
+                 queue_depth: int = DEFAULT_QUEUE_DEPTH, limits: Optional[dict[str, tuple[int, int]]] = None,
+                 unshared: Container[str] = UNSHARED_HANDLERS):
+        self.registry = registry
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.limits = limits or {}
+        self.unshared = unshared
+        self.flights = SingleFlight()
+        self._limiters: dict[tuple[str, str], HandlerLimiter] = {}
+
+    @classmethod
+    def from_env(cls, registry: MetricsRegistry) -> "AdmissionMiddleware":
+        """Create the middleware with limits from HANDLER_CONCURRENCY, HANDLER_QUEUE_DEPTH and HANDLER_LIMITS."""
+        return cls(
+            registry,
+            int(os.getenv("HANDLER_CONCURRENCY", DEFAULT_CONCURRENCY)),
+            int(os.getenv("HANDLER_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH)),
+            parse_limits(os.getenv("HANDLER_LIMITS", ""))
+        )
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        message = context.message
+        return await self._admit(("tool", message.name), _arguments_key(message.arguments), context, call_next)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        uri = str(context.message.uri)
+        return await self._admit(("resource", uri), uri, context, call_next)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next):
+        message = context.message
+        return await self._admit(("prompt", message.name), _arguments_key(message.arguments), context, call_next)
+
+    async def _admit(self, fallback: tuple[str, str], arguments: str, context: MiddlewareContext, call_next):
+        label = current_handler.get() or fallback
+        limiter = self._limiter(label)
+
+        async def run():
+            await limiter.acquire()
+            try:
+                return await call_next(context)
+            finally:
+                limiter.release()
+
+        if label[1] in self.unshared:
+            return await run()
+        result, shared = await self.flights.do((label, arguments, _caller_key()), run)
+        if shared:
+            limiter.metrics.coalesced += 1
+        return result
+
+    def _limiter(self, label: tuple[str, str]) -> HandlerLimiter:
+        limiter = self._limiters.get(label)
+        if limiter is None:
+            concurrency, queue_depth = self.limits.get(label[1], (self.concurrency, self.queue_depth))
+            limiter = self._limiters[label] = HandlerLimiter(concurrency, queue_depth, self.registry.handler(*label))
+        return limiter
+
+    def stats(self) -> dict:
+        """Return the number of distinct requests in flight."""
+        return {"in_flight": len(self.flights)}
+
+
+def _arguments_key(arguments: Optional[dict]) -> str:
+    return json.dumps(arguments or {}, sort_keys=True, default=str)
+
+
+def _caller_key() -> str:
+    # Requests only share results with requests carrying the same
+    # credentials. The header is hashed so the token is not kept around.
+    try:
+        authorization = get_http_request().headers.get("authorization", "")
+    except RuntimeError:
+        return ""
+    return hashlib.sha256(authorization.encode()).hexdigest() if authorization else ""
@@ -0,0 +1,72 @@
+"""Batch file reads for the preferences MCP server.
+
+Lets a client fetch several files, such as a whole devcontainer template, in
+a single round trip. A batch is read as one job on the I/O executor, so a
+large batch takes a single worker instead of filling the executor's queue,
+and a failure to read one file does not fail the others. Files the catalog
+records as binary are left out of template selections without being opened.
+"""
+
+from fnmatch import fnmatch
+
+from .catalog import DEVCONTAINERS_DIR, Catalog
+from .executor import run_blocking
+from .overlay import Overlay
+
+
+# Maximum number of files returned by a single batch request.
+MAX_BATCH_FILES = 100
+
+
+def select_devcontainer_files(catalog: Catalog, name: str, pattern: str = "*") -> list[str]:
+    """Return the repository-relative paths of a devcontainer's text files matching a glob.
+
+    Args:
+        catalog: Catalog snapshot to select from
+        name: Name of the devcontainer
+        pattern: Glob matched against paths relative to the devcontainer
+
+    Returns:
+        Sorted list of paths relative to the repository root
+
+    Raises:
+        KeyError: If the devcontainer doesn't exist
+    """
+    entry = catalog.devcontainer(name)
+    if entry is None:
+        raise KeyError(name)
+    return [f"{DEVCONTAINERS_DIR}/{name}/{f.path}" for f in entry.files if not f.binary and fnmatch(f.path, pattern)]
+
+
+async def read_files(repository: Overlay, paths: list[str]) -> dict:
+    """Read several repository files in one blocking job.
+
+    Args:
+        repository: Repository roots to read from
+        paths: Paths relative to the repository root
+
+    Returns:
+        Dictionary containing:
+        - files: List of {path, content} for files that were read
+        - errors: List of {path, error} for files that could not be read
+
+    Raises:
+        ValueError: If more than MAX_BATCH_FILES paths are requested
+    """
+    if len(paths) > MAX_BATCH_FILES:
+        raise ValueError(f"Too many files requested ({len(paths)}); the limit is {MAX_BATCH_FILES}")
+
+    return await run_blocking(_read_all, repository, paths)
+
+
+def _read_all(repository: Overlay, paths: list[str]) -> dict:
+    files = []
+    errors = []
+    for path in paths:
+        try:
+            files.append({"path": path, "content": repository.read_text(path)})
+        except FileNotFoundError:
+            errors.append({"path": path, "error": f"File '{path}' not found"})
+        except (OSError, ValueError) as e:
+            errors.append({"path": path, "error": str(e)})
+    return {"files": files, "errors": errors}
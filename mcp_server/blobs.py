@@ -0,0 +1,115 @@
+"""Content-addressed store for file contents shared across the server.
+
+Many files in the repository are identical or share content with files in
+other templates. Contents are stored once per SHA-256 digest with a
+reference count, so any number of paths with the same bytes hold a single
+decoded copy, which is dropped when the last reference is released.
+Digests are interned as they are created, so every catalog entry, cache
+entry and index posting naming the same content shares one string too.
+
+The store reports how many bytes its references would take without
+deduplication, so the memory saved can be read from /health and /metrics.
+"""
+
+import hashlib
+import sys
+import threading
+from typing import Optional, Union
+
+
+def content_digest(data: Union[bytes, str]) -> str:
+    """Return the interned SHA-256 hex digest of some content.
+
+    Text is hashed as UTF-8, which for a decoded file gives the digest of
+    the file's bytes.
+
+    Args:
+        data: Raw bytes or decoded text
+
+    Returns:
+        Hex digest string
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return sys.intern(hashlib.sha256(data).hexdigest())
+
+
+class BlobStore:
+    """Reference-counted contents keyed by digest."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # digest -> [content, size in bytes, references]
+        self._blobs: dict[str, list] = {}
+        self._bytes = 0
+        self._logical_bytes = 0
+        self._references = 0
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def acquire(self, content: str, size: int, digest: Optional[str] = None) -> tuple[str, str]:
+        """Add a reference to some content, storing it if it is new.
+
+        Args:
+            content: Decoded contents
+            size: Size of the raw contents in bytes
+            digest: Digest of the contents, if already known
+
+        Returns:
+            The digest, and the stored copy of the contents to use in place
+            of the one passed in
+        """
+        if digest is None:
+            digest = content_digest(content)
+        with self._lock:
+            blob = self._blobs.get(digest)
+            if blob is None:
+                blob = self._blobs[digest] = [content, size, 0]
+                self._bytes += size
+            blob[2] += 1
+            self._references += 1
+            self._logical_bytes += size
+            return digest, blob[0]
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return stored contents, or None if nothing references them."""
+        with self._lock:
+            blob = self._blobs.get(digest)
+            return blob[0] if blob is not None else None
+
+    def release(self, digest: str):
+        """Drop a reference, freeing the contents with the last one.
+
+        Args:
+            digest: Digest returned by acquire()
+        """
+        with self._lock:
+            blob = self._blobs[digest]
+            blob[2] -= 1
+            self._references -= 1
+            self._logical_bytes -= blob[1]
+            if not blob[2]:
+                del self._blobs[digest]
+                self._bytes -= blob[1]
+
+    def stats(self) -> dict:
+        """Return the stored and deduplicated sizes.
+
+        Returns:
+            Dictionary with blobs, references, bytes (stored once per
+            digest), logical_bytes (as if every reference had its own copy)
+            and saved_bytes
+        """
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "references": self._references,
+                "bytes": self._bytes,
+                "logical_bytes": self._logical_bytes,
+                "saved_bytes": self._logical_bytes - self._bytes
+            }
+
+
+# Shared store behind the content cache.
+blob_store = BlobStore()
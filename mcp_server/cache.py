@@ -0,0 +1,206 @@
+"""Content cache for the preferences MCP server.
+
+Keeps recently served file contents in memory so repeated reads of the same
+guide or template do not hit the filesystem again. Entries are validated
+against the file's stat signature on every lookup, so edited files are never
+served stale.
+
+Contents are held in the content-addressed blob store, so files with the
+same bytes are kept in memory once and count against the budget once.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .blobs import BlobStore, blob_store, content_digest
+
+
+# Default byte budget for cached file contents (32 MiB).
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileSignature:
+    """Identity of a file's contents as seen by stat().
+
+    Attributes:
+        mtime_ns: Modification time in nanoseconds
+        size: File size in bytes
+        inode: Inode number
+    """
+
+    mtime_ns: int
+    size: int
+    inode: int
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result) -> "FileSignature":
+        """Build a signature from a stat result."""
+        return cls(st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+@dataclass
+class _Entry:
+    signature: FileSignature
+    digest: str
+    content: str
+    size: int
+
+
+class ContentCache:
+    """Byte-budgeted LRU cache of decoded file contents.
+
+    Entries are keyed by resolved path and only returned when the caller's
+    current stat signature matches the one recorded at read time. Each entry
+    holds a reference to its contents in a blob store; the budget counts
+    every distinct content once, however many paths share it.
+
+    Args:
+        max_bytes: Maximum total size of cached contents in bytes
+        store: Blob store holding the contents (default: the shared store)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, store: Optional[BlobStore] = None):
+        self.max_bytes = max_bytes
+        self.store = store if store is not None else blob_store
+        self._entries: OrderedDict[Path, _Entry] = OrderedDict()
+        # References held per digest, to count shared contents once.
+        self._digests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def read(self, path: Path, signature: FileSignature) -> str:
+        """Return the contents of a file, reading it only on a cache miss.
+
+        Args:
+            path: Resolved path to the file
+            signature: Current stat signature of the file
+
+        Returns:
+            File contents as string
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry.content
+            self.misses += 1
+
+        data = path.read_bytes()
+        return self.put(path, signature, data.decode("utf-8"), len(data), content_digest(data))
+
+    def put(self, path: Path, signature: FileSignature, content: str, size: int, digest: Optional[str] = None) -> str:
+        """Store file contents, evicting least recently used entries as needed.
+
+        Files larger than the whole budget are not cached. Contents already
+        held for another path are shared rather than stored again.
+
+        Args:
+            path: Resolved path to the file
+            signature: Stat signature the contents were read under
+            content: Decoded file contents
+            size: Size of the raw file in bytes
+            digest: Content digest, if already known
+
+        Returns:
+            The contents to use from now on: the shared copy if the same
+            bytes are already held
+        """
+        if size > self.max_bytes:
+            self.invalidate(path)
+            return content
+        digest, content = self.store.acquire(content, size, digest)
+        with self._lock:
+            self._discard(path)
+            self._entries[path] = _Entry(signature, digest, content, size)
+            self._hold(digest, size)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop(evicted)
+                self.evictions += 1
+        return content
+
+    def invalidate(self, path: Path):
+        """Drop a cached entry if present.
+
+        Args:
+            path: Resolved path to the file
+        """
+        with self._lock:
+            self._discard(path)
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            for entry in self._entries.values():
+                self._drop(entry)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache counters and current occupancy.
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries, contents
+            (distinct contents among the entries), bytes and max_bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "contents": len(self._digests),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _discard(self, path: Path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._drop(entry)
+
+    def _hold(self, digest: str, size: int):
+        held = self._digests.get(digest, 0)
+        if not held:
+            self._total_bytes += size
+        self._digests[digest] = held + 1
+
+    def _drop(self, entry: _Entry):
+        held = self._digests.pop(entry.digest) - 1
+        if held:
+            self._digests[entry.digest] = held
+        else:
+            self._total_bytes -= entry.size
+        self.store.release(entry.digest)
+
+
+_caches: dict[Path, ContentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def cache_for(repo_root: Path) -> ContentCache:
+    """Return the content cache of a repository root, creating it on first use.
+
+    Every root has a cache and budget of its own, so reads from one large
+    repository cannot evict the files of another. The budget can be tuned
+    with the CONTENT_CACHE_MAX_BYTES environment variable.
+
+    Args:
+        repo_root: Path to the repository root
+
+    Returns:
+        Content cache used by read_file_safe for files under the root
+    """
+    with _caches_lock:
+        cache = _caches.get(repo_root)
+        if cache is None:
+            cache = _caches[repo_root] = ContentCache(int(os.getenv("CONTENT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+        return cache
@@ -0,0 +1,417 @@
+"""Immutable catalog snapshots for the preferences MCP server.
+
+A Catalog describes the devcontainer templates and guides of a repository
+at one point in time: names, file lists, sizes, content hashes and whether
+each file is text or binary. Catalogs
+are never modified; when the repository changes a new catalog with the next
+generation number is built and swapped in, so a request that holds a catalog
+always sees a consistent view.
+"""
+
+import bisect
+import codecs
+import hashlib
+import re
+import sys
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Iterable, Mapping, NamedTuple, Optional, Sequence
+
+from .cache import FileSignature
+
+if TYPE_CHECKING:
+    from .repository import RepositoryTree
+
+
+# Path of the devcontainer templates relative to the repository root.
+DEVCONTAINERS_DIR = "templates/devcontainers"
+
+# Guides listed in the catalog, relative to the repository root.
+GUIDES = ("CLAUDE.md", "README.md", "STYLE.md")
+
+# Guide names accepted by preferences://guide/{name}.
+GUIDE_NAMES = {
+    "claude": "CLAUDE.md",
+    "readme": "README.md",
+    "style": "STYLE.md"
+}
+
+# Characters that separate the words of a template name, which serve as its tags.
+_TAG_SEPARATOR = re.compile(r"[-_.]+")
+
+# File types accepted by preferences://devcontainer/{name}/{file}.
+DEVCONTAINER_FILES = {
+    "config": "devcontainer.json",
+    "dockerfile": "Dockerfile",
+    "compose": "docker-compose.yml",
+    "caddyfile": "Caddyfile"
+}
+
+
+class FileInfo(NamedTuple):
+    """Content hash and classification of a file.
+
+    Attributes:
+        size: File size in bytes
+        sha256: Hex digest of the file contents
+        encoding: "ascii" or "utf-8" for text, None for binary files
+    """
+
+    size: int
+    sha256: str
+    encoding: Optional[str]
+
+    @property
+    def binary(self) -> bool:
+        """True if the file is not UTF-8 text."""
+        return self.encoding is None
+
+
+@dataclass(frozen=True)
+class CatalogFile:
+    """A file recorded in the catalog.
+
+    Attributes:
+        path: POSIX path relative to the owning devcontainer (or the
+            repository root for guides)
+        size: File size in bytes
+        sha256: Hex digest of the file contents
+        encoding: "ascii" or "utf-8" for text, None for binary files
+        signature: Stat signature the hash was computed under
+    """
+
+    path: str
+    size: int
+    sha256: str
+    encoding: Optional[str]
+    signature: FileSignature = field(repr=False, compare=False)
+
+    @property
+    def binary(self) -> bool:
+        """True if the file is not UTF-8 text, and so is never decoded or searched."""
+        return self.encoding is None
+
+
+@dataclass(frozen=True)
+class DevcontainerEntry:
+    """A devcontainer template recorded in the catalog.
+
+    Attributes:
+        name: Name of the devcontainer
+        files: All files in the template, recursively, sorted by path
+        tree_hash: Hash over the paths and content hashes of all files
+    """
+
+    name: str
+    files: tuple[CatalogFile, ...]
+    tree_hash: str
+
+    @cached_property
+    def _by_path(self) -> Mapping[str, CatalogFile]:
+        return {f.path: f for f in self.files}
+
+    def file(self, path: str) -> Optional[CatalogFile]:
+        """Return a file of the template by relative path, or None."""
+        return self._by_path.get(path)
+
+    @cached_property
+    def size(self) -> int:
+        """Total size of the template's files in bytes."""
+        return sum(f.size for f in self.files)
+
+    @cached_property
+    def tags(self) -> tuple[str, ...]:
+        """Words of the template's name, lowercased and sorted (e.g. "python" and "uv" for "ubuntu-python-uv")."""
+        return tuple(sorted({tag for tag in _TAG_SEPARATOR.split(self.name.lower()) if tag}))
+
+    def file_names(self, recursive: bool = True) -> list[str]:
+        """Return the relative paths of the template's files, sorted.
+
+        Args:
+            recursive: Include files in subdirectories
+
+        Returns:
+            Sorted list of relative file paths
+        """
+        return [f.path for f in self.files if recursive or "/" not in f.path]
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """Immutable snapshot of the repository's devcontainers and guides.
+
+    Attributes:
+        generation: Version number, incremented whenever the content changes
+        devcontainers: Devcontainer entries keyed by name, in name order
+        guides: Existing guides keyed by filename
+        tree_hash: Hash over every devcontainer and guide in the catalog
+    """
+
+    generation: int
+    devcontainers: Mapping[str, DevcontainerEntry]
+    guides: Mapping[str, CatalogFile]
+    tree_hash: str
+
+    @cached_property
+    def etag(self) -> str:
+        """Strong validator for listings derived from this catalog."""
+        return _digest([str(self.generation), self.tree_hash])
+
+    @property
+    def names(self) -> list[str]:
+        """Names of the available devcontainer templates, sorted."""
+        return list(self.devcontainers)
+
+    def devcontainer(self, name: str) -> Optional[DevcontainerEntry]:
+        """Return a devcontainer entry by name, or None."""
+        return self.devcontainers.get(name)
+
+    @cached_property
+    def _names(self) -> tuple[str, ...]:
+        return tuple(sorted(self.devcontainers))
+
+    @cached_property
+    def _tagged(self) -> Mapping[str, tuple[str, ...]]:
+        tagged: dict[str, list[str]] = {}
+        for name in self._names:
+            for tag in self.devcontainers[name].tags:
+                tagged.setdefault(tag, []).append(name)
+        return {tag: tuple(names) for tag, names in tagged.items()}
+
+    def select(self, prefix: str = "", tag: Optional[str] = None, after: Optional[str] = None,
+               limit: Optional[int] = None) -> tuple[list[DevcontainerEntry], int]:
+        """Return one page of devcontainer entries in name order.
+
+        Names are kept sorted, overall and per tag, so a page is found by
+        binary search and costs O(log n + limit) however many templates
+        there are. The sorted names are built once per catalog.
+
+        Args:
+            prefix: Only names starting with this
+            tag: Only templates with this tag (see DevcontainerEntry.tags)
+            after: Only names sorting after this one
+            limit: Maximum number of entries (default: all)
+
+        Returns:
+            The page, and the number of entries matching prefix and tag
+        """
+        names = self._names if tag is None else self._tagged.get(tag.lower(), ())
+        low = bisect.bisect_left(names, prefix)
+        high = bisect.bisect_left(names, prefix + "\U0010ffff", low) if prefix else len(names)
+        start = max(low, bisect.bisect_right(names, after, low, high)) if after is not None else low
+        end = high if limit is None else min(high, start + limit)
+        return [self.devcontainers[name] for name in names[start:end]], high - low
+
+    def file(self, rel_path: str) -> Optional[CatalogFile]:
+        """Return a template file or guide by path relative to the repository root, or None."""
+        guide = self.guides.get(rel_path)
+        if guide is not None:
+            return guide
+        parts = rel_path.split("/", 3)
+        if len(parts) == 4 and f"{parts[0]}/{parts[1]}" == DEVCONTAINERS_DIR:
+            entry = self.devcontainers.get(parts[2])
+            return entry.file(parts[3]) if entry is not None else None
+        return None
+
+    def is_binary(self, rel_path: str) -> bool:
+        """True if the catalog records the file at a repository-relative path as binary."""
+        f = self.file(rel_path)
+        return f is not None and f.binary
+
+
+def _digest(parts: Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def inspect_file(path: Path) -> FileInfo:
+    """Hash a file and classify it as text or binary in a single read.
+
+    A file is text if it is valid UTF-8 without NUL bytes. ASCII chunks,
+    the common case, are recognised without decoding them.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Size, hex digest (interned like the blob store's digests) and encoding
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    size = 0
+    ascii_only = text = True
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            if not text:
+                continue
+            if b"\0" in chunk:
+                text = False
+            elif not (ascii_only and chunk.isascii()):
+                ascii_only = False
+                try:
+                    decoder.decode(chunk)
+                except UnicodeDecodeError:
+                    text = False
+        if text and not ascii_only:
+            try:
+                # A character cut short at the end of the file.
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                text = False
+    encoding = ("ascii" if ascii_only else "utf-8") if text else None
+    return FileInfo(size, sys.intern(digest.hexdigest()), encoding)
+
+
+def build_catalog(tree: "RepositoryTree", previous: Optional[Catalog] = None,
+                  changed: Optional[Iterable[str]] = None) -> Catalog:
+    """Build a catalog from the current state of a repository tree.
+
+    Content hashes and text or binary classifications are reused from the
+    previous catalog for files whose stat signature has not changed, so only
+    new or modified files are read. Given the paths that changed since the
+    previous catalog, only the templates containing them are rebuilt and
+    every other entry is carried over as it is. The generation is only
+    incremented when the content differs from the previous catalog.
+
+    Args:
+        tree: RepositoryTree to read file metadata from
+        previous: Catalog to reuse hashes, entries and the generation from
+        changed: Paths relative to the repository root that changed since
+            previous was built (default: check every template)
+
+    Returns:
+        New catalog
+    """
+    def catalog_file(cached: Optional[CatalogFile], rel_path: str, display_path: str,
+                     signature: FileSignature) -> Optional[CatalogFile]:
+        if cached is not None and cached.signature == signature:
+            return cached
+        try:
+            info = inspect_file(tree.root / rel_path)
+        except OSError:
+            return None
+        return CatalogFile(display_path, signature.size, info.sha256, info.encoding, signature)
+
+    def entry(name: str, files: Iterable[CatalogFile]) -> DevcontainerEntry:
+        files = tuple(sorted(files, key=lambda f: f.path))
+        return DevcontainerEntry(name, files, _digest(f"{f.path}:{f.sha256}" for f in files))
+
+    devcontainers = {}
+    if previous is not None and changed is not None:
+        # Apply the changed paths to the entries of the templates they are
+        # in, without looking at any other template.
+        prefix = f"{DEVCONTAINERS_DIR}/"
+        touched: dict[str, list[str]] = {}
+        for path in changed:
+            if path.startswith(prefix):
+                name, _, rest = path[len(prefix):].partition("/")
+                if rest:
+                    touched.setdefault(name, []).append(rest)
+        devcontainers.update(previous.devcontainers)
+        for name, paths in touched.items():
+            old = devcontainers.pop(name, None)
+            if name.startswith(".") or not tree.is_dir(f"{prefix}{name}"):
+                continue
+            files = {f.path: f for f in old.files} if old is not None else {}
+            for path in paths:
+                rel_path = f"{prefix}{name}/{path}"
+                signature = tree.signature(rel_path)
+                f = catalog_file(files.get(path), rel_path, path, signature) if signature is not None else None
+                if f is None:
+                    files.pop(path, None)
+                else:
+                    files[path] = f
+            devcontainers[name] = entry(name, files.values())
+        devcontainers = {name: devcontainers[name] for name in sorted(devcontainers)}
+    else:
+        # Group the template files in one pass over the tree rather than
+        # one pass per template.
+        template_files: dict[str, list[tuple[str, FileSignature]]] = {}
+        for path, signature in tree.entries_under(DEVCONTAINERS_DIR):
+            name, _, rest = path.partition("/")
+            if rest:
+                template_files.setdefault(name, []).append((rest, signature))
+
+        for name in tree.child_dirs(DEVCONTAINERS_DIR):
+            if name.startswith("."):
+                continue
+            old = previous.devcontainers.get(name) if previous is not None else None
+            known = {f.path: f for f in old.files} if old is not None else {}
+            files = []
+            for path, signature in template_files.get(name, []):
+                f = catalog_file(known.get(path), f"{DEVCONTAINERS_DIR}/{name}/{path}", path, signature)
+                if f is not None:
+                    files.append(f)
+            devcontainers[name] = entry(name, files)
+
+    guides = {}
+    for guide in GUIDES:
+        signature = tree.signature(guide)
+        if signature is not None:
+            f = catalog_file(previous.guides.get(guide) if previous is not None else None, guide, guide, signature)
+            if f is not None:
+                guides[guide] = f
+
+    tree_hash = _digest(
+        [f"{e.name}:{e.tree_hash}" for e in devcontainers.values()] +
+        [f"{g.path}:{g.sha256}" for g in guides.values()]
+    )
+    catalog = Catalog(1, MappingProxyType(devcontainers), MappingProxyType(guides), tree_hash)
+    if previous is not None:
+        changed_content = previous.tree_hash != tree_hash
+        catalog = replace(catalog, generation=previous.generation + 1 if changed_content else previous.generation)
+    return catalog
+
+
+def merge_catalogs(catalogs: Sequence[Catalog]) -> Catalog:
+    """Overlay the catalogs of several repository roots.
+
+    Templates are merged file by file, the way the files themselves are
+    served: a template found in several roots has the union of their files,
+    each described by the first root that has it. Guides also come from the
+    first root that has them. The generation is the sum of the roots'
+    generations, so it changes whenever any of them does.
+
+    Args:
+        catalogs: Catalogs of the roots, highest precedence first
+
+    Returns:
+        Merged catalog
+    """
+    layers: dict[str, list[DevcontainerEntry]] = {}
+    for catalog in catalogs:
+        for name, entry in catalog.devcontainers.items():
+            layers.setdefault(name, []).append(entry)
+
+    devcontainers = {}
+    for name in sorted(layers):
+        entries = layers[name]
+        if len(entries) == 1:
+            devcontainers[name] = entries[0]
+            continue
+        files: dict[str, CatalogFile] = {}
+        for entry in entries:
+            for f in entry.files:
+                files.setdefault(f.path, f)
+        merged = tuple(files[path] for path in sorted(files))
+        devcontainers[name] = DevcontainerEntry(name, merged, _digest(f"{f.path}:{f.sha256}" for f in merged))
+
+    guides = {}
+    for guide in GUIDES:
+        f = next((c.guides[guide] for c in catalogs if guide in c.guides), None)
+        if f is not None:
+            guides[guide] = f
+
+    tree_hash = _digest(
+        [f"{e.name}:{e.tree_hash}" for e in devcontainers.values()] +
+        [f"{g.path}:{g.sha256}" for g in guides.values()]
+    )
+    generation = sum(catalog.generation for catalog in catalogs)
+    return Catalog(generation, MappingProxyType(devcontainers), MappingProxyType(guides), tree_hash)
@@ -0,0 +1,169 @@
+"""Content-level comparison of devcontainer templates.
+
+Files of two templates are classified as identical, changed or unique by
+comparing the content hashes recorded in the catalog, so identical files are
+never read. Changed text files are read and given a unified diff; binary
+files are never opened. Results are
+memoized by the two templates' tree hashes, so comparing the same pair again
+costs a dictionary lookup until one of their files changes.
+"""
+
+import difflib
+import os
+import threading
+from collections import OrderedDict
+
+from .catalog import DEVCONTAINERS_DIR, DevcontainerEntry
+from .overlay import Overlay
+
+
+# Files larger than this are classified but not diffed.
+MAX_DIFF_BYTES = 256 * 1024
+
+# Maximum number of lines reported per diff.
+MAX_DIFF_LINES = 500
+
+# Default number of memoized comparisons.
+DEFAULT_MAX_COMPARISONS = 256
+
+
+def compare_entries(repository: Overlay, entry1: DevcontainerEntry, entry2: DevcontainerEntry) -> dict:
+    """Compare the files of two devcontainer templates.
+
+    Args:
+        repository: Repository roots the templates are served from
+        entry1: Catalog entry of the first devcontainer
+        entry2: Catalog entry of the second devcontainer
+
+    Returns:
+        Dictionary containing:
+        - files1, files2: Relative paths of all files in each, recursively
+        - common_files: Paths present in both
+        - unique_to_1, unique_to_2: Paths present in only one
+        - identical: Common paths with the same contents
+        - changed: List of {path, size1, size2, diff} for common paths whose
+          contents differ; diff is None with a reason for files that are too
+          large, binary or unreadable, and truncated is set when the diff was
+          cut short
+    """
+    files1 = {f.path: f for f in entry1.files}
+    files2 = {f.path: f for f in entry2.files}
+    common = sorted(files1.keys() & files2.keys())
+
+    identical = []
+    changed = []
+    for path in common:
+        f1, f2 = files1[path], files2[path]
+        if f1.sha256 == f2.sha256:
+            identical.append(path)
+            continue
+        changed.append({
+            "path": path,
+            "size1": f1.size,
+            "size2": f2.size,
+            **({"diff": None, "reason": "binary"} if f1.binary or f2.binary else
+               _diff(repository, entry1.name, entry2.name, path, max(f1.size, f2.size)))
+        })
+
+    return {
+        "files1": sorted(files1),
+        "files2": sorted(files2),
+        "common_files": common,
+        "unique_to_1": sorted(files1.keys() - files2.keys()),
+        "unique_to_2": sorted(files2.keys() - files1.keys()),
+        "identical": identical,
+        "changed": changed
+    }
+
+
+def _diff(repository: Overlay, name1: str, name2: str, path: str, size: int) -> dict:
+    if size > MAX_DIFF_BYTES:
+        return {"diff": None, "reason": "too large"}
+    try:
+        text1 = repository.read_text(f"{DEVCONTAINERS_DIR}/{name1}/{path}")
+        text2 = repository.read_text(f"{DEVCONTAINERS_DIR}/{name2}/{path}")
+    except (OSError, ValueError):
+        # Missing since the catalog was built, or not UTF-8 text.
+        return {"diff": None, "reason": "unreadable"}
+
+    lines = list(difflib.unified_diff(
+        text1.splitlines(keepends=True),
+        text2.splitlines(keepends=True),
+        fromfile=f"{name1}/{path}",
+        tofile=f"{name2}/{path}"
+    ))
+    result = {"diff": "".join(lines[:MAX_DIFF_LINES])}
+    if len(lines) > MAX_DIFF_LINES:
+        result["truncated"] = True
+    return result
+
+
+class ComparisonCache:
+    """LRU memo of template comparisons keyed by name and tree hash.
+
+    A template's tree hash changes whenever any of its files is added,
+    removed or edited, so entries never go stale; they just stop being
+    looked up and age out.
+
+    Args:
+        max_entries: Maximum number of comparisons kept
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_COMPARISONS):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(entry1: DevcontainerEntry, entry2: DevcontainerEntry) -> tuple:
+        """Return the memo key of a pair of templates."""
+        return (entry1.name, entry1.tree_hash, entry2.name, entry2.tree_hash)
+
+    def get(self, key: tuple):
+        """Return a memoized comparison, or None.
+
+        Args:
+            key: Key from ComparisonCache.key
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: dict):
+        """Memoize a comparison, evicting the least recently used one if full.
+
+        Args:
+            key: Key from ComparisonCache.key
+            result: Comparison to store; must not be modified afterwards
+        """
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return memo counters and current occupancy.
+
+        Returns:
+            Dictionary with hits, misses, entries and max_entries
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+
+# Shared comparison memo. Its size can be tuned with the COMPARISON_CACHE_SIZE
+# environment variable.
+comparison_cache = ComparisonCache(int(os.getenv("COMPARISON_CACHE_SIZE", DEFAULT_MAX_COMPARISONS)))
@@ -0,0 +1,112 @@
+"""Content-hash ETags for the preferences MCP server.
+
+Every resource has a strong validator derived from precomputed content
+hashes: file resources use the SHA-256 of the file, listings use the tree
+hash of the catalog entries they describe. ETags are attached to resource
+reads as `_meta.etag`, and the fetch_resource tool can skip sending content
+when the caller already holds the current version.
+"""
+
+import re
+from typing import Optional
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+
+from .catalog import DEVCONTAINER_FILES, DEVCONTAINERS_DIR, GUIDE_NAMES
+from .executor import run_blocking
+from .overlay import Overlay
+
+
+_DEVCONTAINER_FILE = re.compile(r"^preferences://devcontainer/([^/]+)/([^/]+)$")
+_GUIDE = re.compile(r"^preferences://guide/([^/]+)$")
+_BUNDLE = re.compile(r"^preferences://bundle/([^/]+)$")
+_FILES = re.compile(r"^preferences://files/([^?]+)")
+
+
+def resource_etag(repository: Overlay, uri: str) -> Optional[str]:
+    """Return the current ETag of a resource without reading it.
+
+    Args:
+        repository: Repository roots the resource is served from
+        uri: Resource URI
+
+    Returns:
+        Hex digest, or None if the resource is unknown
+    """
+    if uri.partition("?")[0] == "preferences://catalog":
+        return repository.catalog.etag
+
+    match = _DEVCONTAINER_FILE.match(uri)
+    if match:
+        name, file = match.groups()
+        if file not in DEVCONTAINER_FILES:
+            return None
+        return repository.content_hash(f"{DEVCONTAINERS_DIR}/{name}/{DEVCONTAINER_FILES[file]}")
+
+    match = _GUIDE.match(uri)
+    if match:
+        guide = GUIDE_NAMES.get(match.group(1))
+        return repository.content_hash(guide) if guide else None
+
+    match = _BUNDLE.match(uri)
+    if match:
+        entry = repository.catalog.devcontainer(match.group(1))
+        return entry.tree_hash if entry is not None else None
+
+    match = _FILES.match(uri)
+    if match:
+        try:
+            entry = repository.resolve(match.group(1))
+        except (OSError, ValueError):
+            return None
+        return repository.content_hash(entry.path)
+
+    return None
+
+
+async def current_etag(repository: Overlay, uri: str) -> Optional[str]:
+    """Return the current ETag of a resource, keeping file I/O off the event loop.
+
+    Catalog-backed ETags are memory lookups. ETags of arbitrary files may need
+    a check on disk and a first-time hash, so they run on the I/O executor.
+
+    Args:
+        repository: Repository roots the resource is served from
+        uri: Resource URI
+
+    Returns:
+        Hex digest, or None if the resource is unknown
+    """
+    if uri.startswith("preferences://files/"):
+        return await run_blocking(resource_etag, repository, uri)
+    return resource_etag(repository, uri)
+
+
+class ETagMiddleware(Middleware):
+    """Attaches `_meta.etag` to every resource read that has a known ETag.
+
+    The ETag is looked up before the resource is read, so if the file changes
+    in between, the client is given an older ETag with newer content and will
+    simply fetch again next time, never the other way round.
+
+    Args:
+        repository: Repository roots the resources are served from
+    """
+
+    def __init__(self, repository: Overlay):
+        self.repository = repository
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        etag = await current_etag(self.repository, str(context.message.uri))
+        result = await call_next(context)
+        if etag is None:
+            return result
+        return [
+            ReadResourceContents(
+                content=item.content,
+                mime_type=item.mime_type,
+                meta={**(getattr(item, "meta", None) or {}), "etag": etag}
+            )
+            for item in result
+        ]
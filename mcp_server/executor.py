@@ -0,0 +1,110 @@
+"""Bounded thread pool for blocking work in the preferences MCP server.
+
+Handlers are async so that one slow filesystem call cannot stall every other
+session on the HTTP transport. Blocking work (stat, reads, scans) is handed
+to a fixed-size thread pool. The number of calls waiting for a worker is
+capped, and calls beyond the cap are rejected immediately instead of piling
+up behind a slow disk.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+# Default number of worker threads.
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Default number of calls allowed to wait for a free worker.
+DEFAULT_QUEUE_DEPTH = 64
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when the blocking work queue is full."""
+
+
+class BlockingExecutor:
+    """Runs blocking callables on a bounded thread pool.
+
+    Args:
+        max_workers: Number of worker threads
+        max_queue: Maximum number of calls waiting for a worker
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_QUEUE_DEPTH):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="preferences-io")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool and await its result.
+
+        Args:
+            fn: Callable to run
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The callable's return value
+
+        Raises:
+            ServerBusyError: If max_workers calls are running and max_queue
+                more are already waiting
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ServerBusyError("Server is busy, please retry shortly")
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        """Return pool sizing and counters.
+
+        Returns:
+            Dictionary with workers, max_queue, in_flight, queued, completed and rejected
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+
+
+# Shared executor used by all handlers. Sized with the IO_WORKERS and
+# IO_QUEUE_DEPTH environment variables.
+io_executor = BlockingExecutor(
+    int(os.getenv("IO_WORKERS", DEFAULT_WORKERS)),
+    int(os.getenv("IO_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH))
+)
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the shared I/O executor.
+
+    Args:
+        fn: Callable to run
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The callable's return value
+    """
+    return await io_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,512 @@
+"""Structured facets of the devcontainer templates.
+
+Each template's Dockerfile, devcontainer.json, docker-compose.yml and
+Caddyfile are parsed once, when the template is first indexed and again
+whenever one of them changes, into a small set of facets: base images, tool
+versions, installed packages, ports, compose services, devcontainer features
+and editor extensions. The facets are kept in an inverted index from
+(facet, value) to template names, so questions like "templates with Python
+3.12 and uv" or "templates exposing port 443" are answered with set
+intersections instead of reading files.
+
+Values are lowercase strings. Versions are indexed as "tool=version" and
+under each shorter dotted prefix, so "python=3" matches Python 3.11 and
+3.12. Base images are indexed with and without their tag.
+"""
+
+import json
+import posixpath
+import re
+import shlex
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import yaml
+
+from .catalog import DEVCONTAINER_FILES, DEVCONTAINERS_DIR
+from .utils import read_file_safe
+
+
+# Facets that can be queried, in the order they are reported.
+FACETS = (
+    "base_images",
+    "versions",
+    "tools",
+    "packages",
+    "ports",
+    "services",
+    "features",
+    "extensions",
+    "proxies"
+)
+
+# Template files that facets are extracted from.
+FACET_FILES = tuple(DEVCONTAINER_FILES.values())
+
+_VARIABLE = re.compile(r"\$(?:\{([A-Za-z_][A-Za-z0-9_]*)(?::?[-+]([^}]*))?\}|([A-Za-z_][A-Za-z0-9_]*))")
+_VERSION = re.compile(r"^v?(\d+(?:\.\d+)*)")
+_VERSIONED_NAME = re.compile(r"^([a-z][a-z-]{2,}?)\d[\d.]*(?:-.*)?$")
+
+# Package manager commands and the words that start their package lists.
+_INSTALLERS = {
+    "apt-get": ("install",),
+    "apt": ("install",),
+    "apk": ("add",),
+    "dnf": ("install",),
+    "yum": ("install",),
+    "npm": ("install", "i", "add"),
+    "pnpm": ("add", "install"),
+    "yarn": ("add",),
+    "pip": ("install",),
+    "pip3": ("install",),
+    "pipx": ("install",),
+    "uv": ("install", "add"),
+    "cargo": ("install",),
+    "gem": ("install",)
+}
+
+
+@dataclass(frozen=True)
+class TemplateFacets:
+    """Facets of one devcontainer template.
+
+    Attributes:
+        name: Template name
+        base_images: Images the template is built from, as image:tag
+        versions: Tool versions from FROM tags and *_VERSION build arguments
+        packages: Packages installed with apt, apk, npm, pip, uv and similar
+        ports: Ports exposed, published, forwarded or served
+        services: docker-compose service names
+        features: devcontainer feature ids
+        extensions: Editor extension ids
+        proxies: Caddy reverse proxy upstreams
+    """
+
+    name: str
+    base_images: tuple[str, ...] = ()
+    versions: dict[str, str] = field(default_factory=dict)
+    packages: tuple[str, ...] = ()
+    ports: tuple[int, ...] = ()
+    services: tuple[str, ...] = ()
+    features: tuple[str, ...] = ()
+    extensions: tuple[str, ...] = ()
+    proxies: tuple[str, ...] = ()
+
+    @property
+    def tools(self) -> tuple[str, ...]:
+        """Names of versioned tools and installed packages, without versions."""
+        names = set(self.versions)
+        for package in self.packages:
+            # python3.11-venv -> python, uv==0.5.1 -> uv, but x11-apps stays.
+            name = re.split(r"[=<>]|(?<=.)@", package, maxsplit=1)[0]
+            match = _VERSIONED_NAME.match(name)
+            names.add(match.group(1) if match else name)
+        return tuple(sorted(names))
+
+    def to_dict(self) -> dict:
+        """Return the facets as a JSON-serializable dictionary."""
+        return {
+            "name": self.name,
+            "base_images": list(self.base_images),
+            "versions": dict(self.versions),
+            "tools": list(self.tools),
+            "packages": list(self.packages),
+            "ports": list(self.ports),
+            "services": list(self.services),
+            "features": list(self.features),
+            "extensions": list(self.extensions),
+            "proxies": list(self.proxies)
+        }
+
+    def index_values(self) -> set[tuple[str, str]]:
+        """Return every (facet, value) pair the template is indexed under."""
+        values = set()
+        for image in self.base_images:
+            values.add(("base_images", image))
+            values.add(("base_images", image.split(":", 1)[0]))
+        for tool, version in self.versions.items():
+            values.add(("versions", tool))
+            parts = version.split(".")
+            for i in range(1, len(parts) + 1):
+                values.add(("versions", f"{tool}={'.'.join(parts[:i])}"))
+        for facet in ("tools", "packages", "services", "extensions", "proxies"):
+            values.update((facet, value) for value in getattr(self, facet))
+        for feature in self.features:
+            values.add(("features", feature))
+            # Also under the short name: ghcr.io/devcontainers/features/node:1 -> node.
+            values.add(("features", feature.rsplit("/", 1)[-1].split(":", 1)[0]))
+        values.update(("ports", str(port)) for port in self.ports)
+        return values
+
+
+def extract_facets(name: str, files: dict[str, str]) -> TemplateFacets:
+    """Extract the facets of a template from the contents of its files.
+
+    Files that are missing or cannot be parsed contribute nothing.
+
+    Args:
+        name: Template name
+        files: Contents of the template's files, keyed by file name
+
+    Returns:
+        Facets of the template
+    """
+    images: list[str] = []
+    versions: dict[str, str] = {}
+    packages: set[str] = set()
+    ports: set[int] = set()
+    services: list[str] = []
+    features: list[str] = []
+    extensions: list[str] = []
+    proxies: list[str] = []
+
+    if "Dockerfile" in files:
+        _parse_dockerfile(files["Dockerfile"], images, versions, packages, ports)
+
+    config = _load_jsonc(files.get("devcontainer.json", ""))
+    if isinstance(config, dict):
+        if isinstance(config.get("image"), str):
+            images.append(config["image"].lower())
+        if isinstance(config.get("features"), dict):
+            features.extend(str(feature).lower() for feature in config["features"])
+        customizations = config.get("customizations")
+        vscode = customizations.get("vscode") if isinstance(customizations, dict) else None
+        for ids in (config.get("extensions"), vscode.get("extensions") if isinstance(vscode, dict) else None):
+            if isinstance(ids, list):
+                extensions.extend(str(extension).lower() for extension in ids)
+        for key in ("forwardPorts", "appPort"):
+            value = config.get(key)
+            for port in value if isinstance(value, list) else [value]:
+                ports.update(_ports(str(port)) if port is not None else ())
+
+    try:
+        compose = yaml.safe_load(files.get("docker-compose.yml", "")) or {}
+    except yaml.YAMLError:
+        compose = {}
+    if isinstance(compose, dict) and isinstance(compose.get("services"), dict):
+        for service_name, service in compose["services"].items():
+            services.append(str(service_name).lower())
+            if not isinstance(service, dict):
+                continue
+            if isinstance(service.get("image"), str):
+                images.append(service["image"].lower())
+            for key in ("ports", "expose"):
+                value = service.get(key)
+                for port in value if isinstance(value, list) else []:
+                    if isinstance(port, dict):
+                        ports.update(_ports(str(port.get("target", ""))) | _ports(str(port.get("published", ""))))
+                    else:
+                        ports.update(_ports(str(port)))
+
+    if "Caddyfile" in files:
+        _parse_caddyfile(files["Caddyfile"], ports, proxies)
+
+    return TemplateFacets(
+        name=name,
+        base_images=tuple(dict.fromkeys(images)),
+        versions=versions,
+        packages=tuple(sorted(packages)),
+        ports=tuple(sorted(ports)),
+        services=tuple(services),
+        features=tuple(dict.fromkeys(features)),
+        extensions=tuple(dict.fromkeys(extensions)),
+        proxies=tuple(dict.fromkeys(proxies))
+    )
+
+
+def _parse_dockerfile(text: str, images: list, versions: dict, packages: set, ports: set):
+    # Comment lines are dropped before continuation lines are joined, as
+    # Docker does, so comments inside a multi-line RUN are ignored.
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith("#")]
+    instructions = re.sub(r"\\[ \t]*\n", " ", "\n".join(lines)).splitlines()
+
+    args: dict[str, str] = {}
+    stages: set[str] = set()
+    for line in instructions:
+        keyword, _, rest = line.strip().partition(" ")
+        keyword = keyword.upper()
+        rest = rest.strip()
+        if keyword == "ARG":
+            arg, sep, default = rest.partition("=")
+            if sep:
+                args[arg] = default.strip().strip("\"'")
+                if arg.upper().endswith("_VERSION"):
+                    version = _version(args[arg])
+                    if version:
+                        versions[arg[:-len("_VERSION")].lower().replace("_", "-")] = version
+        elif keyword == "FROM":
+            words = [w for w in rest.split() if not w.startswith("--")]
+            if not words:
+                continue
+            image = _substitute(words[0], args).lower()
+            if len(words) >= 3 and words[1].upper() == "AS":
+                stages.add(words[2].lower())
+            if image in stages or image == "scratch":
+                continue
+            images.append(image)
+            repository, _, tag = image.rpartition(":") if ":" in image.rsplit("/", 1)[-1] else (image, "", "")
+            version = _version(tag)
+            if version:
+                versions.setdefault(repository.rsplit("/", 1)[-1], version)
+        elif keyword == "EXPOSE":
+            for port in rest.split():
+                ports.update(_ports(":" + _substitute(port, args)))
+        elif keyword == "RUN":
+            packages.update(_installed_packages(_substitute(rest, args)))
+
+
+def _installed_packages(command: str) -> set[str]:
+    """Return the packages installed by the package manager calls in a shell command."""
+    packages = set()
+    for part in re.split(r"&&|\|\||;|\|", command):
+        try:
+            words = shlex.split(part)
+        except ValueError:
+            words = part.split()
+        while words and (words[0] in ("sudo", "env") or "=" in words[0]):
+            words = words[1:]
+        if words:
+            words[0] = posixpath.basename(words[0])
+        if len(words) >= 3 and re.match(r"python[\d.]*$", words[0]) and words[1] == "-m":
+            # python -m pip install ...
+            words = words[2:]
+        if len(words) >= 2 and words[0] == "uv" and words[1] in ("pip", "tool"):
+            words = words[1:]
+        if not words or words[0] not in _INSTALLERS:
+            continue
+        verbs = _INSTALLERS[words[0]]
+        started = False
+        for word in words[1:]:
+            if not started:
+                started = word in verbs
+                continue
+            if word.startswith("-") or word.startswith("/") or "://" in word or word == ".":
+                continue
+            packages.add(word.lower())
+    return packages
+
+
+def _parse_caddyfile(text: str, ports: set, proxies: list):
+    depth = 0
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if not line:
+            continue
+        words = line.split()
+        if depth == 0 and line.endswith("{") and not line.startswith("("):
+            # A site block: its addresses come before the brace.
+            for address in " ".join(words[:-1]).replace(",", " ").split():
+                ports.update(_ports(address))
+                if address.startswith("https://") and not _ports(address):
+                    ports.add(443)
+                elif address.startswith("http://") and not _ports(address):
+                    ports.add(80)
+        elif words[0] == "reverse_proxy":
+            for upstream in words[1:]:
+                if upstream == "{" or upstream.startswith("/") or upstream.startswith("@"):
+                    continue
+                proxies.append(upstream.lower())
+                ports.update(_ports(upstream))
+        depth += line.count("{") - line.count("}")
+
+
+def _substitute(text: str, args: dict[str, str]) -> str:
+    def value(match: re.Match) -> str:
+        name = match.group(1) or match.group(3)
+        if name in args:
+            return args[name]
+        return match.group(2) or ""
+    return _VARIABLE.sub(value, text)
+
+
+def _version(text: str) -> Optional[str]:
+    match = _VERSION.match(text.strip())
+    return match.group(1) if match else None
+
+
+def _ports(text: str) -> set[int]:
+    """Return the ports in a port mapping, address or upstream such as 8080:80/tcp or host:443."""
+    text = text.strip().strip("\"'")
+    if text.isdigit():
+        return {int(text)} if 0 < int(text) < 65536 else set()
+    found = set()
+    for part in re.split(r"[-,]", text):
+        # Published:target mappings give both numbers.
+        for candidate in part.split(":"):
+            candidate = candidate.split("/", 1)[0]
+            if candidate.isdigit() and 0 < int(candidate) < 65536:
+                found.add(int(candidate))
+    return found
+
+
+def _load_jsonc(text: str):
+    """Parse JSON with comments and trailing commas, as used by devcontainer.json."""
+    out = []
+    i = 0
+    in_string = False
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if char == "\\" and i + 1 < len(text):
+                out.append(text[i + 1])
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = len(text) if end < 0 else end
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end < 0 else end + 2
+            continue
+        else:
+            out.append(char)
+        i += 1
+    try:
+        return json.loads(re.sub(r",(\s*[}\]])", r"\1", "".join(out)))
+    except ValueError:
+        return None
+
+
+class FacetIndex:
+    """Inverted index from facet values to devcontainer templates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: dict[str, TemplateFacets] = {}
+        self._values: dict[str, set[tuple[str, str]]] = {}
+        self._index: dict[tuple[str, str], set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def add(self, facets: TemplateFacets):
+        """Index a template's facets, replacing any previous version.
+
+        Args:
+            facets: Facets of the template
+        """
+        values = facets.index_values()
+        with self._lock:
+            self._remove(facets.name)
+            self._templates[facets.name] = facets
+            self._values[facets.name] = values
+            for value in values:
+                self._index.setdefault(value, set()).add(facets.name)
+
+    def remove(self, name: str):
+        """Drop a template from the index if it is indexed.
+
+        Args:
+            name: Template name
+        """
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name: str):
+        self._templates.pop(name, None)
+        for value in self._values.pop(name, ()):
+            names = self._index[value]
+            names.discard(name)
+            if not names:
+                del self._index[value]
+
+    def query(self, filters: dict[str, Union[str, int, list]]) -> list[TemplateFacets]:
+        """Return the templates matching every filter.
+
+        Args:
+            filters: Facet name to a value, or a list of values that must all
+                match; versions are given as "tool" or "tool=version"
+
+        Returns:
+            Facets of the matching templates, sorted by name
+
+        Raises:
+            ValueError: If a filter names an unknown facet
+        """
+        wanted = []
+        for facet, values in filters.items():
+            if facet not in FACETS:
+                raise ValueError(f"Unknown facet '{facet}'. Valid facets: {', '.join(FACETS)}")
+            for value in values if isinstance(values, list) else [values]:
+                wanted.append((facet, _normalize(facet, value)))
+
+        with self._lock:
+            if not wanted:
+                names = set(self._templates)
+            else:
+                # Intersect the smallest sets first.
+                sets = sorted((self._index.get(value, set()) for value in wanted), key=len)
+                names = set(sets[0]).intersection(*sets[1:])
+            return [self._templates[name] for name in sorted(names)]
+
+    def values(self, facet: str) -> dict[str, int]:
+        """Return the indexed values of a facet with their template counts.
+
+        Args:
+            facet: Facet name
+
+        Raises:
+            ValueError: If the facet is unknown
+        """
+        if facet not in FACETS:
+            raise ValueError(f"Unknown facet '{facet}'. Valid facets: {', '.join(FACETS)}")
+        with self._lock:
+            return {value: len(names) for (f, value), names in sorted(self._index.items()) if f == facet}
+
+    def stats(self) -> dict:
+        """Return index size statistics."""
+        with self._lock:
+            return {"templates": len(self._templates), "values": len(self._index)}
+
+
+def _normalize(facet: str, value) -> str:
+    value = str(value).strip().lower()
+    if facet == "versions":
+        tool, sep, version = value.replace(" ", "=", 1).partition("=")
+        value = f"{tool}={version.lstrip('v')}" if sep and version else tool
+    return value
+
+
+def template_facets(repo_root: Path, name: str) -> Optional[TemplateFacets]:
+    """Read a template's files and extract its facets.
+
+    Args:
+        repo_root: Path to the repository root
+        name: Template name
+
+    Returns:
+        Facets of the template, or None if it has none of the facet files
+    """
+    files = {}
+    for file_name in FACET_FILES:
+        try:
+            files[file_name] = read_file_safe(repo_root / DEVCONTAINERS_DIR / name / file_name, repo_root)
+        except (OSError, ValueError):
+            continue
+    return extract_facets(name, files) if files else None
+
+
+def build_facet_index(repo_root: Path, names: Iterable[str]) -> FacetIndex:
+    """Build a facet index over devcontainer templates.
+
+    Args:
+        repo_root: Path to the repository root
+        names: Names of the templates to index
+
+    Returns:
+        Populated index
+    """
+    index = FacetIndex()
+    for name in names:
+        facets = template_facets(repo_root, name)
+        if facets is not None:
+            index.add(facets)
+    return index
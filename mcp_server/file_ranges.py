@@ -0,0 +1,316 @@
+"""Bounded, ranged reads of repository files.
+
+Small files are served whole from the content cache. Larger files, and any
+read that asks for a byte or line range, are served one slice at a time, so
+the memory a request needs is bounded by MAX_READ_BYTES however large the
+file is. Files of MMAP_THRESHOLD bytes or more are sliced through a
+read-only memory map, which leaves the data in the page cache instead of
+copying the whole file onto the heap.
+
+Binary files, as classified by the catalog or on first read, are never
+decoded: their slices are returned as raw bytes, which the file resource
+sends base64-encoded, under the same MAX_READ_BYTES limit.
+
+Every slice reports the total file size and, unless it reaches the end of
+the file, an opaque continuation cursor. Cursors are bound to the file's
+stat signature, so a cursor issued before the file changed is rejected
+rather than resuming in the middle of different content.
+
+With the HTTP transport, /files/{path} streams any file in fixed-size chunks
+and honours Range requests.
+"""
+
+import base64
+import mimetypes
+import mmap
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+
+from .cache import FileSignature
+from .executor import run_blocking
+from .overlay import Overlay
+from .repository import Repository
+
+
+# Largest slice returned by a single read. Can be tuned with the
+# MAX_READ_BYTES environment variable.
+MAX_READ_BYTES = int(os.getenv("MAX_READ_BYTES", 1024 * 1024))
+
+# Files at least this large are sliced through mmap instead of being read.
+MMAP_THRESHOLD = 256 * 1024
+
+# Range metadata of the file resource read in progress, attached to the
+# response as _meta by RangeMetaMiddleware.
+range_meta: ContextVar[Optional[dict]] = ContextVar("range_meta", default=None)
+
+
+@dataclass(frozen=True)
+class FileRange:
+    """A slice of a file.
+
+    Attributes:
+        offset: Byte offset of the first byte of the slice
+        end: Byte offset just past the last byte of the slice
+        total_size: Size of the whole file in bytes
+        content: Decoded contents of the slice, or its bytes for a binary file
+        signature: Stat signature of the file when it was read
+        mime_type: Guessed media type of a binary file
+    """
+
+    offset: int
+    end: int
+    total_size: int
+    content: Union[str, bytes]
+    signature: FileSignature
+    mime_type: Optional[str] = None
+
+    @property
+    def binary(self) -> bool:
+        """True if the slice is raw bytes of a binary file."""
+        return isinstance(self.content, bytes)
+
+    def text(self) -> str:
+        """Return the content as text: decoded, or base64 for a binary file."""
+        return base64.b64encode(self.content).decode() if self.binary else self.content
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Cursor for the slice that follows, or None at the end of the file."""
+        if self.end >= self.total_size:
+            return None
+        return encode_cursor(self.end, self.signature)
+
+    def meta(self) -> dict:
+        """Return the range description without the content."""
+        meta = {
+            "offset": self.offset,
+            "end": self.end,
+            "total_size": self.total_size,
+            "next_cursor": self.next_cursor,
+            "encoding": "base64" if self.binary else "utf-8"
+        }
+        if self.mime_type is not None:
+            meta["mime_type"] = self.mime_type
+        return meta
+
+
+def encode_cursor(offset: int, signature: FileSignature) -> str:
+    """Encode a continuation cursor for a byte offset in a file.
+
+    Args:
+        offset: Byte offset to resume from
+        signature: Stat signature of the file the offset refers to
+
+    Returns:
+        Opaque URL-safe cursor string
+    """
+    raw = f"{offset}:{signature.mtime_ns}:{signature.size}:{signature.inode}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, signature: FileSignature) -> int:
+    """Decode a continuation cursor against the file's current signature.
+
+    Args:
+        cursor: Cursor returned by a previous read
+        signature: Current stat signature of the file
+
+    Returns:
+        Byte offset to resume from
+
+    Raises:
+        ValueError: If the cursor is malformed or the file changed since it was issued
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset, mtime_ns, size, inode = (int(part) for part in raw.split(":"))
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if FileSignature(mtime_ns, size, inode) != signature:
+        raise ValueError("File changed since the cursor was issued; read it again from the start")
+    return offset
+
+
+def read_file_range(
+    repository: Union[Repository, Overlay],
+    rel_path: str,
+    offset: int = 0,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    line_count: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> FileRange:
+    """Read a bounded slice of a repository file.
+
+    The slice is selected by a byte offset and length, by a 1-based line
+    range, or by a cursor from a previous read. Its boundaries are moved to
+    the nearest UTF-8 character boundaries, so the reported offsets may
+    differ slightly from the requested ones. Slices never exceed
+    MAX_READ_BYTES; line ranges that would are cut short and continue with
+    the cursor. Slices of binary files are returned as bytes, at exactly
+    the requested offsets.
+
+    Args:
+        repository: Repository or roots whose manifest the path is resolved against
+        rel_path: Path relative to the repository root
+        offset: Byte offset to start at
+        length: Maximum number of bytes to return (default and cap: MAX_READ_BYTES)
+        start_line: First line to return, instead of offset
+        line_count: Number of lines to return, counted from the start of the slice
+        cursor: Cursor from a previous read, instead of offset or start_line
+
+    Returns:
+        The slice with its offsets and the total file size
+
+    Raises:
+        ValueError: If path is outside repository, the range or cursor is
+            invalid, a line range is asked of a binary file, or the slice is
+            not valid UTF-8
+        FileNotFoundError: If file doesn't exist
+    """
+    if offset < 0 or (length is not None and length < 1):
+        raise ValueError("offset must be non-negative and length positive")
+    if (start_line is not None and start_line < 1) or (line_count is not None and line_count < 1):
+        raise ValueError("start_line and line_count must be positive")
+
+    owner, entry = repository.locate(rel_path)
+    resolved_path, signature = entry.resolved, entry.signature
+    size = signature.size
+    length = min(length or MAX_READ_BYTES, MAX_READ_BYTES)
+
+    if cursor is not None:
+        offset = decode_cursor(cursor, signature)
+
+    info = owner.file_info(entry.path, signature)
+    if info is not None and info.binary:
+        if start_line is not None or line_count is not None:
+            raise ValueError("start_line and line_count only apply to text files")
+        start = min(offset, size)
+        with open(resolved_path, "rb") as f:
+            f.seek(start)
+            data = f.read(min(length, size - start))
+        mime_type = mimetypes.guess_type(entry.path)[0] or "application/octet-stream"
+        return FileRange(start, start + len(data), size, data, signature, mime_type)
+
+    if cursor is None and start_line is None and line_count is None and offset == 0 and size <= length:
+        # Whole small file: share the cached copy.
+        return FileRange(0, size, size, owner.content_cache.read(resolved_path, signature), signature)
+
+    with open(resolved_path, "rb") as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                start, end = _select(view, len(view), offset, length, start_line, line_count)
+                data = view[start:end]
+        else:
+            view = f.read()
+            start, end = _select(view, len(view), offset, length, start_line, line_count)
+            data = view[start:end]
+
+    return FileRange(start, end, size, data.decode("utf-8"), signature)
+
+
+def _select(view, size: int, offset: int, length: int, start_line: Optional[int],
+            line_count: Optional[int]) -> tuple[int, int]:
+    """Return the [start, end) byte range to serve, aligned to UTF-8 characters."""
+    start = min(offset, size)
+    if start_line is not None:
+        start = 0
+        for _ in range(start_line - 1):
+            newline = view.find(b"\n", start)
+            if newline < 0:
+                start = size
+                break
+            start = newline + 1
+
+    limit = min(size, start + length)
+    end = limit
+    if line_count is not None:
+        end = start
+        for _ in range(line_count):
+            newline = view.find(b"\n", end, limit)
+            if newline < 0:
+                end = limit
+                break
+            end = newline + 1
+
+    # Skip a partial character at the start and keep a split one out of the
+    # end, unless that would leave nothing to return.
+    start = _char_boundary(view, start, size, forward=True)
+    aligned = _char_boundary(view, end, size, forward=False)
+    if aligned > start:
+        end = aligned
+    elif end > start:
+        end = _char_boundary(view, end, size, forward=True)
+    return start, max(start, end)
+
+
+def _char_boundary(view, pos: int, size: int, forward: bool) -> int:
+    # UTF-8 continuation bytes look like 0b10xxxxxx; characters are at most
+    # four bytes long, so at most three steps are ever needed.
+    for _ in range(3):
+        if pos <= 0 or pos >= size or view[pos] & 0xC0 != 0x80:
+            break
+        pos += 1 if forward else -1
+    return pos
+
+
+class RangeMetaMiddleware(Middleware):
+    """Attaches the range description of a file read to the response `_meta`.
+
+    get_file_content records the slice it served in `range_meta`; the
+    offsets, total size, continuation cursor and encoding are then added to
+    the resource contents as `_meta.offset`, `_meta.end`,
+    `_meta.total_size`, `_meta.next_cursor` and `_meta.encoding`. Slices
+    of binary files are also given the file's guessed media type.
+    """
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        token = range_meta.set(None)
+        try:
+            result = await call_next(context)
+            meta = range_meta.get()
+        finally:
+            range_meta.reset(token)
+        if meta is None:
+            return result
+        return [
+            ReadResourceContents(
+                content=item.content,
+                mime_type=meta.get("mime_type", item.mime_type),
+                meta={**(getattr(item, "meta", None) or {}), **meta}
+            )
+            for item in result
+        ]
+
+
+def register_file_routes(mcp: FastMCP, repository: Overlay):
+    """Register the /files/{path} streaming download route.
+
+    Files are sent in fixed-size chunks, so large files are never held in
+    memory, and single or multiple byte ranges are supported through the
+    Range header.
+
+    Args:
+        mcp: FastMCP server instance
+        repository: Repository roots to serve
+    """
+
+    @mcp.custom_route("/files/{path:path}", methods=["GET", "HEAD"])
+    async def download_file(request: Request) -> Response:
+        """Stream a repository file."""
+        rel_path = request.path_params["path"]
+        try:
+            entry = await run_blocking(repository.resolve, rel_path)
+        except FileNotFoundError:
+            return JSONResponse({"error": f"File '{rel_path}' not found"}, status_code=404)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=403)
+        return FileResponse(entry.resolved)
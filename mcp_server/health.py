@@ -0,0 +1,76 @@
+"""Liveness and readiness for the preferences MCP server.
+
+/health answers as long as the process is serving HTTP and does no I/O.
+/ready returns 503 until the repository has finished its initial warm-up
+(catalog, search index and content cache), then reports their state.
+Handlers invoked before warm-up completes wait for it instead of failing.
+"""
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from .blobs import blob_store
+from .overlay import Overlay
+
+
+class ReadinessMiddleware(Middleware):
+    """Holds resource, tool and prompt calls until the repository is warm.
+
+    Args:
+        repository: Repository roots the handlers read from
+    """
+
+    def __init__(self, repository: Overlay):
+        self.repository = repository
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        await self.repository.wait_until_ready()
+        return await call_next(context)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        await self.repository.wait_until_ready()
+        return await call_next(context)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next):
+        await self.repository.wait_until_ready()
+        return await call_next(context)
+
+
+def register_health_routes(mcp: FastMCP, repository: Overlay):
+    """Register the /health and /ready HTTP routes.
+
+    Args:
+        mcp: FastMCP server instance
+        repository: Repository roots whose warm-up state is reported
+    """
+
+    @mcp.custom_route("/health", methods=["GET"])
+    async def health(request: Request) -> JSONResponse:
+        """Liveness probe."""
+        return JSONResponse({"status": "ok"})
+
+    @mcp.custom_route("/ready", methods=["GET"])
+    async def ready(request: Request) -> JSONResponse:
+        """Readiness probe."""
+        if not repository.is_ready:
+            return JSONResponse({"status": "warming_up"}, status_code=503)
+
+        catalog = repository.catalog
+        state = {
+            "status": "ready",
+            "warmup_seconds": round(repository.warmup_seconds, 3),
+            "warmup_phases": {name: round(seconds, 3) for name, seconds in repository.warmup_phases.items()},
+            "snapshot_loaded": repository.snapshot_loaded,
+            "catalog": {
+                "generation": catalog.generation,
+                "devcontainers": len(catalog.devcontainers)
+            },
+            "search_index": repository.search_stats(),
+            "content_cache": repository.cache_stats(),
+            "blob_store": blob_store.stats()
+        }
+        if len(repository.repositories) > 1:
+            state["roots"] = repository.root_stats()
+        return JSONResponse(state)
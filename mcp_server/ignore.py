@@ -0,0 +1,200 @@
+"""Exclusion rules from .gitignore and .dockerignore files.
+
+Paths matched by the ignore files at the repository root are left out of the
+repository model, so they are never listed, indexed or served. The two
+formats differ in one important way: .gitignore patterns without a slash
+match at any depth, while .dockerignore patterns are always relative to the
+root. A path excluded by either file is excluded. Nested ignore files are
+not read.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+# Ignore files read from the repository root. Can be changed with the
+# IGNORE_FILES environment variable (comma-separated, empty to disable).
+DEFAULT_IGNORE_FILES = (".gitignore", ".dockerignore")
+
+# Bound on the memo of file names checked against name-only patterns.
+MAX_CACHED_NAMES = 65536
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a slash-separated glob with ** support to a regular expression."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif char == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif char == "?":
+            parts.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                parts.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = end + 1
+        elif char == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
+
+
+class IgnoreFile:
+    """The rules of one ignore file.
+
+    Args:
+        lines: Lines of the file
+        anchored: True for .dockerignore semantics (patterns relative to the
+            root), False for .gitignore semantics
+    """
+
+    def __init__(self, lines: Iterable[str], anchored: bool):
+        # (regex, negate, dir_only, on_name): patterns without a slash are
+        # matched against the last path component only.
+        self.rules: list[tuple[re.Pattern, bool, bool, bool]] = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if anchored else line.rstrip("/")
+            if not line:
+                continue
+            on_name = not anchored and "/" not in line
+            try:
+                regex = re.compile(_glob_to_regex(line.lstrip("/")) + r"\Z")
+            except re.error:
+                continue
+            self.rules.append((regex, negate, dir_only, on_name))
+
+        # Most paths match no rule at all; combined expressions rule them out
+        # without trying every rule in turn. Patterns without ** only match
+        # paths with as many components as they have, and the few distinct
+        # file names in a tree are checked once each.
+        self._path_depth = max(
+            (float("inf") if "**" in r[0].pattern else r[0].pattern.count("/") + 1 for r in self.rules if not r[3]),
+            default=0
+        )
+        self._names: dict[tuple[str, bool], bool] = {}
+        self._any = {
+            (is_dir, on_name): self._combine(
+                r for r in self.rules if r[3] == on_name and (is_dir or not r[2])
+            )
+            for is_dir in (False, True)
+            for on_name in (False, True)
+        }
+
+    @staticmethod
+    def _combine(rules: Iterable[tuple[re.Pattern, bool, bool, bool]]) -> Optional[re.Pattern]:
+        patterns = [f"(?:{r[0].pattern})" for r in rules]
+        return re.compile("|".join(patterns)) if patterns else None
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if the last rule matching the path excludes it."""
+        name = rel_path.rpartition("/")[2]
+        by_path = self._any[is_dir, False]
+        if not (by_path and rel_path.count("/") < self._path_depth and by_path.match(rel_path)):
+            named = self._names.get((name, is_dir))
+            if named is None:
+                by_name = self._any[is_dir, True]
+                named = bool(by_name and by_name.match(name))
+                if len(self._names) >= MAX_CACHED_NAMES:
+                    self._names.clear()
+                self._names[name, is_dir] = named
+            if not named:
+                return False
+        ignored = False
+        for regex, negate, dir_only, on_name in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(name if on_name else rel_path):
+                ignored = not negate
+        return ignored
+
+
+class IgnoreRules:
+    """Combined exclusion rules of a repository's ignore files.
+
+    Args:
+        files: Parsed ignore files
+        names: Names of the ignore files, which are never excluded themselves
+    """
+
+    def __init__(self, files: list[IgnoreFile], names: tuple[str, ...]):
+        self.files = files
+        self.names = names
+
+    @classmethod
+    def load(cls, root: Path) -> "IgnoreRules":
+        """Read the ignore files at a repository root.
+
+        Args:
+            root: Path to the repository root
+
+        Returns:
+            Rules from the files named by IGNORE_FILES that exist
+        """
+        configured = os.getenv("IGNORE_FILES")
+        names = DEFAULT_IGNORE_FILES if configured is None else tuple(n for n in configured.split(",") if n)
+        files = []
+        for name in names:
+            try:
+                lines = (root / name).read_text(errors="replace").splitlines()
+            except OSError:
+                continue
+            files.append(IgnoreFile(lines, anchored=name == ".dockerignore"))
+        return cls(files, names)
+
+    def excludes(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if a path is excluded by any ignore file.
+
+        Only the path itself is checked; callers walking the tree never
+        descend into excluded directories.
+
+        Args:
+            rel_path: POSIX path relative to the root
+            is_dir: Whether the path is a directory
+        """
+        if not self.files or rel_path in self.names:
+            return False
+        return any(f.matches(rel_path, is_dir) for f in self.files)
+
+    def excludes_path(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if a path or any of its parent directories is excluded.
+
+        Args:
+            rel_path: POSIX path relative to the root
+            is_dir: Whether the path is a directory
+        """
+        parts = rel_path.split("/")
+        for i in range(1, len(parts)):
+            if self.excludes("/".join(parts[:i]), True):
+                return True
+        return self.excludes(rel_path, is_dir)
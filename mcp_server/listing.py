@@ -0,0 +1,82 @@
+"""Paginated catalog listings for the preferences MCP server.
+
+Listings are served a page at a time from the catalog's sorted template
+names (see Catalog.select), so a page costs the same with ten templates or
+ten thousand. Pages can be narrowed to a name prefix or a tag, and each
+template can be projected to just its name or to the fields the client
+asks for. Cursors name the last template of the page, so paging through a
+listing stays consistent while templates are added or removed.
+"""
+
+from typing import Optional, Sequence
+
+from .catalog import Catalog, DevcontainerEntry
+from .search_index import decode_cursor, encode_cursor
+
+
+# Default and maximum number of templates per page.
+DEFAULT_LIST_LIMIT = 100
+MAX_LIST_LIMIT = 1000
+
+# Fields a template can be projected to, besides its name.
+LIST_FIELDS = {
+    "files": lambda entry: entry.file_names(recursive=False),
+    "file_count": lambda entry: len(entry.files),
+    "size": lambda entry: entry.size,
+    "tree_hash": lambda entry: entry.tree_hash,
+    "tags": lambda entry: list(entry.tags)
+}
+
+
+def list_devcontainers(
+    catalog: Catalog,
+    fields: Sequence[str] = (),
+    prefix: str = "",
+    tag: Optional[str] = None,
+    limit: int = DEFAULT_LIST_LIMIT,
+    cursor: Optional[str] = None
+) -> dict:
+    """Return one page of the catalog's devcontainer templates, in name order.
+
+    Args:
+        catalog: Catalog snapshot to list
+        fields: Fields to include for each template (see LIST_FIELDS); with
+            none, templates are listed by name only
+        prefix: Only templates whose name starts with this
+        tag: Only templates with this word in their name
+        limit: Maximum number of templates (1 to MAX_LIST_LIMIT)
+        cursor: next_cursor from the previous page of the same listing
+
+    Returns:
+        Dictionary containing:
+        - devcontainers: Names, or {name, ...fields} when fields are given
+        - total: Number of templates matching prefix and tag
+        - next_cursor: Cursor for the next page, or None if there is none
+        - generation: Catalog generation the page was taken from
+
+    Raises:
+        ValueError: If a field is unknown, the limit is out of range or the
+            cursor is invalid
+    """
+    unknown = [field for field in fields if field not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(LIST_FIELDS)}")
+    if not 1 <= limit <= MAX_LIST_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIST_LIMIT}")
+    after = decode_cursor(cursor, "after", str) if cursor is not None else None
+
+    # Ask for one more than a page to learn whether another page follows.
+    entries, total = catalog.select(prefix, tag, after, limit + 1)
+    page = entries[:limit]
+    return {
+        "devcontainers": [_project(entry, fields) for entry in page],
+        "total": total,
+        "next_cursor": encode_cursor({"after": page[-1].name}) if len(entries) > limit else None,
+        "generation": catalog.generation
+    }
+
+
+def _project(entry: DevcontainerEntry, fields: Sequence[str]):
+    if not fields:
+        return entry.name
+    return {"name": entry.name, **{field: LIST_FIELDS[field](entry) for field in fields}}
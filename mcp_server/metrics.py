@@ -0,0 +1,296 @@
+"""Per-handler metrics for the preferences MCP server.
+
+Counts requests and errors and records latency and response-size histograms
+for every resource, tool and prompt, and renders them together with cache,
+index and executor statistics in the Prometheus text format for the
+/metrics route.
+
+All updates happen in middleware on the event loop thread, so recording is a
+handful of list and integer operations with no locks, and one handler never
+waits on another to record its metrics.
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .blobs import blob_store
+from .compare import comparison_cache
+from .executor import BlockingExecutor
+from .overlay import Overlay
+from .prompt_cache import prompt_cache
+
+
+# Latency histogram buckets in seconds.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Response size histogram buckets in bytes.
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+# (kind, name) label of the handler serving the request in progress, set by
+# MetricsMiddleware for the middleware and handlers below it.
+current_handler: ContextVar[Optional[tuple[str, str]]] = ContextVar("current_handler", default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    Args:
+        buckets: Sorted upper bounds of the finite buckets
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record a single value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        """Render the histogram as Prometheus sample lines."""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class HandlerMetrics:
+    """Metrics for a single resource, tool or prompt.
+
+    The admission counters are maintained by AdmissionMiddleware.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.coalesced = 0
+        self.rejected = 0
+        self.running = 0
+        self.queued = 0
+
+
+class MetricsRegistry:
+    """Collection of handler metrics and extra gauge sources."""
+
+    def __init__(self):
+        self.handlers: dict[tuple[str, str], HandlerMetrics] = {}
+        self._collectors: list[Callable[[], dict[str, Any]]] = []
+
+    def handler(self, kind: str, name: str) -> HandlerMetrics:
+        """Return the metrics for a handler, creating them on first use.
+
+        Args:
+            kind: "resource", "tool" or "prompt"
+            name: Tool or prompt name, or resource URI template
+        """
+        key = (kind, name)
+        metrics = self.handlers.get(key)
+        if metrics is None:
+            metrics = self.handlers[key] = HandlerMetrics()
+        return metrics
+
+    def add_collector(self, collector: Callable[[], dict[str, Any]]):
+        """Register a callable returning gauge values to include in the output.
+
+        Args:
+            collector: Callable returning a mapping of metric name to number
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP preferences_requests_total Requests handled, by handler.",
+            "# TYPE preferences_requests_total counter",
+        ]
+        handlers = sorted(self.handlers.items())
+        for (kind, name), metrics in handlers:
+            lines.append(f'preferences_requests_total{{{_labels(kind, name)}}} {metrics.requests}')
+
+        lines += [
+            "# HELP preferences_request_errors_total Requests that raised an error, by handler.",
+            "# TYPE preferences_request_errors_total counter",
+        ]
+        for (kind, name), metrics in handlers:
+            lines.append(f'preferences_request_errors_total{{{_labels(kind, name)}}} {metrics.errors}')
+
+        lines += [
+            "# HELP preferences_request_duration_seconds Request latency, by handler.",
+            "# TYPE preferences_request_duration_seconds histogram",
+        ]
+        for (kind, name), metrics in handlers:
+            lines += metrics.latency.render("preferences_request_duration_seconds", _labels(kind, name))
+
+        lines += [
+            "# HELP preferences_response_size_bytes Response size, by handler.",
+            "# TYPE preferences_response_size_bytes histogram",
+        ]
+        for (kind, name), metrics in handlers:
+            lines += metrics.size.render("preferences_response_size_bytes", _labels(kind, name))
+
+        for metric, attribute, metric_type, help_text in _ADMISSION_SERIES:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {metric_type}"]
+            for (kind, name), metrics in handlers:
+                lines.append(f"{metric}{{{_labels(kind, name)}}} {getattr(metrics, attribute)}")
+
+        for collector in self._collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Admission control series: metric name, HandlerMetrics attribute, type and help.
+_ADMISSION_SERIES = (
+    ("preferences_requests_coalesced_total", "coalesced", "counter",
+     "Requests answered by an identical request already in flight, by handler."),
+    ("preferences_requests_rejected_total", "rejected", "counter",
+     "Requests rejected because the handler's queue was full, by handler."),
+    ("preferences_handler_running", "running", "gauge", "Requests currently running, by handler."),
+    ("preferences_handler_queued", "queued", "gauge", "Requests waiting for a concurrency slot, by handler."),
+)
+
+
+def _labels(kind: str, name: str) -> str:
+    escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+    return f'kind="{kind}",name="{escaped}"'
+
+
+def response_size(result: Any) -> int:
+    """Return the approximate encoded size of a handler result in bytes.
+
+    Handles tool results, resource contents and prompt results.
+    """
+    size = 0
+    if isinstance(result, (list, tuple)):
+        # Resource contents.
+        for item in result:
+            content = getattr(item, "content", "")
+            size += len(content) if isinstance(content, bytes) else len(content.encode())
+        return size
+    for block in getattr(result, "content", None) or []:
+        # Tool result content blocks.
+        text = getattr(block, "text", None)
+        if text is not None:
+            size += len(text.encode())
+    for message in getattr(result, "messages", None) or []:
+        # Prompt messages.
+        text = getattr(message.content, "text", None)
+        if text is not None:
+            size += len(text.encode())
+    return size
+
+
+class MetricsMiddleware(Middleware):
+    """Records request, error, latency and size metrics for every handler.
+
+    Resources are labelled by the URI template that served them, so the
+    number of series stays bounded no matter how many files are read.
+
+    Args:
+        registry: Registry to record into
+        server: Server whose resource templates are used for labels
+    """
+
+    # Number of resolved URI labels remembered before the memo is reset.
+    MAX_URI_LABELS = 10000
+
+    def __init__(self, registry: MetricsRegistry, server: FastMCP):
+        self.registry = registry
+        self.server = server
+        self._uri_labels: dict[str, str] = {}
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        return await self._record("tool", context.message.name, context, call_next)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next):
+        return await self._record("prompt", context.message.name, context, call_next)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        return await self._record("resource", await self._resource_label(str(context.message.uri)), context, call_next)
+
+    async def _record(self, kind: str, name: str, context: MiddlewareContext, call_next):
+        metrics = self.registry.handler(kind, name)
+        metrics.requests += 1
+        start = time.perf_counter()
+        token = current_handler.set((kind, name))
+        try:
+            result = await call_next(context)
+        except Exception:
+            metrics.errors += 1
+            raise
+        finally:
+            current_handler.reset(token)
+            metrics.latency.observe(time.perf_counter() - start)
+        metrics.size.observe(response_size(result))
+        return result
+
+    async def _resource_label(self, uri: str) -> str:
+        label = self._uri_labels.get(uri)
+        if label is not None:
+            return label
+
+        resources = await self.server.get_resources()
+        if uri in resources:
+            label = uri
+        else:
+            label = "unknown"
+            for uri_template, template in (await self.server.get_resource_templates()).items():
+                if template.matches(uri) is not None:
+                    label = uri_template
+                    break
+
+        if len(self._uri_labels) >= self.MAX_URI_LABELS:
+            self._uri_labels.clear()
+        self._uri_labels[uri] = label
+        return label
+
+
+def repository_gauges(repository: Overlay, executor: BlockingExecutor) -> Callable[[], dict[str, Any]]:
+    """Return a collector reporting cache, index, catalog and executor statistics.
+
+    Cache and index statistics are summed over the repository roots. Until
+    warm-up completes the index and catalog gauges are left out, so a
+    scrape never starts or waits for a warm-up; preferences_ready tells the
+    two states apart.
+
+    Args:
+        repository: Repository roots whose catalog, caches and indexes are reported
+        executor: BlockingExecutor whose counters are reported
+
+    Returns:
+        Collector callable for MetricsRegistry.add_collector
+    """
+    def collect() -> dict[str, Any]:
+        ready = repository.is_ready
+        gauges = {"preferences_ready": int(ready)}
+        gauges.update({f"preferences_content_cache_{k}": v for k, v in repository.cache_stats().items()})
+        gauges.update({f"preferences_blob_store_{k}": v for k, v in blob_store.stats().items()})
+        gauges.update({f"preferences_comparison_cache_{k}": v for k, v in comparison_cache.stats().items()})
+        gauges.update({f"preferences_prompt_cache_{k}": v for k, v in prompt_cache.stats().items()})
+        gauges.update({f"preferences_io_executor_{k}": v for k, v in executor.stats().items()})
+        if ready:
+            catalog = repository.catalog
+            gauges.update({f"preferences_search_index_{k}": v for k, v in repository.search_stats().items()})
+            gauges["preferences_catalog_generation"] = catalog.generation
+            gauges["preferences_catalog_devcontainers"] = len(catalog.devcontainers)
+        return gauges
+
+    return collect
@@ -0,0 +1,413 @@
+"""Layered preference repositories served as one.
+
+Several repository roots can be served together, for example per-user
+overrides on top of a team-wide base:
+
+    REPO_PATH=~/preferences:/srv/team-preferences
+
+Roots are listed highest precedence first and are layered file by file,
+like an overlay filesystem: a path is served from the first root that has
+it, and a template present in several roots is the union of their files.
+Files cannot be hidden by a higher root, only replaced.
+
+Each root keeps its own manifest, content cache, indexes and watcher, so a
+very large root does not slow down lookups in the others, and every path is
+still resolved and checked by the root that serves it. Searches, rankings
+and facet queries run on all roots at once on the I/O executor; each root
+leaves out the files shadowed by higher roots, and the results are merged
+in a stable order.
+"""
+
+import asyncio
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .catalog import DEVCONTAINERS_DIR, Catalog, FileInfo, merge_catalogs
+from .executor import run_blocking
+from .facets import FACET_FILES, FacetIndex, TemplateFacets, extract_facets
+from .repository import ManifestEntry, Repository, get_repository
+from .search_index import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, decode_cursor, encode_cursor
+from .similarity import DEFAULT_RANK_LIMIT
+
+
+class _Shadowed:
+    """Container of the paths that exist in any of a set of repositories."""
+
+    def __init__(self, repositories: Sequence[Repository]):
+        self.repositories = repositories
+
+    def __contains__(self, rel_path: str) -> bool:
+        return any(repository.tree.lookup(rel_path) is not None for repository in self.repositories)
+
+
+class Overlay:
+    """Repositories layered in order of precedence, served as one.
+
+    Offers the parts of the Repository interface the request handlers use,
+    with searches and queries as coroutines that fan out across the roots.
+    A single root is served exactly as the repository itself would.
+
+    Args:
+        repositories: Repositories of the roots, highest precedence first
+    """
+
+    def __init__(self, repositories: Sequence[Repository]):
+        if not repositories:
+            raise ValueError("At least one repository root is required")
+        self.repositories = tuple(repositories)
+        self._merged: Optional[tuple[tuple[Catalog, ...], Catalog]] = None
+
+    @property
+    def roots(self) -> list[Path]:
+        """Repository roots, highest precedence first."""
+        return [repository.root for repository in self.repositories]
+
+    @property
+    def is_ready(self) -> bool:
+        """True once every root has completed its initial warm-up."""
+        return all(repository.is_ready for repository in self.repositories)
+
+    @property
+    def warmup_seconds(self) -> Optional[float]:
+        """Warm-up time of the slowest root; roots warm up in parallel."""
+        seconds = [repository.warmup_seconds for repository in self.repositories]
+        return None if None in seconds else max(seconds)
+
+    @property
+    def warmup_phases(self) -> dict[str, float]:
+        """Longest time any root spent in each warm-up phase."""
+        phases: dict[str, float] = {}
+        for repository in self.repositories:
+            for name, seconds in repository.warmup_phases.items():
+                phases[name] = max(phases.get(name, 0.0), seconds)
+        return phases
+
+    @property
+    def snapshot_loaded(self) -> bool:
+        """True if every root was warmed up from its startup snapshot."""
+        return all(repository.snapshot_loaded for repository in self.repositories)
+
+    @property
+    def catalog(self) -> Catalog:
+        """Merged catalog of all roots, rebuilt when any root's catalog changes."""
+        catalogs = tuple(repository.catalog for repository in self.repositories)
+        if len(catalogs) == 1:
+            return catalogs[0]
+        merged = self._merged
+        if merged is None or any(a is not b for a, b in zip(merged[0], catalogs)):
+            merged = self._merged = (catalogs, merge_catalogs(catalogs))
+        return merged[1]
+
+    def warm_up(self):
+        """Warm up every root, in parallel."""
+        if len(self.repositories) == 1:
+            self.repositories[0].warm_up()
+            return
+        with ThreadPoolExecutor(len(self.repositories), thread_name_prefix="preferences-warm-up") as pool:
+            for future in [pool.submit(repository.warm_up) for repository in self.repositories]:
+                future.result()
+
+    async def wait_until_ready(self):
+        """Wait for every root to finish warming up without blocking the event loop."""
+        if not self.is_ready:
+            await asyncio.gather(*(repository.wait_until_ready() for repository in self.repositories))
+
+    def start_watching(self):
+        """Start the watcher of every root."""
+        for repository in self.repositories:
+            repository.start_watching()
+
+    def stop_watching(self):
+        """Stop the watcher of every root."""
+        for repository in self.repositories:
+            repository.stop_watching()
+
+    def locate(self, rel_path: str) -> tuple[Repository, ManifestEntry]:
+        """Resolve a path against the roots in order of precedence.
+
+        Each root applies its own path checks and ignore rules.
+
+        Args:
+            rel_path: Path relative to the repository roots
+
+        Returns:
+            The repository serving the path and its manifest entry there
+
+        Raises:
+            ValueError: If the path is outside the repository or is a
+                directory in the first root that has it
+            FileNotFoundError: If no root has the file
+        """
+        for repository in self.repositories[:-1]:
+            try:
+                return repository.locate(rel_path)
+            except FileNotFoundError:
+                continue
+        return self.repositories[-1].locate(rel_path)
+
+    def resolve(self, rel_path: str) -> ManifestEntry:
+        """Resolve a path like Repository.resolve, in the root that serves it."""
+        return self.locate(rel_path)[1]
+
+    def read_text(self, rel_path: str) -> str:
+        """Read a file from the root that serves it, through that root's cache.
+
+        Raises:
+            ValueError: If the path is outside the repository, is a directory
+                or is not UTF-8 text
+            FileNotFoundError: If no root has the file
+        """
+        repository, _ = self.locate(rel_path)
+        return repository.read_text(rel_path)
+
+    def content_hash(self, rel_path: str) -> Optional[str]:
+        """Return the SHA-256 of a file as served, or None if no root has it."""
+        return self._owner(posixpath.normpath(rel_path)).content_hash(rel_path)
+
+    def file_info(self, rel_path: str) -> Optional[FileInfo]:
+        """Return the hash and classification of a file as served, like Repository.file_info."""
+        rel_path = posixpath.normpath(rel_path)
+        return self._owner(rel_path).file_info(rel_path)
+
+    def _owner(self, rel_path: str) -> Repository:
+        """Return the first root whose manifest has a normalized path, else the last root."""
+        for repository in self.repositories[:-1]:
+            if repository.tree.lookup(rel_path) is not None:
+                return repository
+        return self.repositories[-1]
+
+    def _shadowed(self, position: int) -> Optional[_Shadowed]:
+        return _Shadowed(self.repositories[:position]) if position else None
+
+    async def search(
+        self,
+        query: str,
+        category: str = "all",
+        mode: str = "substring",
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        order: str = "path",
+        max_edits: int = 1,
+        time_budget: Optional[float] = None
+    ) -> dict:
+        """Search every root and return one merged page of results.
+
+        Takes the same arguments and returns the same page as
+        TrigramIndex.search. Each root is asked for a page of its own, in
+        parallel, and the pages are merged in path or score order. The
+        cursor records where every root is to resume. In path order, a root
+        that stopped early (for example on its time budget) holds the merged
+        page back to the last path it reached, so no match is skipped.
+
+        Raises:
+            ValueError: If a parameter, the query or the cursor is invalid
+        """
+        repositories = self.repositories
+        if len(repositories) == 1:
+            return await run_blocking(
+                repositories[0].search_index.search, query, category, mode, limit, offset, cursor, order, max_edits,
+                time_budget
+            )
+
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+        if offset < 0:
+            raise ValueError("offset must be non-negative")
+        if cursor is not None:
+            # None: start from the beginning; False: nothing left.
+            cursors = decode_cursor(cursor, "roots", list)
+            if len(cursors) != len(repositories) or not all(c is None or c is False or isinstance(c, str)
+                                                            for c in cursors):
+                raise ValueError(f"Invalid cursor '{cursor}'")
+            offset = 0
+        else:
+            cursors = [None] * len(repositories)
+        wanted = offset + limit
+        if wanted > MAX_SEARCH_LIMIT:
+            raise ValueError(f"offset + limit must be at most {MAX_SEARCH_LIMIT} when serving several roots; "
+                             "use the cursor to page further")
+
+        active = [i for i, c in enumerate(cursors) if c is not False]
+        pages = dict(zip(active, await asyncio.gather(*(
+            run_blocking(
+                repositories[i].search_index.search, query, category, mode, wanted, 0, cursors[i], order, max_edits,
+                time_budget, self._shadowed(i)
+            )
+            for i in active
+        ))))
+
+        if order == "path":
+            def key(result: dict):
+                return result["path"]
+        else:
+            def key(result: dict):
+                return -result["score"], result["path"]
+        merged = sorted(((key(r), i, r) for i, page in pages.items() for r in page["results"]), key=lambda m: m[0])
+
+        if order == "path":
+            # Roots that have more to read have only been searched up to
+            # their cursor; nothing past the nearest of those is final yet.
+            frontier = min(
+                (decode_cursor(page["next_cursor"], "after", str) for page in pages.values() if page["next_cursor"]),
+                default=None
+            )
+            if frontier is not None:
+                merged = [m for m in merged if m[0] <= frontier]
+        taken = merged[:wanted]
+
+        consumed = {i: [r for _, j, r in taken if j == i] for i in active}
+        for i, page in pages.items():
+            results = consumed[i]
+            if len(results) == len(page["results"]):
+                cursors[i] = page["next_cursor"] if page["next_cursor"] is not None else False
+            elif order == "path":
+                if results:
+                    cursors[i] = encode_cursor({"after": results[-1]["path"]})
+            else:
+                start = decode_cursor(cursors[i], "offset", int) if cursors[i] else 0
+                cursors[i] = encode_cursor({"offset": start + len(results)})
+
+        return {
+            "results": [r for _, _, r in taken[offset:]],
+            "next_cursor": None if all(c is False for c in cursors) else encode_cursor({"roots": cursors}),
+            "timed_out": any(page["timed_out"] for page in pages.values())
+        }
+
+    async def rank(self, query: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Rank the files of every root by BM25 relevance, like SimilarityIndex.rank.
+
+        Each root scores its own files against its own term statistics, in
+        parallel; files shadowed by a higher root are dropped and the rest
+        are merged by score.
+
+        Raises:
+            ValueError: If the limit is out of range or the query has no terms
+        """
+        pages = await asyncio.gather(*(
+            run_blocking(lambda repository=repository: repository.similarity_index.rank(query, category, limit))
+            for repository in self.repositories
+        ))
+        if len(pages) == 1:
+            return pages[0]
+        results = [
+            result
+            for repository, page in zip(self.repositories, pages)
+            for result in page["results"]
+            if self._owner(result["path"]) is repository
+        ]
+        results.sort(key=lambda r: (-r["score"], r["path"]))
+        return {"results": results[:limit], "terms": sorted(set().union(*(page["terms"] for page in pages)))}
+
+    async def related(self, rel_path: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Find files similar to a file, like SimilarityIndex.related.
+
+        The comparison runs in the root that serves the file, against the
+        files of that root that are not shadowed by a higher one.
+
+        Raises:
+            ValueError: If the limit is out of range
+            KeyError: If the file is not indexed
+        """
+        rel_path = posixpath.normpath(rel_path)
+        owner = self._owner(rel_path)
+        result = await run_blocking(lambda: owner.similarity_index.related(rel_path, category, limit))
+        if len(self.repositories) > 1:
+            result["results"] = [r for r in result["results"] if self._owner(r["path"]) is owner]
+        return result
+
+    async def query_templates(self, filters: dict) -> list[TemplateFacets]:
+        """Return the templates matching every facet filter, like FacetIndex.query.
+
+        Every root answers from its own facet index, in parallel. Templates
+        present in several roots are made of files from each, so their
+        facets are extracted again from the files as served.
+
+        Raises:
+            ValueError: If a filter names an unknown facet
+        """
+        matches = await asyncio.gather(*(
+            run_blocking(lambda repository=repository: repository.facet_index.query(filters))
+            for repository in self.repositories
+        ))
+        if len(matches) == 1:
+            return matches[0]
+
+        counts: dict[str, int] = {}
+        for repository in self.repositories:
+            for name in repository.catalog.devcontainers:
+                counts[name] = counts.get(name, 0) + 1
+        layered = sorted(name for name, count in counts.items() if count > 1)
+        results = {facets.name: facets for found in matches for facets in found if counts.get(facets.name, 1) == 1}
+        if layered:
+            for facets in await run_blocking(self._layered_facets(layered).query, filters):
+                results[facets.name] = facets
+        return [results[name] for name in sorted(results)]
+
+    def _layered_facets(self, names: list[str]) -> FacetIndex:
+        """Index the facets of templates as served from several roots."""
+        index = FacetIndex()
+        for name in names:
+            files = {}
+            for file_name in FACET_FILES:
+                try:
+                    files[file_name] = self.read_text(f"{DEVCONTAINERS_DIR}/{name}/{file_name}")
+                except (OSError, ValueError):
+                    continue
+            if files:
+                index.add(extract_facets(name, files))
+        return index
+
+    def search_stats(self) -> dict:
+        """Return the search index counters summed over the roots."""
+        return _sum(repository.search_index.stats() for repository in self.repositories)
+
+    def cache_stats(self) -> dict:
+        """Return the content cache counters summed over the roots."""
+        return _sum(repository.content_cache.stats() for repository in self.repositories)
+
+    def root_stats(self) -> list[dict]:
+        """Return the warm-up, index and cache state of each root."""
+        return [
+            {
+                "root": str(repository.root),
+                "warmup_seconds": round(repository.warmup_seconds or 0.0, 3),
+                "snapshot_loaded": repository.snapshot_loaded,
+                "devcontainers": len(repository.catalog.devcontainers),
+                "search_index": repository.search_index.stats(),
+                "content_cache": repository.content_cache.stats()
+            }
+            for repository in self.repositories
+        ]
+
+
+def _sum(stats) -> dict:
+    total: dict = {}
+    for counters in stats:
+        for key, value in counters.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+_overlays: dict[tuple[Path, ...], Overlay] = {}
+_overlays_lock = threading.Lock()
+
+
+def get_overlay(repo_roots: Sequence[Path]) -> Overlay:
+    """Return the shared overlay of a list of roots, creating it on first use.
+
+    Args:
+        repo_roots: Repository roots, highest precedence first
+
+    Returns:
+        Overlay of the roots' shared repository models
+    """
+    key = tuple(repo_roots)
+    with _overlays_lock:
+        overlay = _overlays.get(key)
+        if overlay is None:
+            overlay = _overlays[key] = Overlay([get_repository(root) for root in key])
+        return overlay
@@ -0,0 +1,378 @@
+"""Opt-in sampling profiler for the preferences MCP server.
+
+When a particular call is slow on a live server, profiling shows where its
+time goes without attaching external tools. Profiling is off by default
+and then costs nothing: no middleware, route, tool or thread is installed.
+Enable it with PROFILING=on (or --profile), after which a request is
+profiled when it asks to be, with an `X-Profile: 1` HTTP header or
+`"profile": true` in the request's `_meta`. PROFILE_SAMPLE_RATE (or
+--profile-sample-rate) additionally profiles that fraction of all requests.
+
+While at least one profiled request is running, a background thread
+samples the stacks of the threads that serve requests (the event loop and
+the I/O workers) every PROFILE_INTERVAL_MS milliseconds, skipping threads
+that are idle. Those threads are shared, so requests running at the same
+time appear in each other's profiles. The last PROFILE_HISTORY profiles
+are kept, and can be listed and downloaded as collapsed stacks, the input
+format of flamegraph.pl and speedscope, through the get_profile tool or the
+/admin/profile route:
+
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" \\
+        "http://localhost:8000/admin/profile?handler=search_preferences" \\
+        | flamegraph.pl > search.svg
+
+Both require the ADMIN_TOKEN bearer token over HTTP; the tool is open over
+stdio, where the client is the local user.
+"""
+
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp.server.lowlevel.server import request_ctx
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from .metrics import MetricsRegistry, current_handler
+
+
+# Default time between two stack samples, in milliseconds.
+DEFAULT_INTERVAL_MS = 5
+
+# Default number of request profiles kept.
+DEFAULT_HISTORY = 100
+
+# Deepest stack recorded; deeper frames are cut off at the root.
+MAX_DEPTH = 128
+
+# Prefix of the names of the I/O worker threads, which are sampled along with the event loop.
+IO_THREAD_PREFIX = "preferences-io"
+
+# Functions a thread is idle in when they are at the top of its stack.
+_IDLE = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker")
+}
+
+
+@dataclass
+class Profile:
+    """Stack samples taken while one request was running.
+
+    Attributes:
+        id: Sequence number of the profile
+        handler: (kind, name) of the profiled handler
+        started: Wall-clock time the request started at
+        seconds: Duration of the request, or None while it is running
+        stacks: Number of samples of each collapsed stack
+        thread: Identifier of the event loop thread serving the request
+    """
+
+    id: int
+    handler: tuple[str, str]
+    started: float
+    seconds: Optional[float] = None
+    stacks: Counter = field(default_factory=Counter)
+    thread: int = field(default_factory=threading.get_ident, repr=False)
+    timer: float = field(default_factory=time.perf_counter, repr=False)
+
+    def summary(self) -> dict:
+        """Return the profile's metadata, without the stacks."""
+        return {
+            "id": self.id,
+            "kind": self.handler[0],
+            "handler": self.handler[1],
+            "started": round(self.started, 3),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "samples": sum(self.stacks.values())
+        }
+
+
+def collapse(profiles: list[Profile]) -> str:
+    """Merge profiles into collapsed-stack text.
+
+    Args:
+        profiles: Profiles to merge
+
+    Returns:
+        One "frame;frame;frame count" line per distinct stack, root frame
+        first, most frequent stack first
+    """
+    total = Counter()
+    for profile in profiles:
+        total.update(profile.stacks)
+    return "".join(f"{stack} {count}\n" for stack, count in total.most_common())
+
+
+class Profiler:
+    """Samples thread stacks while profiled requests are running.
+
+    Args:
+        sample_rate: Fraction of all requests to profile, besides those that
+            ask to be
+        interval: Seconds between two samples
+        history: Number of finished profiles kept
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval: float = DEFAULT_INTERVAL_MS / 1000,
+                 history: int = DEFAULT_HISTORY):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("Profile sample rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._profiles: deque[Profile] = deque(maxlen=history)
+        self._active: list[Profile] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["Profiler"]:
+        """Create a profiler from PROFILING, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS and PROFILE_HISTORY.
+
+        Returns:
+            The profiler, or None if profiling is disabled
+        """
+        sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        if os.getenv("PROFILING", "off").lower() in ("", "0", "off", "false", "no") and not sample_rate:
+            return None
+        return cls(
+            sample_rate,
+            float(os.getenv("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)) / 1000,
+            int(os.getenv("PROFILE_HISTORY", DEFAULT_HISTORY))
+        )
+
+    def start(self, handler: tuple[str, str]) -> Profile:
+        """Start profiling a request, starting the sampling thread if needed.
+
+        Args:
+            handler: (kind, name) of the handler serving the request
+
+        Returns:
+            The profile to pass to stop()
+        """
+        profile = Profile(next(self._ids), handler, time.time())
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="preferences-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def stop(self, profile: Profile):
+        """Finish profiling a request and keep its profile.
+
+        Args:
+            profile: Profile returned by start()
+        """
+        profile.seconds = time.perf_counter() - profile.timer
+        with self._lock:
+            self._active.remove(profile)
+            self._profiles.append(profile)
+
+    def profiles(self, handler: Optional[str] = None, profile_id: Optional[int] = None) -> list[Profile]:
+        """Return finished profiles, oldest first.
+
+        Args:
+            handler: Only profiles of the tool, prompt or resource template
+                with this name
+            profile_id: Only the profile with this id
+
+        Returns:
+            Matching profiles
+        """
+        with self._lock:
+            return [
+                p for p in self._profiles
+                if (handler is None or p.handler[1] == handler) and (profile_id is None or p.id == profile_id)
+            ]
+
+    def clear(self):
+        """Drop every finished profile."""
+        with self._lock:
+            self._profiles.clear()
+
+    def stats(self) -> dict:
+        """Return profiler counters.
+
+        Returns:
+            Dictionary with active, profiles and samples
+        """
+        with self._lock:
+            return {"active": len(self._active), "profiles": len(self._profiles), "samples": self.samples}
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    # Nothing left to profile; the next start() starts a new thread.
+                    self._thread = None
+                    return
+                active = list(self._active)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            loops = {profile.thread for profile in active}
+            stacks = {
+                ident: stack for ident, frame in sys._current_frames().items()
+                if ident != own and (ident in loops or names.get(ident, "").startswith(IO_THREAD_PREFIX))
+                and (stack := _collapse(names.get(ident, str(ident)), frame)) is not None
+            }
+            with self._lock:
+                for profile in active:
+                    profile.stacks.update(
+                        stack for ident, stack in stacks.items() if ident not in loops or ident == profile.thread
+                    )
+                self.samples += len(stacks)
+            time.sleep(self.interval)
+
+
+def _collapse(thread_name: str, frame) -> Optional[str]:
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+        return None
+    frames = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ";".join(reversed(frames))
+
+
+def _requested() -> bool:
+    # Asked for through the request's _meta, or the HTTP header on any transport that has one.
+    context = request_ctx.get(None)
+    if context is not None and getattr(context.meta, "profile", False) is True:
+        return True
+    try:
+        return get_http_request().headers.get("x-profile", "").lower() in ("1", "true", "on")
+    except RuntimeError:
+        return False
+
+
+class ProfilerMiddleware(Middleware):
+    """Profiles the requests that ask for it and a sample of the rest.
+
+    Must be added after MetricsMiddleware, which names the handler.
+
+    Args:
+        profiler: Profiler to record into
+    """
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        return await self._profile(("tool", context.message.name), context, call_next)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        return await self._profile(("resource", str(context.message.uri)), context, call_next)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next):
+        return await self._profile(("prompt", context.message.name), context, call_next)
+
+    async def _profile(self, fallback: tuple[str, str], context: MiddlewareContext, call_next):
+        sampled = self.profiler.sample_rate and random.random() < self.profiler.sample_rate
+        if not sampled and not _requested():
+            return await call_next(context)
+        profile = self.profiler.start(current_handler.get() or fallback)
+        try:
+            return await call_next(context)
+        finally:
+            self.profiler.stop(profile)
+
+
+def is_admin(request: Optional[Request]) -> bool:
+    """Return whether a request carries the ADMIN_TOKEN bearer token.
+
+    Args:
+        request: HTTP request, or None for the stdio transport, which is
+            always trusted
+
+    Returns:
+        True if the request may use admin functions
+    """
+    if request is None:
+        return True
+    token = os.getenv("ADMIN_TOKEN", "")
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(credentials.encode(), token.encode())
+
+
+def register_profiler(mcp: FastMCP, profiler: Profiler, metrics: MetricsRegistry):
+    """Install the profiling middleware, the get_profile tool and the /admin/profile route.
+
+    Args:
+        mcp: FastMCP server instance
+        profiler: Profiler to record into and report from
+        metrics: Registry to report profiler counters in
+    """
+    mcp.add_middleware(ProfilerMiddleware(profiler))
+    metrics.add_collector(lambda: {f"preferences_profiler_{k}": v for k, v in profiler.stats().items()})
+
+    @mcp.tool()
+    async def get_profile(handler: Optional[str] = None, profile_id: Optional[int] = None,
+                          clear: bool = False) -> dict:
+        """Returns sampled stacks of profiled requests (admin only).
+
+        Requests are profiled when they send an "X-Profile: 1" header or
+        "profile": true in their _meta, or are picked at the configured
+        sample rate.
+
+        Args:
+            handler: Only include requests to this tool, prompt or resource
+                template
+            profile_id: Only include the request with this profile id
+            clear: Drop all kept profiles after reading them
+
+        Returns:
+            Dictionary containing:
+            - profiles: Each matching request's id, kind, handler, started
+              (Unix time), seconds and number of samples
+            - collapsed: Their samples merged as collapsed stacks, one
+              "frame;frame count" line per stack, ready for flamegraph.pl
+
+        Raises:
+            ToolError: If the caller is not an admin
+        """
+        try:
+            request = get_http_request()
+        except RuntimeError:
+            request = None
+        if not is_admin(request):
+            raise ToolError("get_profile requires the admin token")
+
+        profiles = profiler.profiles(handler, profile_id)
+        result = {"profiles": [p.summary() for p in profiles], "collapsed": collapse(profiles)}
+        if clear:
+            profiler.clear()
+        return result
+
+    @mcp.custom_route("/admin/profile", methods=["GET"])
+    async def download_profile(request: Request):
+        """Collapsed stacks of the kept profiles, filtered by ?handler= and ?id=; ?format=json lists them."""
+        if not is_admin(request):
+            return JSONResponse({"error": "Admin token required"}, status_code=403)
+        try:
+            profile_id = int(request.query_params["id"]) if "id" in request.query_params else None
+        except ValueError:
+            return JSONResponse({"error": "id must be an integer"}, status_code=400)
+
+        profiles = profiler.profiles(request.query_params.get("handler"), profile_id)
+        if request.query_params.get("format") == "json":
+            return JSONResponse({"profiles": [p.summary() for p in profiles]})
+        return PlainTextResponse(collapse(profiles))
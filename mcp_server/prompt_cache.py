@@ -0,0 +1,383 @@
+"""Pre-rendered prompts with section-level invalidation.
+
+Prompts built from guides are rendered once and memoized. Guides are split
+into sections at their level 2 and 3 headings, and each rendering is keyed
+by the digests of the sections it was made from, so a prompt call costs a
+dictionary lookup, and editing one section of a guide only re-renders the
+prompts that include that section. Stale renderings are never looked up
+again and age out of the LRU.
+
+Each section also keeps a precomputed condensed form without its code
+examples. A prompt can ask for the sections relevant to one language and
+for a token budget: when the full text is over budget the condensed
+sections are served instead, and when those are still over budget the
+trailing sections are left out and named, so the client can fetch them
+from the guide resource if it needs them.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .blobs import content_digest
+
+
+# Rough number of UTF-8 bytes per token, used to turn token budgets into byte budgets.
+BYTES_PER_TOKEN = 4
+
+# Default number of memoized renderings.
+DEFAULT_MAX_RENDERINGS = 128
+
+# Languages recognised in section headings, with the words that name them.
+LANGUAGES = {
+    "python": ("python",),
+    "javascript": ("javascript", "js"),
+    "typescript": ("typescript", "ts"),
+    "go": ("go", "golang"),
+    "rust": ("rust",),
+    "java": ("java",),
+    "c": ("c",),
+    "cpp": ("c++", "cpp"),
+    "csharp": ("c#", "csharp"),
+    "ruby": ("ruby",),
+    "shell": ("shell", "bash", "sh")
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def _languages(title: str) -> frozenset[str]:
+    words = set(_WORD.findall(title.lower()))
+    return frozenset(name for name, aliases in LANGUAGES.items() if words.intersection(aliases))
+
+
+def _heading_level(line: str) -> int:
+    match = _HEADING.match(line)
+    return len(match.group(1)) if match else 0
+
+
+@dataclass(frozen=True)
+class Section:
+    """A section of a guide, from one level 2 or 3 heading to the next.
+
+    Attributes:
+        titles: Headings leading to the section, outermost first; empty for
+            the text before the first heading
+        text: The section's text, starting with its heading
+        condensed: The text without code examples
+        digest: Digest of the titles and text
+        languages: Languages named in the section's headings
+    """
+
+    titles: tuple[str, ...]
+    text: str
+    condensed: str
+    digest: str
+    languages: frozenset[str]
+
+    @property
+    def empty(self) -> bool:
+        """True if the section is nothing but its heading."""
+        return not any(line.strip() for line in self.text.splitlines()[1:])
+
+
+@dataclass(frozen=True)
+class Guide:
+    """A guide split into sections.
+
+    Attributes:
+        path: Path of the guide relative to the repository root
+        digest: Digest of the guide's contents
+        sections: Sections in document order; their texts join to the guide
+    """
+
+    path: str
+    digest: str
+    sections: tuple[Section, ...]
+    _selections: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def select(self, language: Optional[str] = None) -> tuple[Section, ...]:
+        """Return the sections relevant to a language.
+
+        Sections whose headings name no language are always included, and
+        sections naming some other language are left out. A heading with
+        nothing under it is kept only if one of its subsections is.
+
+        Args:
+            language: Language name or alias (e.g. "python", "ts"), or None
+                for every section
+
+        Returns:
+            Selected sections in document order
+        """
+        if language is None:
+            return self.sections
+        wanted = _languages(language) or frozenset([language.strip().lower()])
+        selection = self._selections.get(wanted)
+        if selection is None:
+            keep = [not s.languages or bool(s.languages & wanted) for s in self.sections]
+            for i, section in enumerate(self.sections):
+                if keep[i] and section.empty:
+                    # Keep a bare heading only if a subsection follows it.
+                    depth = len(section.titles)
+                    following = [j for j in range(i + 1, len(self.sections))
+                                 if self.sections[j].titles[:depth] == section.titles]
+                    keep[i] = any(keep[j] for j in following)
+            selection = self._selections[wanted] = tuple(s for s, k in zip(self.sections, keep) if k)
+        return selection
+
+
+def split_sections(text: str) -> list[tuple[tuple[str, ...], str]]:
+    """Split markdown at its level 2 and 3 headings.
+
+    Headings inside fenced code blocks are ignored, and the text before the
+    first such heading (title and introduction) forms the first section.
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        (titles, text) pairs in document order, whose texts join to the input
+    """
+    sections = []
+    titles: tuple[str, ...] = ()
+    current: list[str] = []
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        level = 0 if in_fence else _heading_level(line)
+        if level in (2, 3):
+            if current:
+                sections.append((titles, "".join(current)))
+            title = _HEADING.match(line).group(2)
+            titles = (title,) if level == 2 else titles[:1] + (title,)
+            current = []
+        current.append(line)
+    if current:
+        sections.append((titles, "".join(current)))
+    return sections
+
+
+def condense(text: str) -> str:
+    """Remove the fenced code blocks of a section.
+
+    Blocks are kept when they are all the section has, and subheadings that
+    only introduced a removed block are removed with it.
+
+    Args:
+        text: Section text, starting with its heading
+
+    Returns:
+        Condensed text
+    """
+    kept = []
+    fenced = in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            fenced = True
+        elif not in_fence:
+            kept.append(line)
+    prose = [line for line in kept[1:] if line.strip() and not _heading_level(line)]
+    if not fenced or not prose:
+        return text
+
+    lines = []
+    for i, line in enumerate(kept):
+        if i and _heading_level(line) >= 4:
+            rest = next((following for following in kept[i + 1:] if following.strip()), None)
+            if rest is None or _heading_level(rest):
+                continue
+        if not line.strip() and (not lines or not lines[-1].strip()):
+            continue
+        lines.append(line)
+    if text.endswith("\n\n") and lines and lines[-1].strip():
+        # Keep the blank line that separates the section from the next one.
+        lines.append("\n")
+    return "".join(lines)
+
+
+def parse_guide(path: str, text: str, previous: Optional[Guide] = None) -> Guide:
+    """Split a guide into sections.
+
+    Args:
+        path: Path of the guide relative to the repository root
+        text: Contents of the guide
+        previous: Earlier version of the guide, whose unchanged sections are
+            reused rather than condensed again
+
+    Returns:
+        The parsed guide
+    """
+    reuse = {s.digest: s for s in previous.sections} if previous is not None else {}
+    sections = []
+    for titles, section_text in split_sections(text):
+        digest = content_digest("\0".join(titles + (section_text,)))
+        section = reuse.get(digest)
+        if section is None:
+            languages = frozenset().union(*(_languages(title) for title in titles))
+            section = Section(titles, section_text, condense(section_text), digest, languages)
+        sections.append(section)
+    return Guide(path, content_digest(text), tuple(sections))
+
+
+class PromptCache:
+    """Parsed guides and an LRU of rendered prompts.
+
+    Args:
+        max_renderings: Maximum number of renderings kept
+    """
+
+    def __init__(self, max_renderings: int = DEFAULT_MAX_RENDERINGS):
+        self.max_renderings = max_renderings
+        self._guides: dict[str, Guide] = {}
+        self._renderings: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.parses = 0
+
+    def guide(self, path: str, digest: str) -> Optional[Guide]:
+        """Return a parsed guide if it is current.
+
+        Args:
+            path: Path of the guide relative to the repository root
+            digest: Digest of the guide's current contents
+
+        Returns:
+            The parsed guide, or None if it must be parsed again
+        """
+        guide = self._guides.get(path)
+        return guide if guide is not None and guide.digest == digest else None
+
+    def parse(self, path: str, text: str) -> Guide:
+        """Parse a guide and keep it, in place of any earlier version.
+
+        Args:
+            path: Path of the guide relative to the repository root
+            text: Contents of the guide
+
+        Returns:
+            The parsed guide
+        """
+        with self._lock:
+            guide = self._guides[path] = parse_guide(path, text, self._guides.get(path))
+            self.parses += 1
+        return guide
+
+    def render(self, key: tuple, build: Callable[[], str]) -> str:
+        """Return a memoized rendering, building it on a miss.
+
+        Args:
+            key: Everything the rendering depends on
+            build: Callable producing the rendering
+
+        Returns:
+            The rendered prompt
+        """
+        with self._lock:
+            rendered = self._renderings.get(key)
+            if rendered is not None:
+                self._renderings.move_to_end(key)
+                self.hits += 1
+                return rendered
+
+        rendered = build()
+        with self._lock:
+            self._renderings[key] = rendered
+            self._renderings.move_to_end(key)
+            self.renders += 1
+            while len(self._renderings) > self.max_renderings:
+                self._renderings.popitem(last=False)
+        return rendered
+
+    def render_guide(self, guide: Guide, header: str, footer: str, source: str,
+                     language: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        """Render a prompt from the sections of a guide.
+
+        Args:
+            guide: Parsed guide
+            header: Text before the guide
+            footer: Text after the guide
+            source: Where the full guide can be read, named when sections are
+                left out
+            language: Only include sections relevant to this language
+            max_tokens: Approximate budget for the whole prompt
+
+        Returns:
+            The rendered prompt
+
+        Raises:
+            ValueError: If max_tokens is not positive
+        """
+        if max_tokens is not None and max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        sections = guide.select(language)
+        key = ("guide", header, footer, source, max_tokens, tuple(s.digest for s in sections))
+        return self.render(key, lambda: _fit(sections, header, footer, source, max_tokens))
+
+    def stats(self) -> dict:
+        """Return memo counters and current occupancy.
+
+        Returns:
+            Dictionary with hits, renders, parses, guides, renderings, bytes
+            and max_renderings
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "renders": self.renders,
+                "parses": self.parses,
+                "guides": len(self._guides),
+                "renderings": len(self._renderings),
+                "bytes": sum(len(rendered.encode("utf-8")) for rendered in self._renderings.values()),
+                "max_renderings": self.max_renderings
+            }
+
+
+def _fit(sections: tuple[Section, ...], header: str, footer: str, source: str, max_tokens: Optional[int]) -> str:
+    full = header + "".join(s.text for s in sections) + footer
+    if max_tokens is None:
+        return full
+    budget = max_tokens * BYTES_PER_TOKEN
+    if len(full.encode("utf-8")) <= budget:
+        return full
+    condensed = header + "".join(s.condensed for s in sections) + footer
+    size = len(condensed.encode("utf-8"))
+    if size <= budget:
+        return condensed
+
+    # Leave out trailing sections until the rest and the note fit.
+    kept = list(sections)
+    omitted: list[Section] = []
+    while kept:
+        if size + len(_omitted_note(kept, omitted, source).encode("utf-8")) <= budget:
+            break
+        section = kept.pop()
+        size -= len(section.condensed.encode("utf-8"))
+        omitted.insert(0, section)
+    return header + "".join(s.condensed for s in kept) + _omitted_note(kept, omitted, source) + footer
+
+
+def _omitted_note(kept: list[Section], omitted: list[Section], source: str) -> str:
+    if not omitted:
+        return ""
+    # Name whole top-level sections, and subsections only of the one that was cut short.
+    partial = kept[-1].titles[:1] if kept else None
+    names = []
+    for section in omitted:
+        name = " > ".join(section.titles) if section.titles[:1] == partial else " > ".join(section.titles[:1])
+        if name not in names:
+            names.append(name)
+    return f"\n(Left out to fit the budget: {'; '.join(n or 'introduction' for n in names)}. Read {source} for them.)\n"
+
+
+# Shared prompt memo. Its size can be tuned with the PROMPT_CACHE_SIZE
+# environment variable.
+prompt_cache = PromptCache(int(os.getenv("PROMPT_CACHE_SIZE", DEFAULT_MAX_RENDERINGS)))
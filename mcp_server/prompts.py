@@ -3,15 +3,23 @@
 Prompts provide automatic context injection to guide AI assistants
 in following preferred coding styles and patterns. Be carefult not
 to flood prompts with too much information.
+
+Prompts are rendered once and served from the prompt cache until a section
+of their guide changes; clients can ask for a single language's guidelines
+or a token budget to receive less.
 """
 
-from pathlib import Path
+from typing import Optional
+
 from fastmcp import FastMCP
+from fastmcp.exceptions import PromptError
 
-from .utils import read_file_safe
+from .executor import run_blocking
+from .overlay import Overlay
+from .prompt_cache import Guide, prompt_cache
 
 
-def register_prompts(mcp: FastMCP, repo_root: Path):
+def register_prompts(mcp: FastMCP, repository: Overlay):
     """Register all prompts with the MCP server.
 
     These prompts are automatically available to AI assistants and provide
@@ -19,14 +27,37 @@ def register_prompts(mcp: FastMCP, repo_root: Path):
 
     Args:
         mcp: FastMCP server instance.
-        repo_root: Path to the repository root.
+        repository: Repository roots to serve.
     """
 
+    async def load_guide(path: str) -> Optional[Guide]:
+        # The catalog records each guide's digest, so a guide is only read
+        # and split again after it changes.
+        f = repository.catalog.guides.get(path)
+        if f is None:
+            return None
+        guide = prompt_cache.guide(path, f.sha256)
+        if guide is None:
+            try:
+                text = await run_blocking(repository.read_text, path)
+            except (FileNotFoundError, ValueError):
+                # A guide that is not UTF-8 text is treated like a missing one.
+                return None
+            guide = prompt_cache.parse(path, text)
+        return guide
+
+    def render(guide: Guide, header: str, footer: str, source: str,
+               language: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        try:
+            return prompt_cache.render_guide(guide, header, footer, source, language, max_tokens)
+        except ValueError as e:
+            raise PromptError(str(e))
+
     @mcp.prompt(
         description="Provides coding style guidelines that should be followed for all code",
         tags={"style", "guidelines", "formatting"}
     )
-    def coding_style_guidelines() -> str:
+    async def coding_style_guidelines(language: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
         """Coding style guidelines for this user's projects.
 
         This prompt provides comprehensive style guidelines including:
@@ -37,23 +68,30 @@ def register_prompts(mcp: FastMCP, repo_root: Path):
 
         These guidelines should be automatically applied to all code written
         without needing explicit user reminders.
-        """
-        style_path = repo_root / "STYLE.md"
-        try:
-            style_content = read_file_safe(style_path, repo_root)
-            return f"""You must follow these coding style guidelines for all code you write:
-
-{style_content}
 
-IMPORTANT: Apply these guidelines automatically to all code without being prompted."""
-        except FileNotFoundError:
+        Args:
+            language: Only include the general guidelines and those for this
+                language (e.g. "python", "typescript").
+            max_tokens: Approximate budget; code examples and then trailing
+                sections are left out to stay within it.
+        """
+        guide = await load_guide("STYLE.md")
+        if guide is None:
             return "Style guidelines not found. Use sensible defaults: 120 char lines, complete sentences in comments."
+        return render(
+            guide,
+            "You must follow these coding style guidelines for all code you write:\n\n",
+            "\n\nIMPORTANT: Apply these guidelines automatically to all code without being prompted.",
+            "preferences://guide/style",
+            language,
+            max_tokens
+        )
 
     @mcp.prompt(
         description="Information about available devcontainer templates and configuration preferences",
         tags={"devcontainer", "docker", "development"}
     )
-    def devcontainer_preferences() -> str:
+    async def devcontainer_preferences() -> str:
         """Available devcontainer templates and configuration patterns.
 
         Provides information about the user's preferred devcontainer setups.
@@ -61,51 +99,53 @@ IMPORTANT: Apply these guidelines automatically to all code without being prompt
         Use this when setting up development environments or when asked about
         container configurations.
         """
-        devcontainer_dir = repo_root / "templates" / "devcontainers"
-        available = []
+        catalog = repository.catalog
 
-        if devcontainer_dir.exists():
-            for dc_dir in devcontainer_dir.iterdir():
-                if dc_dir.is_dir() and not dc_dir.name.startswith("."):
-                    available.append(dc_dir.name)
-
-        if not available:
+        if not catalog.devcontainers:
             return "No devcontainer templates found."
 
-        template_list = "\n".join(f"- {name}" for name in sorted(available))
-
-        return f"""Available devcontainer templates:
-
-{template_list}
-
-These templates represent the user's preferred development environment configurations.
-When setting up a new project or configuring a devcontainer, consider using one of these
-as a starting point.
-
-To access a specific template's configuration files, use the MCP tools:
-- list_devcontainer_files(name) to see all files in a template.
-- Use resources like preferences://devcontainer/{{name}}/config for specific files.
-"""
+        return prompt_cache.render(("devcontainers", catalog.tree_hash), lambda: _devcontainer_list(catalog.names))
 
     @mcp.prompt(
         description="General project guidance and how to use this preferences repository",
         tags={"guide", "documentation", "preferences"}
     )
-    def repository_guide() -> str:
+    async def repository_guide(max_tokens: Optional[int] = None) -> str:
         """Guidance on using the preferences repository.
 
         Explains the purpose of this preferences repository and how to apply
         these patterns to other projects.
+
+        Args:
+            max_tokens: Approximate budget; code examples and then trailing
+                sections are left out to stay within it.
         """
-        claude_md_path = repo_root / "CLAUDE.md"
-        try:
-            claude_content = read_file_safe(claude_md_path, repo_root)
-            return f"""Repository Usage Guide:
+        guide = await load_guide("CLAUDE.md")
+        if guide is None:
+            return "Repository guide not found."
+        return render(
+            guide,
+            "Repository Usage Guide:\n\n",
+            "\n\nThis repository serves as a reference for preferred patterns and configurations.\n"
+            "When working on other projects, consult these preferences to understand the user's\n"
+            "preferred approaches to common development tasks.",
+            "preferences://guide/claude",
+            max_tokens=max_tokens
+        )
 
-{claude_content}
 
-This repository serves as a reference for preferred patterns and configurations.
-When working on other projects, consult these preferences to understand the user's
-preferred approaches to common development tasks."""
-        except FileNotFoundError:
-            return "Repository guide not found."
+def _devcontainer_list(available: list[str]) -> str:
+    template_list = "\n".join(f"- {name}" for name in available)
+
+    return f"""Available devcontainer templates:
+
+{template_list}
+
+These templates represent the user's preferred development environment configurations.
+When setting up a new project or configuring a devcontainer, consider using one of these
+as a starting point.
+
+To access a specific template's configuration files, use the MCP tools:
+- list_devcontainer_files(name) to see all files in a template.
+- Use resources like preferences://devcontainer/{{name}}/config for specific files.
+"""
@@ -0,0 +1,171 @@
+"""Traffic capture for the preferences MCP server.
+
+In record mode (--record PATH, or RECORD_PATH) every resource read, tool
+call and prompt request is appended to a JSONL trace, one compact object
+per request:
+
+    {"t": 12.3456, "session": 1, "kind": "tool", "name": "search_preferences",
+     "args": {"query": "python"}, "ms": 4.21, "bytes": 1834}
+
+t is the time the request arrived, in seconds since recording started. The
+session numbers the client session it came from. kind and name identify
+the handler, with the resource URI as the name of a resource read. Resource
+reads also carry "handler", the URI template that served them. ms and bytes
+are the latency and response size, and "error" holds the exception type of
+a failed request. benchmarks.replay re-issues a trace against a server to
+reproduce the real request mix.
+
+Lines are buffered and written out at least once a second, so recording
+adds no system call to most requests.
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Optional, TextIO
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp.server.lowlevel.server import request_ctx
+
+from .metrics import current_handler, response_size
+
+
+# Seconds between flushes of the trace file.
+FLUSH_INTERVAL = 1.0
+
+
+class TrafficRecorder:
+    """Appends request records to a JSONL trace file.
+
+    Args:
+        path: Trace file; appended to if it exists
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file: Optional[TextIO] = self._open()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._flushed = self._started
+        self._sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._session_count = 0
+        self.records = 0
+
+    def _open(self) -> TextIO:
+        return open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+
+    @classmethod
+    def from_env(cls) -> Optional["TrafficRecorder"]:
+        """Create a recorder writing to RECORD_PATH, or return None if it is not set."""
+        path = os.getenv("RECORD_PATH")
+        return cls(Path(path)) if path else None
+
+    def elapsed(self) -> float:
+        """Return the seconds since recording started."""
+        return time.perf_counter() - self._started
+
+    def session(self, key: Any) -> int:
+        """Return the number of a client session, numbering new sessions in order of appearance.
+
+        Args:
+            key: Object identifying the session
+        """
+        number = self._sessions.get(key)
+        if number is None:
+            self._session_count += 1
+            number = self._sessions[key] = self._session_count
+        return number
+
+    def write(self, record: dict):
+        """Append one record to the trace.
+
+        Args:
+            record: JSON-serializable request record
+        """
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                # Closed at the end of an earlier lifespan; a server can be
+                # started again in the same process.
+                self._file = self._open()
+            self._file.write(line)
+            self.records += 1
+            now = time.perf_counter()
+            if now - self._flushed >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed = now
+
+    def flush(self):
+        """Write out buffered records."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            self._flushed = time.perf_counter()
+
+    def close(self):
+        """Write out buffered records and close the trace file.
+
+        A later write opens the file again, appending to it.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        """Return the number of requests recorded."""
+        return {"records": self.records}
+
+
+class RecorderMiddleware(Middleware):
+    """Records every resource read, tool call and prompt request.
+
+    Must be added after MetricsMiddleware, which names the handler.
+
+    Args:
+        recorder: Recorder to append records to
+    """
+
+    def __init__(self, recorder: TrafficRecorder):
+        self.recorder = recorder
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        message = context.message
+        return await self._record("tool", message.name, message.arguments, context, call_next)
+
+    async def on_read_resource(self, context: MiddlewareContext, call_next):
+        return await self._record("resource", str(context.message.uri), None, context, call_next)
+
+    async def on_get_prompt(self, context: MiddlewareContext, call_next):
+        message = context.message
+        return await self._record("prompt", message.name, message.arguments, context, call_next)
+
+    async def _record(self, kind: str, name: str, arguments: Optional[dict], context: MiddlewareContext, call_next):
+        request = request_ctx.get(None)
+        record = {
+            "t": round(self.recorder.elapsed(), 4),
+            "session": self.recorder.session(request.session) if request is not None else 0,
+            "kind": kind,
+            "name": name
+        }
+        handler = current_handler.get()
+        if kind == "resource" and handler is not None and handler[1] != name:
+            record["handler"] = handler[1]
+        if arguments:
+            record["args"] = arguments
+
+        start = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception as e:
+            record["ms"] = round((time.perf_counter() - start) * 1000, 3)
+            record["error"] = type(e).__name__
+            self.recorder.write(record)
+            raise
+        record["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        record["bytes"] = response_size(result)
+        self.recorder.write(record)
+        return result
@@ -0,0 +1,681 @@
+"""In-memory repository model for the preferences MCP server.
+
+Holds a model of the files under the repository root together with the
+caches and indexes derived from it. A background watcher keeps the model
+current by applying per-file deltas, so request handlers never need to walk
+the directory tree.
+"""
+
+import logging
+import os
+import posixpath
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from .cache import ContentCache, FileSignature, cache_for
+from .catalog import DEVCONTAINERS_DIR, GUIDES, Catalog, FileInfo, build_catalog, inspect_file
+from .executor import run_blocking
+from .facets import FACET_FILES, FacetIndex, build_facet_index, template_facets
+from .ignore import IgnoreRules
+from .search_index import TrigramIndex, build_search_index, document_for_path
+from .similarity import SimilarityIndex, build_similarity_index
+from .snapshot import default_snapshot_path, load_snapshot
+from .utils import read_file_safe
+
+
+logger = logging.getLogger(__name__)
+
+# Directory names that are never scanned or watched.
+IGNORED_DIRS = {
+    ".git", "__pycache__", ".venv", "venv", "node_modules",
+    ".pytest_cache", ".mypy_cache", ".ruff_cache", ".tox", ".nox"
+}
+
+
+class FileChange(NamedTuple):
+    """A single delta applied to the repository model.
+
+    Attributes:
+        kind: One of "added", "modified" or "deleted"
+        path: POSIX path relative to the repository root
+    """
+
+    kind: str
+    path: str
+
+
+def _join(prefix: str, name: str) -> str:
+    return f"{prefix}/{name}" if prefix else name
+
+
+class ManifestEntry(NamedTuple):
+    """A file the server may serve.
+
+    Attributes:
+        path: Normalized POSIX path relative to the repository root
+        resolved: Absolute path to read, with symlinks resolved
+        signature: Stat signature of the file
+    """
+
+    path: str
+    resolved: Path
+    signature: FileSignature
+
+
+class RepositoryTree:
+    """In-memory model of the files and directories under a repository root.
+
+    Paths are stored as POSIX strings relative to the root. Directory
+    symlinks are not followed, IGNORED_DIRS are skipped, and so is anything
+    excluded by the root .gitignore or .dockerignore (see ignore.py). File
+    symlinks are kept only if they point to a file inside the repository.
+
+    The model doubles as the manifest of servable files: a path is allowed
+    if and only if it is a key of the model, so access checks are a single
+    dictionary lookup.
+
+    Args:
+        root: Path to the repository root
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.real_root = os.path.realpath(root)
+        self.rules = IgnoreRules.load(root)
+        self._files: dict[str, FileSignature] = {}
+        self._links: dict[str, Path] = {}
+        self._dirs: set[str] = set()
+        self._listeners: list[Callable[[list[FileChange]], None]] = []
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[list[FileChange]], None]):
+        """Register a callback invoked with each batch of applied changes.
+
+        Args:
+            listener: Callable receiving a list of FileChange
+        """
+        self._listeners.append(listener)
+
+    def refresh(self, rel_path: str = "") -> list[FileChange]:
+        """Re-stat a path and apply any differences to the model.
+
+        The path may be a file, a directory (rescanned recursively) or a path
+        that no longer exists (removed along with anything beneath it).
+
+        Args:
+            rel_path: POSIX path relative to the root; empty for the whole tree
+
+        Returns:
+            Changes applied to the model
+        """
+        return self.refresh_many([rel_path])
+
+    def refresh_many(self, rel_paths: Iterable[str]) -> list[FileChange]:
+        """Re-stat several paths and apply the differences as one batch.
+
+        Listeners are notified once with the changes to all of the paths, so
+        a burst of edits such as a git checkout is indexed in one pass.
+
+        Args:
+            rel_paths: POSIX paths relative to the root, as for refresh()
+
+        Returns:
+            Changes applied to the model
+        """
+        paths = sorted(set(rel_paths))
+        if "" in paths:
+            paths = [""]
+        changes: list[FileChange] = []
+        rescanned: set[str] = set()
+        for rel_path in paths:
+            # A directory rescan already covers everything beneath it.
+            parent = posixpath.dirname(rel_path)
+            while parent and parent not in rescanned:
+                parent = posixpath.dirname(parent)
+            if parent:
+                continue
+            changes += self._refresh(rel_path)
+            if self.is_dir(rel_path):
+                rescanned.add(rel_path)
+
+        if changes:
+            for listener in list(self._listeners):
+                try:
+                    listener(changes)
+                except Exception:
+                    # The model is already updated; a failing listener must
+                    # not keep the others from seeing the changes.
+                    logger.exception("Failed to apply %d repository changes in %s", len(changes), listener)
+
+        if any(change.path in self.rules.names for change in changes):
+            # The exclusion rules changed; apply them to the whole tree.
+            self.rules = IgnoreRules.load(self.root)
+            changes += self.refresh()
+        return changes
+
+    def _refresh(self, rel_path: str) -> list[FileChange]:
+        # Scans are serialized, so a slow scan can never apply an older
+        # state of a path over a newer one found by a scan that began later.
+        with self._refresh_lock:
+            files: dict[str, FileSignature] = {}
+            links: dict[str, Path] = {}
+            dirs: set[str] = set()
+            full_path = self.root / rel_path if rel_path else self.root
+            st = None
+            if not rel_path or self._allowed(rel_path):
+                try:
+                    st = full_path.lstat()
+                except OSError:
+                    pass
+
+            if st is not None and stat.S_ISDIR(st.st_mode):
+                if not rel_path or not self.rules.excludes_path(rel_path, True):
+                    dirs.add(rel_path)
+                    self._scan(full_path, rel_path, files, links, dirs)
+            elif st is not None and not self.rules.excludes_path(rel_path, False):
+                self._add_file(str(full_path), rel_path, st, files, links)
+
+            with self._lock:
+                changes = []
+                prefix = f"{rel_path}/" if rel_path else ""
+                # Only a directory, then or now, can have anything beneath it.
+                subtree = not rel_path or bool(dirs) or rel_path in self._dirs
+                if subtree:
+                    old_files = [p for p in self._files if p == rel_path or p.startswith(prefix)]
+                else:
+                    old_files = [rel_path] if rel_path in self._files else []
+                for path in old_files:
+                    if path not in files:
+                        del self._files[path]
+                        self._links.pop(path, None)
+                        changes.append(FileChange("deleted", path))
+                for path, signature in files.items():
+                    previous = self._files.get(path)
+                    if previous is None:
+                        changes.append(FileChange("added", path))
+                    elif previous != signature:
+                        changes.append(FileChange("modified", path))
+                    self._files[path] = signature
+                    if path in links:
+                        self._links[path] = links[path]
+                    else:
+                        self._links.pop(path, None)
+                if subtree:
+                    self._dirs = {d for d in self._dirs if not (d == rel_path or d.startswith(prefix))} | dirs
+                if rel_path and dirs:
+                    # Make sure the parents of a newly created directory are known.
+                    parent = Path(rel_path).parent
+                    while parent != Path("."):
+                        self._dirs.add(parent.as_posix())
+                        parent = parent.parent
+            return changes
+
+    def _allowed(self, rel_path: str) -> bool:
+        """Return True if a path may be in the model at all.
+
+        Rejects paths in IGNORED_DIRS and paths whose parent directory is
+        reached through a symlink, which the scan never follows.
+        """
+        if any(part in IGNORED_DIRS for part in rel_path.split("/")):
+            return False
+        parent = posixpath.dirname(rel_path)
+        if not parent:
+            return True
+        return os.path.realpath(os.path.join(self.real_root, parent)) == os.path.join(self.real_root, parent)
+
+    def _add_file(self, full_path: str, rel_path: str, st: os.stat_result, files: dict, links: dict):
+        if stat.S_ISLNK(st.st_mode):
+            target = os.path.realpath(full_path)
+            if not target.startswith(self.real_root + os.sep):
+                return
+            try:
+                st = os.stat(target)
+            except OSError:
+                return
+            links[rel_path] = Path(target)
+        if stat.S_ISREG(st.st_mode):
+            files[rel_path] = FileSignature.from_stat(st)
+
+    def _scan(self, directory: Path, rel_dir: str, files: dict, links: dict, dirs: set):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            rel_path = _join(rel_dir, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS and not self.rules.excludes(rel_path, True):
+                        dirs.add(rel_path)
+                        self._scan(Path(entry.path), rel_path, files, links, dirs)
+                elif not self.rules.excludes(rel_path, False):
+                    self._add_file(entry.path, rel_path, entry.stat(follow_symlinks=False), files, links)
+            except OSError:
+                continue
+
+    def lookup(self, rel_path: str) -> Optional[ManifestEntry]:
+        """Return the manifest entry of a known file, or None.
+
+        Args:
+            rel_path: Normalized POSIX path relative to the root
+        """
+        with self._lock:
+            signature = self._files.get(rel_path)
+            if signature is None:
+                return None
+            resolved = self._links.get(rel_path) or Path(self.real_root, rel_path)
+        return ManifestEntry(rel_path, resolved, signature)
+
+    def is_dir(self, rel_path: str) -> bool:
+        """Return True if the path is a known directory."""
+        with self._lock:
+            return rel_path in self._dirs
+
+    def signature(self, rel_path: str) -> Optional[FileSignature]:
+        """Return the stat signature of a known file, or None."""
+        with self._lock:
+            return self._files.get(rel_path)
+
+    def paths(self) -> list[str]:
+        """Return all known file paths, sorted."""
+        with self._lock:
+            return sorted(self._files)
+
+    def child_dirs(self, rel_dir: str) -> list[str]:
+        """Return the names of the immediate subdirectories of a directory, sorted."""
+        prefix = f"{rel_dir}/"
+        with self._lock:
+            return sorted(d[len(prefix):] for d in self._dirs if d.startswith(prefix) and "/" not in d[len(prefix):])
+
+    def entries_under(self, rel_dir: str) -> list[tuple[str, FileSignature]]:
+        """Return the files beneath a directory with their signatures.
+
+        Args:
+            rel_dir: POSIX path of the directory relative to the root
+
+        Returns:
+            List of (path relative to the directory, signature), sorted by path
+        """
+        prefix = f"{rel_dir}/"
+        with self._lock:
+            entries = [(p[len(prefix):], sig) for p, sig in self._files.items() if p.startswith(prefix)]
+        return sorted(entries)
+
+
+class Repository:
+    """A preferences repository with its file model, caches and indexes.
+
+    Construction is cheap. The initial scan, catalog, search index and
+    content cache are built by warm_up(), which runs on first access to the
+    catalog or index if nobody called it earlier. When a startup snapshot
+    exists (see snapshot.py), warm-up reuses its hashes and index entries
+    for every file that has not changed since it was written.
+
+    Args:
+        root: Path to the repository root
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.tree = RepositoryTree(root)
+        self.content_cache: ContentCache = cache_for(root)
+        self.snapshot_path: Optional[Path] = default_snapshot_path(root)
+        self.snapshot_loaded = False
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_phases: dict[str, float] = {}
+        self._catalog: Optional[Catalog] = None
+        self._catalog_lock = threading.Lock()
+        self._search_index: Optional[TrigramIndex] = None
+        self._similarity_index: Optional[SimilarityIndex] = None
+        self._similarity_lock = threading.Lock()
+        self._facet_index: Optional[FacetIndex] = None
+        self._facet_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warm_lock = threading.Lock()
+        self._watcher = None
+        self._infos: dict[str, tuple[FileSignature, FileInfo]] = {}
+        self._infos_lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        """True once the initial warm-up has completed."""
+        return self._ready.is_set()
+
+    @property
+    def catalog(self) -> Catalog:
+        """Current catalog snapshot."""
+        if not self._ready.is_set():
+            self.warm_up()
+        return self._catalog
+
+    @property
+    def search_index(self) -> TrigramIndex:
+        """Search index over the templates and guides."""
+        if not self._ready.is_set():
+            self.warm_up()
+        return self._search_index
+
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        """BM25 index over the templates and guides, built on first access."""
+        if self._similarity_index is None:
+            if not self._ready.is_set():
+                self.warm_up()
+            with self._similarity_lock:
+                if self._similarity_index is None:
+                    self._similarity_index = build_similarity_index(self.root, self._text_paths())
+        return self._similarity_index
+
+    @property
+    def facet_index(self) -> FacetIndex:
+        """Facet index over the devcontainer templates, built on first access."""
+        if self._facet_index is None:
+            if not self._ready.is_set():
+                self.warm_up()
+            with self._facet_lock:
+                if self._facet_index is None:
+                    self._facet_index = build_facet_index(self.root, self.catalog.devcontainers)
+        return self._facet_index
+
+    def warm_up(self):
+        """Scan the repository and build the catalog, search index and content cache.
+
+        Safe to call from several threads; the work is done once and other
+        callers wait for it to finish.
+        """
+        with self._warm_lock:
+            if self._ready.is_set():
+                return
+            start = mark = time.perf_counter()
+
+            def phase(name: str):
+                nonlocal mark
+                now = time.perf_counter()
+                self.warmup_phases[name] = now - mark
+                mark = now
+
+            snapshot = load_snapshot(self.snapshot_path, self.root) if self.snapshot_path is not None else None
+            self.snapshot_loaded = snapshot is not None
+            phase("snapshot_load")
+            self.tree.refresh()
+            phase("scan")
+            self._catalog = build_catalog(self.tree, previous=snapshot.catalog_for(self.tree) if snapshot else None)
+            phase("catalog")
+            if snapshot is not None:
+                self._search_index = snapshot.index_for(self.root, self.tree, self._catalog)
+            else:
+                # Building the index reads every text template file and
+                # searchable guide through the content cache.
+                self._search_index = build_search_index(self.root, self._text_paths())
+            phase("search_index")
+            for guide in self._catalog.guides:
+                try:
+                    read_file_safe(self.root / guide, self.root)
+                except (OSError, ValueError):
+                    pass
+            phase("content_cache")
+            self.tree.subscribe(self._apply_changes)
+            self.warmup_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    def _text_paths(self) -> list[str]:
+        """Return all known file paths except those the catalog records as binary."""
+        catalog = self._catalog
+        return [path for path in self.tree.paths() if not catalog.is_binary(path)]
+
+    async def wait_until_ready(self):
+        """Wait for warm-up to finish without blocking the event loop."""
+        if not self._ready.is_set():
+            await run_blocking(self.warm_up)
+
+    def resolve(self, rel_path: str) -> ManifestEntry:
+        """Check that a file may be served and return where to read it.
+
+        Known files are resolved with a dictionary lookup. A path that is not
+        in the manifest is re-checked on disk once, in case it was created
+        since the last scan, before it is reported missing. While the watcher
+        is running the recorded signature is trusted; otherwise the file is
+        stat()ed so callers always validate caches against the current file.
+
+        Args:
+            rel_path: Path relative to the repository root
+
+        Returns:
+            Manifest entry with the resolved path and current signature
+
+        Raises:
+            ValueError: If the path is outside the repository or is a directory
+            FileNotFoundError: If the file doesn't exist or is excluded
+        """
+        path = posixpath.normpath(rel_path)
+        if path.startswith("/") or path == ".." or path.startswith("../"):
+            raise ValueError(f"Access denied: path '{rel_path}' is outside repository")
+        if path == ".":
+            raise ValueError(f"Not a file: {rel_path}")
+
+        if not self._ready.is_set():
+            self.warm_up()
+        entry = self.tree.lookup(path)
+        if entry is None:
+            if self.tree.is_dir(path):
+                raise ValueError(f"Not a file: {rel_path}")
+            self.tree.refresh(path)
+            entry = self.tree.lookup(path)
+            if entry is None:
+                if self.tree.is_dir(path):
+                    raise ValueError(f"Not a file: {rel_path}")
+                raise FileNotFoundError(f"File not found: {rel_path}")
+
+        if self._watcher is None:
+            try:
+                entry = entry._replace(signature=FileSignature.from_stat(os.stat(entry.resolved)))
+            except OSError:
+                raise FileNotFoundError(f"File not found: {rel_path}")
+        return entry
+
+    def locate(self, rel_path: str) -> tuple["Repository", ManifestEntry]:
+        """Resolve a path and return the repository serving it: this one.
+
+        Lets callers treat a single repository and an Overlay alike.
+
+        Raises:
+            ValueError: If the path is outside the repository or is a directory
+            FileNotFoundError: If the file doesn't exist or is excluded
+        """
+        return self, self.resolve(rel_path)
+
+    def read_text(self, rel_path: str) -> str:
+        """Read a file through the manifest and the content cache.
+
+        Files the catalog records as binary are rejected without being read.
+
+        Args:
+            rel_path: Path relative to the repository root
+
+        Returns:
+            File contents as string
+
+        Raises:
+            ValueError: If the path is outside the repository, is a directory
+                or is not UTF-8 text
+            FileNotFoundError: If the file doesn't exist or is excluded
+        """
+        entry = self.resolve(rel_path)
+        f = self.catalog.file(entry.path)
+        if f is not None and f.binary and f.signature == entry.signature:
+            raise ValueError(f"Binary file: {rel_path}")
+        try:
+            return self.content_cache.read(entry.resolved, entry.signature)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {rel_path}")
+
+    def file_info(self, rel_path: str, signature: Optional[FileSignature] = None) -> Optional[FileInfo]:
+        """Return the content hash and text or binary classification of a file.
+
+        Templates and guides are classified in the catalog. Other files are
+        read once per version and remembered until they change.
+
+        Args:
+            rel_path: Normalized POSIX path relative to the repository root
+            signature: Current stat signature of the file (default: the one
+                in the manifest)
+
+        Returns:
+            File info, or None if the file is not part of the repository
+        """
+        if signature is None:
+            signature = self.tree.signature(rel_path)
+            if signature is None:
+                return None
+        f = self.catalog.file(rel_path)
+        if f is not None and f.signature == signature:
+            return FileInfo(f.size, f.sha256, f.encoding)
+
+        with self._infos_lock:
+            known = self._infos.get(rel_path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        try:
+            info = inspect_file(self.root / rel_path)
+        except OSError:
+            return None
+        with self._infos_lock:
+            self._infos[rel_path] = (signature, info)
+        return info
+
+    def content_hash(self, rel_path: str) -> Optional[str]:
+        """Return the SHA-256 of a repository file without reading it if possible.
+
+        Hashes of templates and guides come from the catalog. Other files are
+        hashed once per version and remembered until they change.
+
+        Args:
+            rel_path: POSIX path relative to the repository root
+
+        Returns:
+            Hex digest, or None if the file is not part of the repository
+        """
+        f = self.catalog.file(rel_path)
+        if f is not None:
+            return f.sha256
+        info = self.file_info(rel_path)
+        return info.sha256 if info is not None else None
+
+    def start_watching(self):
+        """Start the background watcher if it is not already running.
+
+        Once the watcher is running, the tree is rescanned if it was already
+        scanned, so no change made before the watches existed is missed.
+
+        The watcher is chosen by the WATCHER environment variable: "auto"
+        (default, inotify with polling fallback), "inotify", "polling" or
+        "off". WATCH_POLL_INTERVAL sets the polling interval in seconds.
+        """
+        from .watcher import create_watcher
+
+        if self._watcher is None:
+            self._watcher = create_watcher(
+                self.tree,
+                mode=os.getenv("WATCHER", "auto"),
+                poll_interval=float(os.getenv("WATCH_POLL_INTERVAL", "0.5"))
+            )
+            if self._watcher is not None:
+                self._watcher.start()
+                if self._ready.is_set():
+                    # Pick up whatever changed between the warm-up scan and
+                    # the watches being in place.
+                    self.tree.refresh()
+
+    def stop_watching(self):
+        """Stop the background watcher if it is running."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _apply_changes(self, changes: list[FileChange]):
+        changed = [change.path for change in changes if _affects_catalog(change.path)]
+        if changed:
+            # Build the next generation aside from the entries that changed
+            # and swap it in with a single assignment, so readers see either
+            # the old or the new catalog. Changes arrive from the watcher and
+            # from request threads; building under the lock makes each build
+            # start from the latest catalog, so generations never go back.
+            with self._catalog_lock:
+                self._catalog = build_catalog(self.tree, previous=self._catalog, changed=changed)
+
+        self._update_facets(changes)
+        for change in changes:
+            file_path = self.root / change.path
+            if change.kind != "added":
+                self.content_cache.invalidate(file_path.resolve())
+                with self._infos_lock:
+                    self._infos.pop(change.path, None)
+
+            document = document_for_path(change.path)
+            if document is None:
+                continue
+            text = None
+            if change.kind != "deleted" and not self._catalog.is_binary(change.path):
+                try:
+                    text = read_file_safe(file_path, self.root)
+                except (OSError, ValueError):
+                    pass
+            if text is None:
+                self._search_index.remove(change.path)
+            else:
+                self._search_index.add(document, text)
+            # Holding the lock keeps changes from slipping past a build in progress.
+            with self._similarity_lock:
+                if self._similarity_index is None:
+                    continue
+                if text is None:
+                    self._similarity_index.remove(change.path)
+                else:
+                    self._similarity_index.add(document, text)
+
+    def _update_facets(self, changes: list[FileChange]):
+        # Only a template's top-level facet files affect its facets.
+        names = set()
+        for change in changes:
+            parts = change.path.split("/")
+            if change.path.startswith(f"{DEVCONTAINERS_DIR}/") and len(parts) == 4 and parts[3] in FACET_FILES:
+                names.add(parts[2])
+        if not names:
+            return
+        with self._facet_lock:
+            if self._facet_index is None:
+                return
+            for name in names:
+                facets = template_facets(self.root, name)
+                if facets is None:
+                    self._facet_index.remove(name)
+                else:
+                    self._facet_index.add(facets)
+
+
+def _affects_catalog(rel_path: str) -> bool:
+    return rel_path in GUIDES or rel_path.startswith(f"{DEVCONTAINERS_DIR}/")
+
+
+_repositories: dict[Path, Repository] = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(repo_root: Path) -> Repository:
+    """Return the shared repository model for a root, creating it on first use.
+
+    Args:
+        repo_root: Path to the repository root
+
+    Returns:
+        Repository model for the root
+    """
+    with _repositories_lock:
+        repository = _repositories.get(repo_root)
+        if repository is None:
+            repository = _repositories[repo_root] = Repository(repo_root)
+        return repository
@@ -1,49 +1,99 @@
 """Resource definitions for the preferences MCP server.
 
 Resources provide read-only access to preference files and configurations.
+Every read carries a content-hash ETag in `_meta.etag` (see etags.py).
 """
 
-from pathlib import Path
+from typing import Optional, Union
 from fastmcp import FastMCP
 from fastmcp.exceptions import ResourceError
 
-from .utils import get_repo_root, read_file_safe, list_directory_files
+from .batch import read_files, select_devcontainer_files
+from .catalog import DEVCONTAINER_FILES, DEVCONTAINERS_DIR, GUIDE_NAMES, GUIDES
+from .executor import run_blocking
+from .file_ranges import range_meta, read_file_range
+from .listing import DEFAULT_LIST_LIMIT, list_devcontainers
+from .overlay import Overlay
 
 
-def register_resources(mcp: FastMCP, repo_root: Path):
+def register_resources(mcp: FastMCP, repository: Overlay):
     """Register all resources with the MCP server.
 
     Args:
         mcp: FastMCP server instance
-        repo_root: Path to the repository root
+        repository: Repository roots to serve
     """
 
+    def catalog_listing(fields: list[str], prefix: str = "", tag: Optional[str] = None,
+                        limit: int = DEFAULT_LIST_LIMIT, cursor: Optional[str] = None) -> dict:
+        try:
+            listing = list_devcontainers(repository.catalog, fields, prefix, tag, limit, cursor)
+        except ValueError as e:
+            raise ResourceError(str(e))
+        roots = [str(root) for root in repository.roots]
+        return {
+            **listing,
+            "guides": list(GUIDES),
+            "repository": roots[0],
+            "roots": roots
+        }
+
     @mcp.resource("preferences://catalog")
-    def list_preferences() -> dict:
+    async def list_preferences() -> dict:
         """Lists all available preference categories and examples.
 
+        Devcontainers are listed by name, a page of DEFAULT_LIST_LIMIT at a
+        time; preferences://catalog{?prefix,tag,fields,limit,cursor} pages
+        through, filters and projects the listing.
+
         Returns a dictionary with:
-        - devcontainers: List of available devcontainer configurations
+        - devcontainers: Names of the available devcontainer configurations
+        - total: Number of devcontainers
+        - next_cursor: Cursor for the next page, or null if there is none
         - guides: List of available documentation files
-        - repository: Path to the repository root
+        - repository: Path to the repository root (the first root when
+          several are served)
+        - roots: Paths of all repository roots, highest precedence first
+        - generation: Catalog generation, which changes whenever the listed
+          files change
         """
-        devcontainer_dir = repo_root / "templates" / "devcontainers"
-        devcontainers = []
+        return catalog_listing([])
+
+    @mcp.resource("preferences://catalog{?prefix,tag,fields,limit,cursor}")
+    async def list_preferences_page(
+        prefix: str = "",
+        tag: Optional[str] = None,
+        fields: Optional[str] = None,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Lists one page of the catalog, optionally filtered and with more than names.
+
+        Devcontainers are listed in name order from an in-memory index, so a
+        page costs the same however many there are, e.g.
+        preferences://catalog?tag=python&fields=size,tree_hash. Pass
+        next_cursor back as cursor for the next page.
 
-        if devcontainer_dir.exists():
-            devcontainers = [
-                d.name for d in devcontainer_dir.iterdir()
-                if d.is_dir() and not d.name.startswith(".")
-            ]
+        Args:
+            prefix: Only devcontainers whose name starts with this
+            tag: Only devcontainers with this word in their name
+            fields: Comma-separated fields to include for each devcontainer:
+                files, file_count, size, tree_hash, tags (default: names only)
+            limit: Maximum number of devcontainers (1-1000)
+            cursor: next_cursor from the previous page of the same listing
 
-        return {
-            "devcontainers": sorted(devcontainers),
-            "guides": ["CLAUDE.md", "README.md", "STYLE.md"],
-            "repository": str(repo_root)
-        }
+        Returns:
+            The preferences://catalog dictionary for the page, with
+            {name, ...fields} for each devcontainer when fields are given
+
+        Raises:
+            ResourceError: If a field is unknown, the limit is invalid or the cursor is invalid
+        """
+        selected = [field for field in fields.split(",") if field] if fields else []
+        return catalog_listing(selected, prefix, tag, limit, cursor)
 
     @mcp.resource("preferences://devcontainer/{name}/{file}")
-    def get_devcontainer_file(name: str, file: str) -> str:
+    async def get_devcontainer_file(name: str, file: str) -> str:
         """Retrieves a specific file from a devcontainer configuration.
 
         Args:
@@ -56,12 +106,7 @@ def register_resources(mcp: FastMCP, repo_root: Path):
         Raises:
             ResourceError: If the file type is invalid or file not found
         """
-        valid_files = {
-            "config": "devcontainer.json",
-            "dockerfile": "Dockerfile",
-            "compose": "docker-compose.yml",
-            "caddyfile": "Caddyfile"
-        }
+        valid_files = DEVCONTAINER_FILES
 
         if file not in valid_files:
             raise ResourceError(
@@ -69,17 +114,17 @@ def register_resources(mcp: FastMCP, repo_root: Path):
                 f"Valid types: {', '.join(valid_files.keys())}"
             )
 
-        file_path = repo_root / "templates" / "devcontainers" / name / valid_files[file]
-
         try:
-            return read_file_safe(file_path, repo_root)
+            return await run_blocking(repository.read_text, f"{DEVCONTAINERS_DIR}/{name}/{valid_files[file]}")
+        except ValueError as e:
+            raise ResourceError(str(e))
         except FileNotFoundError:
             raise ResourceError(
                 f"File '{valid_files[file]}' not found in devcontainer '{name}'"
             )
 
     @mcp.resource("preferences://guide/{name}")
-    def get_guide(name: str) -> str:
+    async def get_guide(name: str) -> str:
         """Retrieves guide documentation.
 
         Args:
@@ -91,11 +136,7 @@ def register_resources(mcp: FastMCP, repo_root: Path):
         Raises:
             ResourceError: If the guide doesn't exist
         """
-        valid_guides = {
-            "claude": "CLAUDE.md",
-            "readme": "README.md",
-            "style": "STYLE.md"
-        }
+        valid_guides = GUIDE_NAMES
 
         if name not in valid_guides:
             raise ResourceError(
@@ -103,15 +144,15 @@ def register_resources(mcp: FastMCP, repo_root: Path):
                 f"Valid guides: {', '.join(valid_guides.keys())}"
             )
 
-        guide_path = repo_root / valid_guides[name]
-
         try:
-            return read_file_safe(guide_path, repo_root)
+            return await run_blocking(repository.read_text, valid_guides[name])
+        except ValueError as e:
+            raise ResourceError(str(e))
         except FileNotFoundError:
             raise ResourceError(f"Guide '{name}' not found")
 
     @mcp.resource("preferences://devcontainer/{name}/list")
-    def list_devcontainer_files(name: str) -> dict:
+    async def list_devcontainer_files(name: str) -> dict:
         """Lists all files in a devcontainer configuration.
 
         Args:
@@ -123,12 +164,11 @@ def register_resources(mcp: FastMCP, repo_root: Path):
         Raises:
             ResourceError: If devcontainer doesn't exist
         """
-        dc_path = repo_root / "templates" / "devcontainers" / name
-
-        if not dc_path.exists():
+        entry = repository.catalog.devcontainer(name)
+        if entry is None:
             raise ResourceError(f"Devcontainer '{name}' not found")
 
-        files = list_directory_files(dc_path)
+        files = entry.file_names()
 
         return {
             "devcontainer": name,
@@ -136,27 +176,77 @@ def register_resources(mcp: FastMCP, repo_root: Path):
             "count": len(files)
         }
 
-    @mcp.resource("preferences://files/{filepath*}")
-    def get_file_content(filepath: str) -> str:
+    @mcp.resource("preferences://bundle/{name}")
+    async def get_devcontainer_bundle(name: str) -> dict:
+        """Retrieves every file of a devcontainer configuration at once.
+
+        Args:
+            name: Name of the devcontainer
+
+        Binary files are left out; read them through preferences://files/.
+
+        Returns:
+            Dictionary with the devcontainer name, a list of {path, content}
+            for each text file, and a list of {path, error} for files that
+            could not be read
+
+        Raises:
+            ResourceError: If devcontainer doesn't exist or has too many files
+        """
+        try:
+            paths = select_devcontainer_files(repository.catalog, name)
+            bundle = await read_files(repository, paths)
+        except KeyError:
+            raise ResourceError(f"Devcontainer '{name}' not found")
+        except ValueError as e:
+            raise ResourceError(str(e))
+
+        return {"devcontainer": name, **bundle}
+
+    @mcp.resource("preferences://files/{filepath*}{?offset,length,cursor}")
+    async def get_file_content(
+        filepath: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Union[str, bytes]:
         """Retrieves content from any file in the preferences repository.
 
         This is a wildcard resource that allows access to any file within
-        the repository. Path traversal is prevented by security checks.
+        the repository. Only files in the repository manifest are served,
+        which rules out path traversal as well as files excluded by the
+        root .gitignore or .dockerignore.
+
+        At most MAX_READ_BYTES (1 MiB by default) are returned per read.
+        Larger files are read in slices with the optional offset and length
+        query parameters, or by passing back the cursor of the previous
+        slice, e.g. preferences://files/uv.lock?cursor=... The response
+        `_meta` carries offset, end, total_size and next_cursor, which is
+        null once the end of the file is reached.
+
+        Binary files (anything that is not UTF-8 text, such as images or
+        archives) are returned as base64-encoded blobs with their media type
+        and `_meta.encoding` set to "base64", sliced the same way.
 
         Args:
             filepath: Relative path to the file
+            offset: Byte offset to start at (default: 0)
+            length: Maximum number of bytes to return
+            cursor: Continuation cursor from a previous read
 
         Returns:
-            File contents as string
+            File contents, or the requested slice of them, as string, or as
+            bytes for a binary file
 
         Raises:
-            ResourceError: If file not found or access denied
+            ResourceError: If file not found, access denied or the range is invalid
         """
-        file_path = repo_root / filepath
-
         try:
-            return read_file_safe(file_path, repo_root)
+            file_range = await run_blocking(read_file_range, repository, filepath, offset or 0, length, cursor=cursor)
         except ValueError as e:
             raise ResourceError(str(e))
         except FileNotFoundError:
             raise ResourceError(f"File '{filepath}' not found")
+
+        range_meta.set(file_range.meta())
+        return file_range.content
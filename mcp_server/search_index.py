@@ -0,0 +1,800 @@
+"""Trigram search index for the preferences MCP server.
+
+Builds an in-memory inverted index from lowercase character trigrams to the
+documents that contain them. Queries intersect the posting lists of their
+trigrams to narrow the search to a few candidate files, and only those
+candidates are read and verified line by line.
+
+Three match modes are supported: case-insensitive substring, regular
+expression and fuzzy (substrings within a bounded edit distance of the
+query). Searches return one page at a time and stop reading files as soon as
+the page is full or the query's time budget runs out, handing back a cursor
+to continue from.
+"""
+
+import base64
+import binascii
+import json
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Container, Iterable, Optional
+
+import regex
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from .blobs import content_digest
+from .utils import read_file_safe
+
+
+# Guides included in search results, relative to the repository root.
+SEARCH_GUIDES = ["CLAUDE.md", "README.md"]
+
+# Maximum number of matching lines reported per file.
+MAX_MATCHES_PER_FILE = 5
+
+# Maximum length of a reported snippet.
+MAX_SNIPPET_LENGTH = 200
+
+# Default and maximum number of results per page.
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Maximum edit distance accepted in fuzzy mode.
+MAX_EDITS = 3
+
+# Maximum query length in fuzzy mode, which compares the query against every
+# position of the candidate lines.
+MAX_FUZZY_QUERY_LENGTH = 64
+
+# Maximum length of a regular expression query.
+MAX_REGEX_LENGTH = 256
+
+# Maximum number of characters of a line handed to the matchers; longer lines
+# are only matched in their first MAX_LINE_LENGTH characters, which bounds the
+# time a single line can take.
+MAX_LINE_LENGTH = 1000
+
+# Default time budget of a single search in seconds. Can be tuned with the
+# SEARCH_TIME_BUDGET_MS environment variable.
+DEFAULT_TIME_BUDGET = int(os.getenv("SEARCH_TIME_BUDGET_MS", 2000)) / 1000
+
+SEARCH_MODES = ("substring", "regex", "fuzzy")
+SEARCH_ORDERS = ("path", "score")
+
+
+@dataclass(frozen=True)
+class Document:
+    """A searchable file and the metadata reported with its matches.
+
+    Attributes:
+        path: Path relative to the repository root
+        type: Category type (devcontainer or guide)
+        name: Devcontainer name or guide filename
+    """
+
+    path: str
+    type: str
+    name: str
+
+    def to_result(self) -> dict:
+        """Return the result fields describing this document."""
+        if self.type == "devcontainer":
+            return {"type": self.type, "name": self.name, "file": Path(self.path).name, "path": self.path}
+        return {"type": self.type, "name": self.name, "path": self.path}
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the set of lowercase trigrams in a string.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        Set of three-character substrings
+    """
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def document_for_path(rel_path: str) -> Optional[Document]:
+    """Classify a repository-relative path as a searchable document.
+
+    Args:
+        rel_path: POSIX path relative to the repository root
+
+    Returns:
+        The document, or None if the path is not searched
+    """
+    if rel_path in SEARCH_GUIDES:
+        return Document(rel_path, "guide", rel_path)
+    parts = rel_path.split("/")
+    if len(parts) >= 4 and parts[:2] == ["templates", "devcontainers"] and not parts[2].startswith("."):
+        return Document(rel_path, "devcontainer", parts[2])
+    return None
+
+
+class SubstringMatcher:
+    """Case-insensitive substring matching.
+
+    Args:
+        query: Text to find
+    """
+
+    def __init__(self, query: str):
+        self.query = query.lower()
+        # Documents must contain every trigram of the query.
+        self.gram_sets: Optional[list[set[str]]] = [trigrams(query)]
+
+    def spans(self, line: str, deadline: Optional[float] = None) -> list[tuple[int, int]]:
+        """Return the (start, end) character offsets of every match in a line.
+
+        Finding a substring takes linear time, so the deadline is not checked.
+        """
+        text = line.lower()
+        spans = []
+        start = text.find(self.query)
+        while start >= 0:
+            spans.append((start, start + len(self.query)))
+            start = text.find(self.query, start + len(self.query))
+        return spans
+
+
+# Characters matched by the categories of a character class, as far as
+# telling alternatives apart is concerned.
+_CATEGORY_CHARS = {
+    sre_constants.CATEGORY_DIGIT: frozenset("0123456789"),
+    sre_constants.CATEGORY_WORD: frozenset("abcdefghijklmnopqrstuvwxyz0123456789_"),
+    sre_constants.CATEGORY_SPACE: frozenset(" \t\n\r\f\v"),
+}
+
+
+def _first_chars(items) -> Optional[frozenset[str]]:
+    """Return the lowercase characters a parsed alternative can start with, or None if it could be any."""
+    if not items:
+        # An empty alternative matches the same (empty) text as any other
+        # alternative that can be empty, and is treated as matching anything.
+        return None
+    op, av = items[0]
+    if op == sre_constants.LITERAL:
+        return frozenset(chr(av).lower())
+    if op != sre_constants.IN:
+        return None
+    chars: set[str] = set()
+    for item_op, item_av in av:
+        if item_op == sre_constants.LITERAL:
+            chars.add(chr(item_av).lower())
+        elif item_op == sre_constants.RANGE and item_av[1] - item_av[0] < 256:
+            chars.update(chr(c).lower() for c in range(item_av[0], item_av[1] + 1))
+        elif item_op == sre_constants.CATEGORY and item_av in _CATEGORY_CHARS:
+            chars.update(_CATEGORY_CHARS[item_av])
+        else:
+            return None
+    return frozenset(chars)
+
+
+def _ambiguous_branch(alternatives) -> bool:
+    """Return whether two alternatives of a branch may start matching the same text."""
+    firsts = [_first_chars(alternative) for alternative in alternatives]
+    for i, first in enumerate(firsts):
+        for other in firsts[i + 1:]:
+            if first is None or other is None or first & other:
+                return True
+    return False
+
+
+def _backtracking_risk(items, repeated: bool = False) -> Optional[str]:
+    """Return why a parsed expression may backtrack exponentially, or None if it is safe.
+
+    Expressions that repeat a variable-length repetition, like (a+)+, or a
+    choice between alternatives that can match the same text, like (a|a)+,
+    try exponentially many ways to split lines that almost match.
+    """
+    for op, av in items:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, item = av
+            if repeated and low != high:
+                return "must not repeat a repetition, as in (a+)+"
+            reason = _backtracking_risk(item, repeated or high > 1)
+            if reason:
+                return reason
+            continue
+        if op == sre_constants.BRANCH and repeated and _ambiguous_branch(av[1]):
+            return "must not repeat alternatives that can match the same text, as in (a|ab)+"
+        for value in av if isinstance(av, (tuple, list)) else (av,):
+            children = value if isinstance(value, list) else [value]
+            for child in children:
+                if isinstance(child, sre_parse.SubPattern):
+                    reason = _backtracking_risk(child, repeated)
+                    if reason:
+                        return reason
+    return None
+
+
+class RegexMatcher:
+    """Case-insensitive regular expression matching.
+
+    Args:
+        query: Regular expression
+
+    Expressions use the syntax of the re module. They are matched with the
+    regex module, which stops a match at the search deadline and releases the
+    GIL while matching, so an expression that still backtracks badly cannot
+    stall the server.
+
+    Raises:
+        ValueError: If the expression is too long, does not compile or is
+            prone to catastrophic backtracking
+    """
+
+    def __init__(self, query: str):
+        if len(query) > MAX_REGEX_LENGTH:
+            raise ValueError(f"Regular expressions are limited to {MAX_REGEX_LENGTH} characters")
+        try:
+            reason = _backtracking_risk(sre_parse.parse(query, re.IGNORECASE))
+            self.pattern = regex.compile(query, regex.IGNORECASE | regex.VERSION0)
+        except (re.error, regex.error) as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+        if reason:
+            raise ValueError(f"Regular expressions {reason}")
+        # Arbitrary expressions have no required trigrams; every document is a
+        # candidate.
+        self.gram_sets: Optional[list[set[str]]] = None
+
+    def spans(self, line: str, deadline: Optional[float] = None) -> list[tuple[int, int]]:
+        """Return the (start, end) character offsets of every non-empty match in a line.
+
+        Raises:
+            TimeoutError: If matching runs past the deadline (a time.monotonic() value)
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise TimeoutError("regex timed out")
+        matches = self.pattern.finditer(line, timeout=timeout, concurrent=True)
+        return [m.span() for m in matches if m.end() > m.start()]
+
+
+class FuzzyMatcher:
+    """Case-insensitive approximate substring matching.
+
+    Matches substrings within max_edits insertions, deletions or
+    substitutions of the query. By the pigeonhole principle, any such
+    substring contains at least one of max_edits + 1 pieces of the query
+    unchanged, which narrows both the candidate documents and the lines that
+    are compared in full.
+
+    Args:
+        query: Text to find
+        max_edits: Maximum edit distance
+
+    Raises:
+        ValueError: If max_edits is out of range or the query is too short or too long
+    """
+
+    def __init__(self, query: str, max_edits: int):
+        if not 0 <= max_edits <= MAX_EDITS:
+            raise ValueError(f"max_edits must be between 0 and {MAX_EDITS}")
+        if len(query) <= max_edits:
+            raise ValueError("Fuzzy queries must be longer than max_edits")
+        if len(query) > MAX_FUZZY_QUERY_LENGTH:
+            raise ValueError(f"Fuzzy queries are limited to {MAX_FUZZY_QUERY_LENGTH} characters")
+
+        self.query = query.lower()
+        self.max_edits = max_edits
+        size = len(self.query) // (max_edits + 1)
+        self.pieces = [self.query[i * size:(i + 1) * size] for i in range(max_edits)]
+        self.pieces.append(self.query[max_edits * size:])
+        self.gram_sets: Optional[list[set[str]]] = None
+        if all(len(piece) >= 3 for piece in self.pieces):
+            self.gram_sets = [trigrams(piece) for piece in self.pieces]
+
+    def spans(self, line: str, deadline: Optional[float] = None) -> list[tuple[int, int]]:
+        """Return the (start, end) character offsets of the closest non-overlapping matches in a line.
+
+        Comparing a line of at most MAX_LINE_LENGTH characters against a
+        query of at most MAX_FUZZY_QUERY_LENGTH takes bounded time, so the
+        deadline is not checked.
+        """
+        text = line.lower()
+        if not any(piece in text for piece in self.pieces):
+            return []
+
+        # Sellers' algorithm: column i holds the edit distance between
+        # query[:i] and the best substring ending at the current position,
+        # and where that substring starts.
+        query, k = self.query, self.max_edits
+        m = len(query)
+        prev = list(range(m + 1))
+        prev_start = [0] * (m + 1)
+        found = []
+        for j, char in enumerate(text, start=1):
+            cur = [0] * (m + 1)
+            cur_start = [j] * (m + 1)
+            for i in range(1, m + 1):
+                cost, start = prev[i - 1] + (query[i - 1] != char), prev_start[i - 1]
+                if prev[i] + 1 < cost:
+                    cost, start = prev[i] + 1, prev_start[i]
+                if cur[i - 1] + 1 < cost:
+                    cost, start = cur[i - 1] + 1, cur_start[i - 1]
+                cur[i], cur_start[i] = cost, start
+            if cur[m] <= k and j > cur_start[m]:
+                found.append((cur[m], cur_start[m], j))
+            prev, prev_start = cur, cur_start
+
+        # Keep the closest, then longest, matches that do not overlap a
+        # better one.
+        spans: list[tuple[int, int]] = []
+        for _, start, end in sorted(found, key=lambda f: (f[0], f[1], -f[2])):
+            if all(end <= s or start >= e for s, e in spans):
+                spans.append((start, end))
+        return sorted(spans)
+
+
+def compile_matcher(query: str, mode: str = "substring", max_edits: int = 1):
+    """Return the matcher for a query.
+
+    Args:
+        query: Search term or regular expression
+        mode: "substring", "regex" or "fuzzy"
+        max_edits: Maximum edit distance in fuzzy mode
+
+    Returns:
+        Matcher with gram_sets and spans(line)
+
+    Raises:
+        ValueError: If the mode is unknown or the query is invalid for it
+    """
+    if not query:
+        raise ValueError("Query must not be empty")
+    if mode == "substring":
+        return SubstringMatcher(query)
+    if mode == "regex":
+        return RegexMatcher(query)
+    if mode == "fuzzy":
+        return FuzzyMatcher(query, max_edits)
+    raise ValueError(f"Invalid mode '{mode}'. Valid modes: {', '.join(SEARCH_MODES)}")
+
+
+def encode_cursor(state: dict) -> str:
+    """Encode search pagination state as an opaque URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str, kind: type):
+    """Return one value of a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or the value is missing or of
+            another type
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = state[key]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    if not isinstance(value, kind):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return value
+
+
+def _scan(content: str, matcher, deadline: float) -> tuple[int, list[dict], bool]:
+    """Return the number of matches in a text and the first few matching lines.
+
+    Also returns whether the deadline cut the scan short.
+    """
+    score = 0
+    matches = []
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        if time.monotonic() > deadline:
+            return score, matches, True
+        try:
+            spans = matcher.spans(line[:MAX_LINE_LENGTH], deadline)
+        except TimeoutError:
+            return score, matches, True
+        if not spans:
+            continue
+        score += len(spans)
+        if len(matches) < MAX_MATCHES_PER_FILE:
+            # Report spans relative to the stripped, truncated snippet.
+            indent = len(line) - len(line.lstrip())
+            snippet = line.strip()[:MAX_SNIPPET_LENGTH]
+            matches.append({
+                "line": line_number,
+                "snippet": snippet,
+                "spans": [
+                    [start - indent, min(end - indent, len(snippet))]
+                    for start, end in spans if start - indent < len(snippet)
+                ]
+            })
+    return score, matches, False
+
+
+class TrigramIndex:
+    """Inverted trigram index over the searchable files of a repository.
+
+    Posting lists refer to contents by digest rather than to paths, so
+    files with identical contents are tokenized and indexed once; each
+    content keeps the set of paths that currently hold it as its reference
+    count.
+
+    Args:
+        repo_root: Path to the repository root
+    """
+
+    def __init__(self, repo_root: Path):
+        self.repo_root = repo_root
+        self._documents: dict[str, Document] = {}
+        self._digests: dict[str, str] = {}
+        self._contents: dict[str, set[str]] = {}
+        self._content_trigrams: dict[str, frozenset[str]] = {}
+        self._gram_counts: dict[str, int] = {}
+        self._postings: dict[str, set[str]] = {}
+        # Posting entries stored, and as many as one list per path would take.
+        self._stored_postings = 0
+        self._logical_postings = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, document: Document, text: str, digest: Optional[str] = None):
+        """Index or re-index a document.
+
+        Args:
+            document: Document to index
+            text: Full text of the document
+            digest: Content digest of the text, if already known
+        """
+        if digest is None:
+            digest = content_digest(text)
+        with self._lock:
+            known = digest in self._contents
+        # Contents already indexed under another path are not tokenized again.
+        grams = None if known else frozenset(trigrams(text))
+        with self._lock:
+            self._remove(document.path)
+            paths = self._contents.get(digest)
+            if paths is None:
+                if grams is None:
+                    grams = frozenset(trigrams(text))
+                paths = self._contents[digest] = set()
+                self._content_trigrams[digest] = grams
+                self._gram_counts[digest] = len(grams)
+                self._stored_postings += len(grams)
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(digest)
+            paths.add(document.path)
+            self._documents[document.path] = document
+            self._digests[document.path] = digest
+            self._logical_postings += self._gram_counts[digest]
+
+    def export(self) -> tuple[list[Document], list[int], list[str], dict[str, list[int]]]:
+        """Return the indexed documents, their contents and the posting lists.
+
+        Returns:
+            Tuple of the documents sorted by path, the position of each
+            document's content digest in the sorted list of digests, that
+            list, and a mapping of each trigram to the positions of its
+            contents in it
+        """
+        with self._lock:
+            documents = sorted(self._documents.values(), key=lambda d: d.path)
+            contents = sorted(self._contents)
+            ids = {digest: i for i, digest in enumerate(contents)}
+            document_contents = [ids[self._digests[d.path]] for d in documents]
+            postings = {gram: sorted(ids[d] for d in digests) for gram, digests in self._postings.items()}
+        return documents, document_contents, contents, postings
+
+    def restore(self, documents: list[Document], document_contents: list[int], contents: list[str],
+                postings: dict[str, list[int]], keep: Optional[list[bool]] = None):
+        """Replace the index contents with the output of export().
+
+        Args:
+            documents: Documents as returned by export()
+            document_contents: Content positions as returned by export()
+            contents: Content digests as returned by export()
+            postings: Posting lists as returned by export()
+            keep: Optional flag per document; documents flagged False are
+                left out
+        """
+        contents = [sys.intern(digest) for digest in contents]
+        restored_documents, digests, paths = {}, {}, {}
+        for i, (document, content) in enumerate(zip(documents, document_contents)):
+            if keep is None or keep[i]:
+                restored_documents[document.path] = document
+                digests[document.path] = contents[content]
+                paths.setdefault(contents[content], set()).add(document.path)
+
+        alive = [digest in paths for digest in contents]
+        gram_counts = dict.fromkeys(paths, 0)
+        restored_postings = {}
+        for gram, ids in postings.items():
+            posting = {contents[i] for i in ids if alive[i]}
+            if posting:
+                restored_postings[gram] = posting
+                for digest in posting:
+                    gram_counts[digest] += 1
+        with self._lock:
+            self._documents = restored_documents
+            self._digests = digests
+            self._contents = paths
+            # Per-content trigrams are not part of the export; _remove falls
+            # back to scanning the posting lists for restored contents.
+            self._content_trigrams = {}
+            self._gram_counts = gram_counts
+            self._postings = restored_postings
+            self._stored_postings = sum(gram_counts.values())
+            self._logical_postings = sum(gram_counts[d] * len(p) for d, p in paths.items())
+
+    def remove(self, rel_path: str):
+        """Remove a document from the index if present.
+
+        Args:
+            rel_path: Path of the document relative to the repository root
+        """
+        with self._lock:
+            self._remove(rel_path)
+
+    def candidates(self, query: str) -> list[Document]:
+        """Return documents that may contain the query.
+
+        Queries shorter than three characters have no trigrams and match
+        every document.
+
+        Args:
+            query: Search term
+
+        Returns:
+            Candidate documents sorted by path
+        """
+        return self.candidates_for([trigrams(query)])
+
+    def candidates_for(self, gram_sets: Optional[list[set[str]]]) -> list[Document]:
+        """Return documents that contain every trigram of at least one set.
+
+        Args:
+            gram_sets: Alternative sets of required trigrams, or None to
+                return every document
+
+        Returns:
+            Candidate documents sorted by path
+        """
+        with self._lock:
+            if gram_sets is None or not all(gram_sets):
+                paths = set(self._documents)
+            else:
+                digests = set()
+                for grams in gram_sets:
+                    digests |= self._intersect(grams)
+                paths = set().union(*(self._contents[digest] for digest in digests))
+            return [self._documents[p] for p in sorted(paths)]
+
+    def search(
+        self,
+        query: str,
+        category: str = "all",
+        mode: str = "substring",
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        order: str = "path",
+        max_edits: int = 1,
+        time_budget: Optional[float] = None,
+        hidden: Optional[Container[str]] = None
+    ) -> dict:
+        """Search indexed documents and return one page of results.
+
+        In path order, candidates are read in path order and reading stops
+        as soon as the page is full, so the cost of a page does not depend on
+        how many documents match. In score order, every candidate is read and
+        results are ranked by number of matches. Either way reading also stops
+        when the time budget runs out; the page then holds what was found so
+        far and timed_out is set.
+
+        Args:
+            query: Search term, regular expression or fuzzy term
+            category: Filter by category - "all", "devcontainer", or "guide"
+            mode: "substring", "regex" or "fuzzy"
+            limit: Maximum number of results
+            offset: Number of matching documents to skip
+            cursor: Cursor from a previous page of the same query
+            order: "path" or "score"
+            max_edits: Maximum edit distance in fuzzy mode
+            time_budget: Seconds to spend reading documents (default: DEFAULT_TIME_BUDGET)
+            hidden: Paths to leave out, such as files shadowed by another root
+
+        Returns:
+            Dictionary containing:
+            - results: Result dictionaries with the document fields plus
+              score and matches (line, snippet and match spans)
+            - next_cursor: Cursor for the next page, or None if there is none
+            - timed_out: True if the time budget ran out
+
+        Raises:
+            ValueError: If a parameter, the query or the cursor is invalid
+        """
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+        if offset < 0:
+            raise ValueError("offset must be non-negative")
+        if order not in SEARCH_ORDERS:
+            raise ValueError(f"Invalid order '{order}'. Valid orders: {', '.join(SEARCH_ORDERS)}")
+
+        matcher = compile_matcher(query, mode, max_edits)
+        deadline = time.monotonic() + (DEFAULT_TIME_BUDGET if time_budget is None else time_budget)
+        documents = [
+            d for d in self.candidates_for(matcher.gram_sets)
+            if (category == "all" or d.type == category) and (hidden is None or d.path not in hidden)
+        ]
+        if order == "path":
+            return self._search_by_path(documents, matcher, limit, offset, cursor, deadline)
+        return self._search_by_score(documents, matcher, limit, offset, cursor, deadline)
+
+    def _search_by_path(self, documents: list[Document], matcher, limit: int, offset: int,
+                        cursor: Optional[str], deadline: float) -> dict:
+        first = 0
+        if cursor is not None:
+            after = decode_cursor(cursor, "after", str)
+            first = bisect_right([d.path for d in documents], after)
+
+        results = []
+        skip = offset
+        scanned = {}
+        for i in range(first, len(documents)):
+            result, cut = self._match(documents[i], matcher, scanned, deadline)
+            if cut and i > first:
+                # Read the document again, from its start, on the next page.
+                # The first document of a page is reported as far as it was
+                # read, so that every page makes progress.
+                return {
+                    "results": results,
+                    "next_cursor": encode_cursor({"after": documents[i - 1].path}),
+                    "timed_out": True
+                }
+            if result is not None:
+                if skip:
+                    skip -= 1
+                else:
+                    results.append(result)
+            if i + 1 == len(documents):
+                return {"results": results, "next_cursor": None, "timed_out": cut}
+            timed_out = cut or time.monotonic() > deadline
+            if len(results) == limit or timed_out:
+                # Resume after the last document read, not the last result,
+                # so nothing is read twice.
+                return {
+                    "results": results,
+                    "next_cursor": encode_cursor({"after": documents[i].path}),
+                    "timed_out": timed_out
+                }
+        return {"results": results, "next_cursor": None, "timed_out": False}
+
+    def _search_by_score(self, documents: list[Document], matcher, limit: int, offset: int,
+                         cursor: Optional[str], deadline: float) -> dict:
+        if cursor is not None:
+            offset = decode_cursor(cursor, "offset", int)
+
+        results = []
+        timed_out = False
+        scanned = {}
+        for document in documents:
+            if time.monotonic() > deadline:
+                timed_out = True
+                break
+            result, timed_out = self._match(document, matcher, scanned, deadline)
+            if result is not None:
+                results.append(result)
+            if timed_out:
+                break
+
+        results.sort(key=lambda r: (-r["score"], r["path"]))
+        end = offset + limit
+        return {
+            "results": results[offset:end],
+            "next_cursor": encode_cursor({"offset": end}) if end < len(results) else None,
+            "timed_out": timed_out
+        }
+
+    def _match(self, document: Document, matcher, scanned: dict[str, tuple[int, list[dict], bool]],
+               deadline: float) -> tuple[Optional[dict], bool]:
+        """Return the result for a document, if it matches, and whether the deadline cut its scan short.
+
+        A document cut short reports the matches found before the deadline.
+        """
+        try:
+            content = read_file_safe(self.repo_root / document.path, self.repo_root)
+        except (OSError, ValueError):
+            return None, False
+        # Identical files share one cached string, so looking it up is cheap
+        # and each distinct content is scanned once per search.
+        found = scanned.get(content)
+        if found is None:
+            found = scanned[content] = _scan(content, matcher, deadline)
+        score, matches, cut = found
+        if not score:
+            return None, cut
+        return {**document.to_result(), "score": score, "matches": matches}, cut
+
+    def stats(self) -> dict:
+        """Return index size counters.
+
+        Returns:
+            Dictionary with documents, contents (distinct among them),
+            trigrams, postings (entries stored) and postings_saved (entries
+            not stored because their contents are shared)
+        """
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "contents": len(self._contents),
+                "trigrams": len(self._postings),
+                "postings": self._stored_postings,
+                "postings_saved": self._logical_postings - self._stored_postings
+            }
+
+    def _intersect(self, grams: set[str]) -> set[str]:
+        # Intersect the smallest posting lists first.
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        digests = set(postings[0])
+        for posting in postings[1:]:
+            if not digests:
+                break
+            digests &= posting
+        return digests
+
+    def _remove(self, rel_path: str):
+        if self._documents.pop(rel_path, None) is None:
+            return
+        digest = self._digests.pop(rel_path)
+        paths = self._contents[digest]
+        paths.discard(rel_path)
+        self._logical_postings -= self._gram_counts[digest]
+        if paths:
+            return
+        del self._contents[digest]
+        self._stored_postings -= self._gram_counts.pop(digest)
+        grams = self._content_trigrams.pop(digest, None)
+        if grams is None:
+            grams = [gram for gram, posting in self._postings.items() if digest in posting]
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(digest)
+                if not posting:
+                    del self._postings[gram]
+
+
+def build_search_index(repo_root: Path, paths: Iterable[str]) -> TrigramIndex:
+    """Build a trigram index over the devcontainer templates and guides.
+
+    Args:
+        repo_root: Path to the repository root
+        paths: POSIX file paths relative to the repository root; paths that
+            are not searchable documents are skipped
+
+    Returns:
+        Populated index
+    """
+    index = TrigramIndex(repo_root)
+    for rel_path in paths:
+        document = document_for_path(rel_path)
+        if document is None:
+            continue
+        try:
+            index.add(document, read_file_safe(repo_root / rel_path, repo_root))
+        except (OSError, ValueError):
+            # Unreadable or binary files are not searchable.
+            continue
+    return index
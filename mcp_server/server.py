@@ -16,34 +16,220 @@ Usage:
 
     # Install to Claude Desktop
     fastmcp install claude-desktop mcp_server/server.py --project .
+
+    # Report where startup time goes, then exit
+    python -m mcp_server.server --profile-startup
+
+    # Record every request to a trace for benchmarks.replay
+    python -m mcp_server.server --transport http --record traffic.jsonl
+
+    # Sample the stacks of requests that ask for it, and of 1% of all requests
+    python -m mcp_server.server --transport http --profile --profile-sample-rate 0.01
 """
 
+import time
+
+# Taken before the remaining imports, for --profile-startup.
+_IMPORT_STARTED = time.perf_counter()
+
 import argparse
+import asyncio
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Sequence, Union
 
-from fastmcp import FastMCP
+from fastmcp import Client, FastMCP
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
-from .utils import get_repo_root
+from .admission import AdmissionMiddleware
+from .etags import ETagMiddleware
+from .executor import io_executor
+from .file_ranges import RangeMetaMiddleware, register_file_routes
+from .health import ReadinessMiddleware, register_health_routes
+from .metrics import MetricsMiddleware, MetricsRegistry, repository_gauges
+from .overlay import get_overlay
+from .profiler import Profiler, register_profiler
+from .recorder import RecorderMiddleware, TrafficRecorder
+from .repository import Repository
+from .utils import get_repo_roots
 from .resources import register_resources
 from .tools import register_tools
 from .prompts import register_prompts
 
 
-# Get repository root
-REPO_ROOT = get_repo_root()
+def create_server(repo_roots: Union[Path, Sequence[Path]], profiler: Optional[Profiler] = None,
+                  recorder: Optional[TrafficRecorder] = None) -> FastMCP:
+    """Create a fully configured server for one or more repository roots.
+
+    The repositories are warmed up in the background when the server starts,
+    each in its own thread, so the process accepts connections (and answers
+    /health) straight away. Calls that arrive before warm-up completes wait
+    for it.
+
+    Args:
+        repo_roots: Path to the repository root, or several roots layered
+            highest precedence first (see overlay.py)
+        profiler: Sampling profiler for requests, or None to leave profiling
+            out entirely (see profiler.py)
+        recorder: Trace to record every request to, or None (see recorder.py)
+
+    Returns:
+        FastMCP server instance
+    """
+    repository = get_overlay([repo_roots] if isinstance(repo_roots, Path) else repo_roots)
+
+    @asynccontextmanager
+    async def lifespan(server: FastMCP):
+        """Warm up the repositories and keep them current while the server is running."""
+        def warm_up_and_watch(root: Repository):
+            root.warm_up()
+            root.start_watching()
+            # Not needed for readiness; built here so the first ranking
+            # or facet query does not pay for it.
+            root.similarity_index
+            root.facet_index
+
+        warmers = [
+            threading.Thread(target=warm_up_and_watch, args=(root,), name="preferences-warm-up", daemon=True)
+            for root in repository.repositories
+        ]
+        for warmer in warmers:
+            warmer.start()
+        try:
+            yield
+        finally:
+            for warmer in warmers:
+                warmer.join()
+            repository.stop_watching()
+            if recorder is not None:
+                recorder.close()
+
+    # Create FastMCP server
+    server = FastMCP(
+        name="preferences-server",
+        lifespan=lifespan
+    )
+
+    # Record per-handler metrics (outermost, so it times everything below)
+    metrics = MetricsRegistry()
+    metrics.add_collector(repository_gauges(repository, io_executor))
+    server.add_middleware(MetricsMiddleware(metrics, server))
+
+    # Append every request to the traffic trace, timed like the metrics
+    if recorder is not None:
+        metrics.add_collector(lambda: {f"preferences_recorder_{k}": v for k, v in recorder.stats().items()})
+        server.add_middleware(RecorderMiddleware(recorder))
+
+    # Hold calls until the initial warm-up has finished
+    server.add_middleware(ReadinessMiddleware(repository))
+
+    # Share identical in-flight calls and cap concurrency per handler
+    admission = AdmissionMiddleware.from_env(metrics)
+    metrics.add_collector(lambda: {f"preferences_admission_{k}": v for k, v in admission.stats().items()})
+    server.add_middleware(admission)
+
+    # Attach content-hash ETags to resource reads
+    server.add_middleware(ETagMiddleware(repository))
+
+    # Describe the slice served by ranged file reads
+    server.add_middleware(RangeMetaMiddleware())
+
+    # Sample the stacks of profiled requests, with the admin tool and route to read them
+    if profiler is not None:
+        register_profiler(server, profiler, metrics)
+
+    # Register resources (read-only data)
+    register_resources(server, repository)
+
+    # Register tools (executable functions)
+    register_tools(server, repository)
+
+    # Register prompts (automatic context injection)
+    register_prompts(server, repository)
+
+    @server.custom_route("/metrics", methods=["GET"])
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        """Prometheus metrics, available with the HTTP transport."""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    # Streaming file downloads
+    register_file_routes(server, repository)
+
+    # Liveness and readiness probes
+    register_health_routes(server, repository)
 
-# Create FastMCP server
-mcp = FastMCP(
-    name="preferences-server"
-)
+    return server
 
-# Register resources (read-only data)
-register_resources(mcp, REPO_ROOT)
 
-# Register tools (executable functions)
-register_tools(mcp, REPO_ROOT)
+# Get repository roots
+REPO_ROOTS = get_repo_roots()
+REPO_ROOT = REPO_ROOTS[0]
 
-# Register prompts (automatic context injection)
-register_prompts(mcp, REPO_ROOT)
+_IMPORTS_DONE = time.perf_counter()
+
+_server: Optional[FastMCP] = None
+
+
+def get_server() -> FastMCP:
+    """Return the server configured from the environment, creating it on first use."""
+    global _server
+    if _server is None:
+        _server = create_server(REPO_ROOTS, Profiler.from_env(), TrafficRecorder.from_env())
+    return _server
+
+
+def __getattr__(name: str):
+    # The module-level `mcp` (used by `fastmcp run` and `fastmcp install`) is
+    # only created when first accessed, so main() can build the one server
+    # it runs from the command line options instead.
+    if name == "mcp":
+        return get_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def profile_startup() -> dict:
+    """Warm up the server in the foreground and report where the time went.
+
+    Covers module imports, server creation, each warm-up phase and the first
+    in-process request, which includes starting the lifespan (and watcher).
+
+    Returns:
+        Report dictionary with durations in seconds
+    """
+    server = get_server()
+    server_created = time.perf_counter()
+    repository = get_overlay(REPO_ROOTS)
+    primary = repository.repositories[0]
+    start = time.perf_counter()
+    repository.warm_up()
+    warmed_up = time.perf_counter()
+
+    async def first_request():
+        async with Client(server) as client:
+            await client.read_resource("preferences://catalog")
+
+    asyncio.run(first_request())
+    first_response = time.perf_counter()
+
+    return {
+        "repository": str(REPO_ROOT),
+        "roots": [str(root) for root in REPO_ROOTS],
+        "snapshot": str(primary.snapshot_path) if primary.snapshot_path else None,
+        "snapshot_loaded": repository.snapshot_loaded,
+        "devcontainers": len(repository.catalog.devcontainers),
+        "seconds": {
+            "imports": round(_IMPORTS_DONE - _IMPORT_STARTED, 3),
+            "create_server": round(server_created - _IMPORTS_DONE, 3),
+            "warm_up": round(warmed_up - start, 3),
+            "warm_up_phases": {name: round(seconds, 3) for name, seconds in repository.warmup_phases.items()},
+            "first_response": round(first_response - warmed_up, 3),
+            "total": round(first_response - _IMPORT_STARTED, 3)
+        }
+    }
 
 
 def main():
@@ -69,18 +255,60 @@ def main():
         help="Host for HTTP transport (default: localhost)"
     )
 
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print a breakdown of import, warm-up and first-response time as JSON, then exit"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile requests that send an X-Profile header or a profile flag in _meta (default: PROFILING)"
+    )
+    parser.add_argument(
+        "--profile-sample-rate",
+        type=float,
+        help="Also profile this fraction of all requests (default: PROFILE_SAMPLE_RATE)"
+    )
+
+    parser.add_argument(
+        "--record",
+        type=Path,
+        metavar="PATH",
+        help="Append every request to a JSONL trace for benchmarks.replay (default: RECORD_PATH)"
+    )
+
     args = parser.parse_args()
 
+    if args.profile_startup:
+        print(json.dumps(profile_startup(), indent=2))
+        return
+
+    # Build only the server that runs, so that a single recorder writes the
+    # trace.
+    if args.profile or args.profile_sample_rate is not None or args.record:
+        profiler = Profiler.from_env()
+        if args.profile or args.profile_sample_rate is not None:
+            profiler = profiler or Profiler()
+        if args.profile_sample_rate is not None:
+            if not 0.0 <= args.profile_sample_rate <= 1.0:
+                parser.error("--profile-sample-rate must be between 0 and 1")
+            profiler.sample_rate = args.profile_sample_rate
+        recorder = TrafficRecorder(args.record) if args.record else TrafficRecorder.from_env()
+        server = create_server(REPO_ROOTS, profiler, recorder)
+    else:
+        server = get_server()
+
     if args.transport == "stdio":
         # Local transport for Claude Desktop
         print(f"Starting MCP server with stdio transport", flush=True)
-        print(f"Repository: {REPO_ROOT}", flush=True)
-        mcp.run()
+        print(f"Repository: {os.pathsep.join(map(str, REPO_ROOTS))}", flush=True)
+        server.run()
     else:
         # HTTP transport for remote access
         print(f"Starting MCP server with HTTP transport on {args.host}:{args.port}", flush=True)
-        print(f"Repository: {REPO_ROOT}", flush=True)
-        mcp.run(transport="http", host=args.host, port=args.port)
+        print(f"Repository: {os.pathsep.join(map(str, REPO_ROOTS))}", flush=True)
+        server.run(transport="http", host=args.host, port=args.port)
 
 
 if __name__ == "__main__":
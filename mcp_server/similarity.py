@@ -0,0 +1,351 @@
+"""BM25 ranking and related-document search for the preferences MCP server.
+
+Every template and searchable guide is tokenized into lowercase words, and
+the index keeps, for each term, the documents containing it and how often.
+A query is scored against every document at once: the posting lists of its
+terms are gathered into flat arrays and combined with the BM25 weighting in
+one vectorized pass, which amounts to a sparse matrix-vector product of the
+term-document matrix with the query vector.
+
+Related documents are found the same way, using the most distinctive terms
+of a document as the query.
+
+Posting lists are stored in compact typed arrays (four bytes per entry and
+value). When NumPy is installed (the "similarity" extra) scoring runs on
+zero-copy views of those arrays; without it an equivalent pure-Python loop
+is used, which gives the same results more slowly. Global statistics (the
+number of documents, document frequencies and average length) are applied
+at query time, so adding or removing a document only touches its own
+postings and the index is kept current incrementally.
+"""
+
+import functools
+import heapq
+import math
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .search_index import Document, document_for_path
+from .utils import read_file_safe
+
+
+# BM25 term-frequency saturation and length normalization parameters.
+K1 = 1.2
+B = 0.75
+
+# Default and maximum number of ranked results.
+DEFAULT_RANK_LIMIT = 10
+MAX_RANK_LIMIT = 50
+
+# Number of a document's highest-weighted terms used to find related
+# documents, and the largest fraction of all documents such a term may occur
+# in. Common terms say little about similarity and have the longest posting
+# lists.
+RELATED_TERMS = 25
+RELATED_MAX_DOCUMENT_FREQUENCY = 0.5
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+@functools.cache
+def _numpy():
+    """Return the numpy module, or None if it is not installed.
+
+    Imported on first use so servers that never rank pay nothing for it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase terms of at least two characters.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Terms in order of appearance, with repetitions
+    """
+    return [term for term in _TOKEN.findall(text.lower()) if len(term) > 1]
+
+
+class SimilarityIndex:
+    """Incrementally maintained BM25 index over the templates and guides."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: dict[str, int] = {}
+        self._documents: list[Optional[Document]] = []
+        # Terms and counts of each document, needed to remove it again and
+        # to find documents related to it.
+        self._terms: list[tuple[str, ...]] = []
+        self._counts: list[array] = []
+        self._lengths = array("f")
+        self._free: list[int] = []
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, document: Document, text: str):
+        """Index a document, replacing any previous version of it.
+
+        Args:
+            document: Document to index
+            text: Contents of the document
+        """
+        # Path components such as the template name count as terms too.
+        counts = Counter(tokenize(text) + tokenize(document.path))
+        terms = tuple(sys.intern(term) for term in counts)
+        with self._lock:
+            self._remove(document.path)
+            doc_id = self._free.pop() if self._free else len(self._documents)
+            length = float(sum(counts.values()))
+            if doc_id == len(self._documents):
+                self._documents.append(document)
+                self._terms.append(terms)
+                self._counts.append(array("f", counts.values()))
+                self._lengths.append(length)
+            else:
+                self._documents[doc_id] = document
+                self._terms[doc_id] = terms
+                self._counts[doc_id] = array("f", counts.values())
+                self._lengths[doc_id] = length
+            self._ids[document.path] = doc_id
+            self._total_length += length
+            for term, count in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("i"), array("f"))
+                postings[0].append(doc_id)
+                postings[1].append(count)
+
+    def remove(self, rel_path: str):
+        """Drop a document from the index if it is indexed.
+
+        Args:
+            rel_path: Path relative to the repository root
+        """
+        with self._lock:
+            self._remove(rel_path)
+
+    def _remove(self, rel_path: str):
+        doc_id = self._ids.pop(rel_path, None)
+        if doc_id is None:
+            return
+        for term in self._terms[doc_id]:
+            doc_ids, counts = self._postings[term]
+            position = doc_ids.index(doc_id)
+            # Order within a posting list does not matter: move the last
+            # entry into the gap.
+            doc_ids[position] = doc_ids[-1]
+            counts[position] = counts[-1]
+            doc_ids.pop()
+            counts.pop()
+            if not doc_ids:
+                del self._postings[term]
+        self._total_length -= self._lengths[doc_id]
+        self._documents[doc_id] = None
+        self._terms[doc_id] = ()
+        self._counts[doc_id] = array("f")
+        self._lengths[doc_id] = 0.0
+        self._free.append(doc_id)
+
+    def rank(self, query: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Rank documents by BM25 relevance to a free-text query.
+
+        Args:
+            query: Words describing what to look for
+            category: Filter by category - "all", "devcontainer", or "guide"
+            limit: Maximum number of results
+
+        Returns:
+            Dictionary containing:
+            - results: Result dictionaries with the document fields plus
+              score, best first
+            - terms: Query terms that occur in at least one document
+
+        Raises:
+            ValueError: If the limit is out of range or the query has no terms
+        """
+        _check_limit(limit)
+        weights = Counter(tokenize(query))
+        if not weights:
+            raise ValueError("Query contains no searchable words")
+        with self._lock:
+            known = {term: float(count) for term, count in weights.items() if term in self._postings}
+            ranked = self._top(self._scores(known), category, limit, exclude=None)
+        return {
+            "results": [{**document.to_result(), "score": round(score, 4)} for document, score in ranked],
+            "terms": sorted(known)
+        }
+
+    def related(self, rel_path: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Find the documents most similar to an indexed document.
+
+        The document's RELATED_TERMS most distinctive terms, leaving out
+        terms found in most documents, are used as a weighted query.
+        Similarity is reported relative to the document's score against
+        itself, so 1.0 means the same distinctive terms in the same
+        proportions.
+
+        Args:
+            rel_path: Path of the document, relative to the repository root
+            category: Filter by category - "all", "devcontainer", or "guide"
+            limit: Maximum number of results
+
+        Returns:
+            Dictionary containing:
+            - document: Fields of the document itself
+            - results: Result dictionaries with the document fields plus
+              similarity, most similar first
+            - terms: Terms the comparison was based on, most distinctive first
+
+        Raises:
+            ValueError: If the limit is out of range
+            KeyError: If the document is not indexed
+        """
+        _check_limit(limit)
+        with self._lock:
+            doc_id = self._ids.get(rel_path)
+            if doc_id is None:
+                raise KeyError(rel_path)
+            average = self._total_length / len(self._ids)
+            length_norm = K1 * (1 - B + B * self._lengths[doc_id] / average)
+            max_frequency = RELATED_MAX_DOCUMENT_FREQUENCY * len(self._ids)
+            weighted = sorted(
+                (
+                    (self._idf(term) * count * (K1 + 1) / (count + length_norm), term, count)
+                    for term, count in zip(self._terms[doc_id], self._counts[doc_id])
+                    if len(self._postings[term][0]) <= max_frequency
+                ),
+                reverse=True
+            )[:RELATED_TERMS]
+            # The query weight of a term is its saturated frequency in the
+            # document; the scoring adds the idf on the other side.
+            query = {term: weight / self._idf(term) for weight, term, _ in weighted}
+            self_score = sum(weight * query[term] for weight, term, _ in weighted)
+            ranked = self._top(self._scores(query), category, limit, exclude=doc_id)
+            document = self._documents[doc_id]
+        return {
+            "document": document.to_result(),
+            "results": [
+                {**d.to_result(), "similarity": round(score / self_score, 4) if self_score else 0.0}
+                for d, score in ranked
+            ],
+            "terms": [term for _, term, _ in weighted]
+        }
+
+    def _idf(self, term: str) -> float:
+        frequency = len(self._postings[term][0])
+        return math.log(1 + (len(self._ids) - frequency + 0.5) / (frequency + 0.5))
+
+    def _scores(self, query: dict[str, float]):
+        """Score every document slot against weighted query terms.
+
+        Returns:
+            Scores indexed by document id, as a NumPy array or a dict of the
+            non-zero scores
+        """
+        if not query:
+            return {}
+        average = self._total_length / len(self._ids)
+        np = _numpy()
+        if np is None:
+            scores: dict[int, float] = {}
+            for term, weight in query.items():
+                factor = self._idf(term) * weight * (K1 + 1)
+                doc_ids, counts = self._postings[term]
+                for doc_id, count in zip(doc_ids, counts):
+                    norm = K1 * (1 - B + B * self._lengths[doc_id] / average)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + factor * count / (count + norm)
+            return scores
+
+        terms = list(query)
+        doc_ids = np.concatenate([np.frombuffer(self._postings[t][0], dtype=np.int32) for t in terms])
+        counts = np.concatenate([np.frombuffer(self._postings[t][1], dtype=np.float32) for t in terms])
+        factors = np.repeat(
+            np.array([self._idf(t) * query[t] * (K1 + 1) for t in terms], dtype=np.float32),
+            [len(self._postings[t][0]) for t in terms]
+        )
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)[doc_ids]
+        contributions = factors * counts / (counts + K1 * (1 - B + B * lengths / average))
+        return np.bincount(doc_ids, weights=contributions, minlength=len(self._documents))
+
+    def _top(self, scores, category: str, limit: int, exclude: Optional[int]) -> list[tuple[Document, float]]:
+        """Return the best-scoring documents of a category, best first, ties by path."""
+        def wanted(doc_id: int) -> bool:
+            document = self._documents[doc_id]
+            return doc_id != exclude and document is not None and (category == "all" or document.type == category)
+
+        if isinstance(scores, dict):
+            scored = scores.items()
+        else:
+            np = _numpy()
+            nonzero = np.flatnonzero(scores > 0)
+            if len(nonzero) > limit + 1 and category == "all":
+                # Only the best few need to be looked at: keep everything
+                # scoring at least as high as the (limit + 1)th best, which
+                # leaves room for the excluded document and keeps all ties.
+                cutoff = np.partition(scores[nonzero], -(limit + 1))[-(limit + 1)]
+                nonzero = nonzero[scores[nonzero] >= cutoff]
+            scored = zip(nonzero.tolist(), scores[nonzero].tolist())
+
+        documents = self._documents
+        best = heapq.nsmallest(
+            limit,
+            (
+                (-score, document.path, document)
+                for doc_id, score in scored
+                if score > 0 and doc_id != exclude and (document := documents[doc_id]) is not None
+                and (category == "all" or document.type == category)
+            )
+        )
+        return [(document, -score) for score, _, document in best]
+
+    def stats(self) -> dict:
+        """Return index size statistics."""
+        with self._lock:
+            return {
+                "documents": len(self._ids),
+                "terms": len(self._postings),
+                "postings": sum(len(doc_ids) for doc_ids, _ in self._postings.values()),
+                "numpy": _numpy() is not None
+            }
+
+
+def _check_limit(limit: int):
+    if not 1 <= limit <= MAX_RANK_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_RANK_LIMIT}")
+
+
+def build_similarity_index(repo_root: Path, paths: Iterable[str]) -> SimilarityIndex:
+    """Build a similarity index over the searchable files of a repository.
+
+    Args:
+        repo_root: Path to the repository root
+        paths: Relative paths of all files in the repository
+
+    Returns:
+        Populated index
+    """
+    index = SimilarityIndex()
+    for rel_path in paths:
+        document = document_for_path(rel_path)
+        if document is None:
+            continue
+        try:
+            index.add(document, read_file_safe(repo_root / rel_path, repo_root))
+        except (OSError, ValueError):
+            # Unreadable or binary files are not ranked.
+            continue
+    return index
@@ -0,0 +1,307 @@
+"""Persisted startup snapshots for the preferences MCP server.
+
+A snapshot records the catalog (file sizes, content hashes and text or
+binary classifications) and the
+search index of a repository, so a restarted server does not have to read
+and hash every template again. At startup the snapshot is loaded and checked
+against a fresh stat-only scan of the tree: entries whose file still has the
+recorded size, modification time and status change time are reused as they
+are, and only new or changed files are read. A file that kept its size and
+modification time but not its change time, as after a copy or a checkout, is
+hashed and reused only if its content is the same. A snapshot records the
+root it was written for and is ignored by any other root.
+
+Snapshots are gzipped JSON. Generate one at image build time, or whenever
+the repository has changed a lot:
+
+    python -m mcp_server.snapshot
+    python -m mcp_server.snapshot --repo /path/to/repo --output /tmp/snapshot.json.gz
+
+The server looks for the file named by the SNAPSHOT_PATH environment
+variable, by default .preferences-snapshot.json.gz in the repository root.
+Set SNAPSHOT_PATH to an empty string to disable snapshots.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Optional
+
+from .blobs import content_digest
+from .cache import FileSignature
+from .catalog import DEVCONTAINERS_DIR, Catalog, CatalogFile, DevcontainerEntry
+from .search_index import Document, TrigramIndex, document_for_path
+from .utils import get_repo_root, read_file_safe
+
+if TYPE_CHECKING:
+    from .repository import Repository, RepositoryTree
+
+
+# Bumped whenever the file format changes; other versions are ignored.
+SNAPSHOT_VERSION = 4
+
+# Snapshot file name used when SNAPSHOT_PATH is not set.
+DEFAULT_SNAPSHOT_NAME = ".preferences-snapshot.json.gz"
+
+
+def default_snapshot_path(repo_root: Path) -> Optional[Path]:
+    """Return where the snapshot of a repository is kept, or None if disabled.
+
+    Args:
+        repo_root: Path to the repository root
+    """
+    configured = os.getenv("SNAPSHOT_PATH")
+    if configured is None:
+        return repo_root / DEFAULT_SNAPSHOT_NAME
+    return Path(configured) if configured else None
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A loaded snapshot.
+
+    Attributes:
+        root: Resolved repository root the snapshot was written for
+        catalog: Catalog as it was when the snapshot was written
+        ctimes: Status change time in nanoseconds of each recorded file, by
+            path relative to the root
+        documents: Indexed documents sorted by path
+        document_signatures: (mtime_ns, size) of each document when indexed
+        document_contents: Position of each document's content in contents
+        contents: Distinct content digests, sorted
+        postings: Posting lists as positions in contents
+    """
+
+    root: str
+    catalog: Catalog
+    ctimes: dict[str, int]
+    documents: list[Document]
+    document_signatures: list[tuple[int, int]]
+    document_contents: list[int]
+    contents: list[str]
+    postings: dict[str, list[int]]
+    _verified: dict[str, bool] = field(default_factory=dict, repr=False, compare=False)
+
+    def _unchanged(self, tree: "RepositoryTree", rel_path: str, mtime_ns: int, size: int, digest: str) -> bool:
+        """Return whether a recorded file still has the recorded content.
+
+        Inode numbers are not compared: they are not stable across image
+        layers or copies. A file whose size and modification time match is
+        unchanged if its status change time matches too, which no write can
+        preserve; otherwise its content is hashed and compared.
+        """
+        signature = tree.signature(rel_path)
+        if signature is None or signature.mtime_ns != mtime_ns or signature.size != size:
+            return False
+        verified = self._verified.get(rel_path)
+        if verified is None:
+            path = tree.root / rel_path
+            try:
+                verified = (
+                    os.stat(path).st_ctime_ns == self.ctimes.get(rel_path)
+                    or content_digest(path.read_bytes()) == digest
+                )
+            except OSError:
+                verified = False
+            self._verified[rel_path] = verified
+        return verified
+
+    def catalog_for(self, tree: "RepositoryTree") -> Catalog:
+        """Return the snapshot catalog with its files matched against the current tree.
+
+        Unchanged files take on their current stat signature, so
+        build_catalog reuses their hashes. The rest keep the recorded
+        signature and are hashed again.
+
+        Args:
+            tree: Freshly scanned RepositoryTree
+        """
+        def adopt(rel_path: str, f: CatalogFile) -> CatalogFile:
+            if self._unchanged(tree, rel_path, f.signature.mtime_ns, f.size, f.sha256):
+                return replace(f, signature=tree.signature(rel_path))
+            return f
+
+        devcontainers = {}
+        for name, entry in self.catalog.devcontainers.items():
+            prefix = f"{DEVCONTAINERS_DIR}/{name}/"
+            files = tuple(adopt(prefix + f.path, f) for f in entry.files)
+            devcontainers[name] = replace(entry, files=files)
+        guides = {path: adopt(path, f) for path, f in self.catalog.guides.items()}
+        return replace(self.catalog, devcontainers=MappingProxyType(devcontainers), guides=MappingProxyType(guides))
+
+    def index_for(self, repo_root: Path, tree: "RepositoryTree", catalog: Catalog) -> TrigramIndex:
+        """Return a search index for the current tree, reusing unchanged documents.
+
+        Args:
+            repo_root: Path to the repository root
+            tree: Freshly scanned RepositoryTree
+            catalog: Current catalog; files it records as binary are not read
+        """
+        keep = [
+            self._unchanged(tree, d.path, mtime_ns, size, self.contents[content])
+            for d, (mtime_ns, size), content in zip(self.documents, self.document_signatures, self.document_contents)
+        ]
+        index = TrigramIndex(repo_root)
+        index.restore(self.documents, self.document_contents, self.contents, self.postings, keep)
+
+        reused = {d.path for d, k in zip(self.documents, keep) if k}
+        for rel_path in tree.paths():
+            document = document_for_path(rel_path)
+            if document is None or rel_path in reused or catalog.is_binary(rel_path):
+                continue
+            try:
+                index.add(document, read_file_safe(repo_root / rel_path, repo_root))
+            except (OSError, ValueError):
+                continue
+        return index
+
+
+def _file_state(f: CatalogFile) -> list:
+    return [f.path, f.size, f.sha256, f.encoding, f.signature.mtime_ns]
+
+
+def _catalog_file(state: list) -> CatalogFile:
+    path, size, sha256, encoding, mtime_ns = state
+    return CatalogFile(path, size, sys.intern(sha256), encoding, FileSignature(mtime_ns, size, 0))
+
+
+def write_snapshot(repository: "Repository", path: Path) -> dict:
+    """Write a snapshot of a warmed-up repository.
+
+    The file is written to a temporary name and renamed into place, so a
+    server starting concurrently never sees a partial snapshot.
+
+    Args:
+        repository: Repository to snapshot; warmed up first if necessary
+        path: File to write
+
+    Returns:
+        Dictionary with the path, size in bytes and counts of devcontainers
+        and indexed documents
+    """
+    catalog = repository.catalog
+    documents, document_contents, contents, postings = repository.search_index.export()
+    signatures = [repository.tree.signature(d.path) for d in documents]
+    paths = [
+        f"{DEVCONTAINERS_DIR}/{name}/{f.path}" for name, entry in catalog.devcontainers.items() for f in entry.files
+    ]
+    ctimes = {}
+    for rel_path in [*paths, *catalog.guides, *(d.path for d in documents)]:
+        try:
+            ctimes[rel_path] = os.stat(repository.root / rel_path).st_ctime_ns
+        except OSError:
+            continue
+    state = {
+        "version": SNAPSHOT_VERSION,
+        "root": str(repository.root.resolve()),
+        "ctimes": ctimes,
+        "catalog": {
+            "generation": catalog.generation,
+            "tree_hash": catalog.tree_hash,
+            "devcontainers": {
+                name: {"tree_hash": entry.tree_hash, "files": [_file_state(f) for f in entry.files]}
+                for name, entry in catalog.devcontainers.items()
+            },
+            "guides": [_file_state(f) for f in catalog.guides.values()]
+        },
+        "index": {
+            "documents": [
+                [d.path, d.type, d.name, s.mtime_ns if s else 0, s.size if s else -1, content]
+                for d, s, content in zip(documents, signatures, document_contents)
+            ],
+            "contents": contents,
+            "postings": postings
+        }
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as f:
+            f.write(json.dumps(state, separators=(",", ":")).encode())
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+    return {
+        "path": str(path),
+        "bytes": path.stat().st_size,
+        "devcontainers": len(catalog.devcontainers),
+        "documents": len(documents)
+    }
+
+
+def load_snapshot(path: Path, repo_root: Path) -> Optional[Snapshot]:
+    """Load a snapshot file.
+
+    Args:
+        path: Snapshot file
+        repo_root: Repository root the snapshot is loaded for
+
+    Returns:
+        The snapshot, or None if the file is missing, unreadable, was
+        written by a different format version or for another root
+    """
+    try:
+        with gzip.open(path, "rb") as f:
+            state = json.loads(f.read())
+        if state.get("version") != SNAPSHOT_VERSION or state.get("root") != str(repo_root.resolve()):
+            return None
+
+        catalog_state = state["catalog"]
+        devcontainers = {
+            name: DevcontainerEntry(name, tuple(_catalog_file(f) for f in entry["files"]), entry["tree_hash"])
+            for name, entry in catalog_state["devcontainers"].items()
+        }
+        guides = {f.path: f for f in (_catalog_file(g) for g in catalog_state["guides"])}
+        catalog = Catalog(
+            catalog_state["generation"], MappingProxyType(devcontainers), MappingProxyType(guides),
+            catalog_state["tree_hash"]
+        )
+
+        index_state = state["index"]
+        documents = [Document(path, type_, name) for path, type_, name, *_ in index_state["documents"]]
+        signatures = [(mtime_ns, size) for _, _, _, mtime_ns, size, _ in index_state["documents"]]
+        document_contents = [content for *_, content in index_state["documents"]]
+        return Snapshot(
+            state["root"], catalog, state["ctimes"], documents, signatures, document_contents,
+            index_state["contents"], index_state["postings"]
+        )
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return None
+
+
+def main():
+    """Command line entry point."""
+    from .repository import get_repository
+
+    parser = argparse.ArgumentParser(description="Write a startup snapshot of a preferences repository")
+    parser.add_argument("--repo", type=Path, help="Repository root (default: REPO_PATH or this checkout)")
+    parser.add_argument("--output", type=Path, help="Snapshot file (default: SNAPSHOT_PATH or the repository root)")
+    args = parser.parse_args()
+
+    repo_root = args.repo.resolve() if args.repo else get_repo_root()
+    output = args.output or default_snapshot_path(repo_root)
+    if output is None:
+        parser.error("Snapshots are disabled by SNAPSHOT_PATH; pass --output")
+
+    start = time.perf_counter()
+    repository = get_repository(repo_root)
+    # Build from the tree itself, never from an existing snapshot.
+    repository.snapshot_path = None
+    result = write_snapshot(repository, output)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,72 +3,178 @@
 Tools provide executable functions that can search, analyze, and compare preferences.
 """
 
-from pathlib import Path
-from fastmcp import FastMCP
-
-from .utils import search_in_file, list_directory_files
-
-
-def register_tools(mcp: FastMCP, repo_root: Path):
+import base64
+from typing import Optional, Union
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .batch import read_files, select_devcontainer_files
+from .compare import compare_entries, comparison_cache
+from .etags import current_etag
+from .executor import run_blocking
+from .file_ranges import read_file_range as read_range
+from .listing import DEFAULT_LIST_LIMIT, list_devcontainers
+from .overlay import Overlay
+from .search_index import DEFAULT_SEARCH_LIMIT
+from .similarity import DEFAULT_RANK_LIMIT
+
+
+def register_tools(mcp: FastMCP, repository: Overlay):
     """Register all tools with the MCP server.
 
     Args:
         mcp: FastMCP server instance
-        repo_root: Path to the repository root
+        repository: Repository roots to serve
     """
 
     @mcp.tool()
-    def search_preferences(query: str, category: str = "all") -> list[dict]:
+    async def search_preferences(
+        query: str,
+        category: str = "all",
+        mode: str = "substring",
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        order: str = "path",
+        max_edits: int = 1,
+        time_budget_ms: Optional[int] = None
+    ) -> dict:
         """Searches for preferences matching a query.
 
-        Searches through preference files and returns matches with context.
+        Searches through preference files and returns matches with context,
+        one page at a time. Candidate files are narrowed with an in-memory
+        trigram index before being verified, and reading stops once the page
+        is full, so broad queries return quickly with a cursor for the rest.
+
+        Args:
+            query: Search term to look for (a regular expression in regex mode)
+            category: Filter by category - "all", "devcontainer", or "guide"
+            mode: "substring" (case-insensitive), "regex" (case-insensitive
+                regular expression of up to 256 characters, without nested
+                repetitions such as (a+)+ or repeated alternatives that can
+                match the same text such as (a|ab)+) or "fuzzy" (within
+                max_edits edits)
+            limit: Maximum number of results (1-100)
+            offset: Number of matching files to skip (with several repository
+                roots, offset + limit may be at most 100)
+            cursor: next_cursor from the previous page of the same search
+            order: "path" (stops early) or "score" (ranks all matches by count)
+            max_edits: Maximum edit distance in fuzzy mode (0-3)
+            time_budget_ms: Time to spend searching before returning what was
+                found so far (default: 2000)
+
+        Returns:
+            Dictionary containing:
+            - results: List of matches, each with:
+              - type: Category type (devcontainer or guide)
+              - name: Name of the item
+              - file: Filename (for devcontainers)
+              - path: Relative path to the file
+              - score: Number of matches in the file
+              - matches: Up to five matching lines, each with line, snippet
+                and spans (start and end offsets of the matches in snippet)
+            - next_cursor: Cursor for the next page, or null if there is none
+            - timed_out: True if the time budget ran out before the page was full
+
+        Raises:
+            ToolError: If a parameter, the query or the cursor is invalid
+        """
+        if time_budget_ms is not None and time_budget_ms <= 0:
+            raise ToolError("time_budget_ms must be positive")
+
+        try:
+            return await repository.search(
+                query, category, mode, limit, offset, cursor, order, max_edits,
+                time_budget_ms / 1000 if time_budget_ms is not None else None
+            )
+        except ValueError as e:
+            raise ToolError(str(e))
+
+    @mcp.tool()
+    async def rank_preferences(query: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Ranks preference files by relevance to a description.
+
+        Unlike search_preferences, which finds exact or fuzzy occurrences of a
+        term, this scores every file against all the words of the query with
+        BM25, so it answers questions like "node app behind a reverse proxy".
+
+        Args:
+            query: Words describing what to look for
+            category: Filter by category - "all", "devcontainer", or "guide"
+            limit: Maximum number of results (1-50)
+
+        Returns:
+            Dictionary containing:
+            - results: Files ranked best first, each with type, name, file
+              (for devcontainers), path and score
+            - terms: Query words that occur in at least one file
+
+        Raises:
+            ToolError: If the limit is invalid or the query has no words
+        """
+        try:
+            return await repository.rank(query, category, limit)
+        except ValueError as e:
+            raise ToolError(str(e))
+
+    @mcp.tool()
+    async def related_preferences(path: str, category: str = "all", limit: int = DEFAULT_RANK_LIMIT) -> dict:
+        """Finds the preference files most similar to a given file.
 
         Args:
-            query: Search term to look for
+            path: Path of a template file or guide, relative to the repository root
             category: Filter by category - "all", "devcontainer", or "guide"
+            limit: Maximum number of results (1-50)
 
         Returns:
-            List of dictionaries containing match information:
-            - type: Category type (devcontainer or guide)
-            - name: Name of the item
-            - file: Filename (for devcontainers)
-            - path: Relative path to the file
+            Dictionary containing:
+            - document: The file the others are compared with
+            - results: Similar files, most similar first, each with type,
+              name, file (for devcontainers), path and similarity (1.0 for
+              the same distinctive words in the same proportions)
+            - terms: Words the comparison was based on, most distinctive first
+
+        Raises:
+            ToolError: If the limit is invalid or the file is not indexed
         """
-        results = []
-        query_lower = query.lower()
-
-        # Search devcontainers
-        if category in ["all", "devcontainer"]:
-            devcontainer_dir = repo_root / "templates" / "devcontainers"
-            if devcontainer_dir.exists():
-                for dc_dir in devcontainer_dir.iterdir():
-                    if dc_dir.is_dir() and not dc_dir.name.startswith("."):
-                        for file_path in dc_dir.rglob("*"):
-                            if file_path.is_file():
-                                if search_in_file(file_path, query):
-                                    results.append({
-                                        "type": "devcontainer",
-                                        "name": dc_dir.name,
-                                        "file": file_path.name,
-                                        "path": str(file_path.relative_to(repo_root))
-                                    })
-
-        # Search guides
-        if category in ["all", "guide"]:
-            for guide in ["CLAUDE.md", "README.md"]:
-                guide_path = repo_root / guide
-                if guide_path.exists():
-                    if search_in_file(guide_path, query):
-                        results.append({
-                            "type": "guide",
-                            "name": guide,
-                            "path": guide
-                        })
-
-        return results
+        try:
+            return await repository.related(path, category, limit)
+        except KeyError:
+            raise ToolError(f"File '{path}' is not a template or searchable guide")
+        except ValueError as e:
+            raise ToolError(str(e))
 
     @mcp.tool()
-    def list_devcontainer_files(name: str) -> list[str]:
+    async def query_templates(filters: Optional[dict[str, Union[str, int, list[Union[str, int]]]]] = None) -> dict:
+        """Finds devcontainer templates by structured facets.
+
+        Facets are read from each template's Dockerfile, devcontainer.json,
+        docker-compose.yml and Caddyfile: base_images, versions (e.g.
+        "python=3.12", or just "python"), tools, packages, ports, services,
+        features, extensions and proxies. Every filter must match; a list
+        of values requires all of them.
+
+        Args:
+            filters: Facet name to a value or list of values, e.g.
+                {"versions": "python=3.12", "tools": "uv"} or {"ports": 443};
+                omit to list the facets of every template
+
+        Returns:
+            Dictionary containing:
+            - results: Facets of each matching template, sorted by name
+            - count: Number of matching templates
+
+        Raises:
+            ToolError: If a filter names an unknown facet
+        """
+        try:
+            matches = await repository.query_templates(filters or {})
+        except ValueError as e:
+            raise ToolError(str(e))
+        return {"results": [facets.to_dict() for facets in matches], "count": len(matches)}
+
+    @mcp.tool()
+    async def list_devcontainer_files(name: str) -> list[str]:
         """Lists all files in a specific devcontainer configuration.
 
         Args:
@@ -77,19 +183,20 @@ def register_tools(mcp: FastMCP, repo_root: Path):
         Returns:
             List of relative file paths within the devcontainer
         """
-        dc_path = repo_root / "templates" / "devcontainers" / name
-
-        if not dc_path.exists() or not dc_path.is_dir():
+        entry = repository.catalog.devcontainer(name)
+        if entry is None:
             return []
 
-        return list_directory_files(dc_path)
+        return entry.file_names()
 
     @mcp.tool()
-    def compare_devcontainers(name1: str, name2: str) -> dict:
+    async def compare_devcontainers(name1: str, name2: str) -> dict:
         """Compares two devcontainer configurations.
 
-        Analyzes the files present in each devcontainer and identifies
-        common files and unique files in each.
+        Compares the files of each devcontainer, including those in
+        subdirectories, by content hash: identical files are not read, and
+        changed files get a unified diff. Results are memoized until a file
+        in either devcontainer changes.
 
         Args:
             name1: First devcontainer name
@@ -102,10 +209,11 @@ def register_tools(mcp: FastMCP, repo_root: Path):
             - common_files: Files present in both
             - unique_to_1: Files only in the first
             - unique_to_2: Files only in the second
+            - identical: Common files with the same contents
+            - changed: Common files whose contents differ, each with path,
+              size1, size2 and diff (a unified diff, or null with a reason
+              if the file is too large or not text)
         """
-        dc1_path = repo_root / "templates" / "devcontainers" / name1
-        dc2_path = repo_root / "templates" / "devcontainers" / name2
-
         comparison = {
             "name1": name1,
             "name2": name2,
@@ -113,54 +221,203 @@ def register_tools(mcp: FastMCP, repo_root: Path):
             "files2": [],
             "common_files": [],
             "unique_to_1": [],
-            "unique_to_2": []
+            "unique_to_2": [],
+            "identical": [],
+            "changed": []
         }
 
-        # Get file lists
-        if dc1_path.exists() and dc1_path.is_dir():
-            comparison["files1"] = [
-                f.name for f in dc1_path.iterdir() if f.is_file()
-            ]
+        catalog = repository.catalog
+        entry1 = catalog.devcontainer(name1)
+        entry2 = catalog.devcontainer(name2)
 
-        if dc2_path.exists() and dc2_path.is_dir():
-            comparison["files2"] = [
-                f.name for f in dc2_path.iterdir() if f.is_file()
-            ]
+        if entry1 is None or entry2 is None:
+            # Report whatever exists, all of it unique.
+            if entry1 is not None:
+                comparison["files1"] = comparison["unique_to_1"] = entry1.file_names()
+            if entry2 is not None:
+                comparison["files2"] = comparison["unique_to_2"] = entry2.file_names()
+            return comparison
 
-        # Compare
-        set1 = set(comparison["files1"])
-        set2 = set(comparison["files2"])
+        key = comparison_cache.key(entry1, entry2)
+        result = comparison_cache.get(key)
+        if result is None:
+            result = await run_blocking(compare_entries, repository, entry1, entry2)
+            comparison_cache.put(key, result)
 
-        comparison["common_files"] = sorted(list(set1 & set2))
-        comparison["unique_to_1"] = sorted(list(set1 - set2))
-        comparison["unique_to_2"] = sorted(list(set2 - set1))
+        return {**comparison, **result}
 
-        return comparison
+    @mcp.tool()
+    async def list_all_preferences(
+        prefix: str = "",
+        tag: Optional[str] = None,
+        fields: Optional[list[str]] = None,
+        limit: int = DEFAULT_LIST_LIMIT,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Lists the available devcontainer templates, one page at a time.
+
+        Templates are listed in name order from an in-memory index, so a page
+        costs the same however many templates there are. Pass next_cursor
+        back to get the following page.
+
+        Args:
+            prefix: Only templates whose name starts with this
+            tag: Only templates with this word in their name, e.g. "python"
+                for "ubuntu-python-uv"
+            fields: Fields to include for each template besides its name:
+                files (top-level file names), file_count, size (total bytes),
+                tree_hash and tags (default: ["files"]; [] for names only)
+            limit: Maximum number of templates (1-1000)
+            cursor: next_cursor from the previous page of the same listing
+
+        Returns:
+            Dictionary containing:
+            - devcontainers: Templates, each with name and the requested
+              fields, or just names when fields is []
+            - total: Number of templates matching prefix and tag
+            - next_cursor: Cursor for the next page, or null if there is none
+            - generation: Catalog generation the listing was taken from
+
+        Raises:
+            ToolError: If a field is unknown, the limit is invalid or the cursor is invalid
+        """
+        try:
+            return list_devcontainers(
+                repository.catalog, ["files"] if fields is None else fields, prefix, tag, limit, cursor
+            )
+        except ValueError as e:
+            raise ToolError(str(e))
 
     @mcp.tool()
-    def list_all_preferences() -> dict:
-        """Lists all available preferences organized by category.
+    async def get_files(
+        paths: Optional[list[str]] = None,
+        devcontainer: Optional[str] = None,
+        pattern: str = "*"
+    ) -> dict:
+        """Fetches several files in one call.
+
+        Either pass an explicit list of paths, or a devcontainer name and an
+        optional glob to fetch all of its matching files (for example a whole
+        template with pattern "*"); its binary files are left out, and can be
+        read with read_file_range. A file that cannot be read is reported in
+        errors without failing the others.
+
+        Args:
+            paths: File paths relative to the repository root
+            devcontainer: Name of a devcontainer to fetch files from
+            pattern: Glob matched against paths within the devcontainer
 
         Returns:
-            Dictionary with categories and their items:
-            - devcontainers: List of devcontainer configurations
-            - Each devcontainer includes name and file list
+            Dictionary containing:
+            - files: List of {path, content} for files that were read
+            - errors: List of {path, error} for files that could not be read
+
+        Raises:
+            ToolError: If neither or both of paths and devcontainer are given,
+                the devcontainer doesn't exist, or too many files are requested
         """
-        result = {
-            "devcontainers": []
-        }
+        if (paths is None) == (devcontainer is None):
+            raise ToolError("Pass either paths or devcontainer, but not both")
 
-        devcontainer_dir = repo_root / "templates" / "devcontainers"
-        if devcontainer_dir.exists():
-            for dc_dir in devcontainer_dir.iterdir():
-                if dc_dir.is_dir() and not dc_dir.name.startswith("."):
-                    files = [f.name for f in dc_dir.iterdir() if f.is_file()]
-                    result["devcontainers"].append({
-                        "name": dc_dir.name,
-                        "files": sorted(files)
-                    })
+        if devcontainer is not None:
+            try:
+                paths = select_devcontainer_files(repository.catalog, devcontainer, pattern)
+            except KeyError:
+                raise ToolError(f"Devcontainer '{devcontainer}' not found")
 
-        # Sort by name
-        result["devcontainers"].sort(key=lambda x: x["name"])
+        try:
+            return await read_files(repository, paths)
+        except ValueError as e:
+            raise ToolError(str(e))
+
+    @mcp.tool()
+    async def read_file_range(
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        start_line: Optional[int] = None,
+        line_count: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Reads part of a file, for files too large to fetch in one go.
+
+        Select the slice by byte offset and length, by a 1-based line range,
+        or by the cursor returned for the previous slice. Each call returns at
+        most MAX_READ_BYTES (1 MiB by default); keep passing next_cursor back
+        until it is null to read the whole file. Binary files are returned
+        base64-encoded and can only be sliced by offset and length.
 
-        return result
+        Args:
+            path: File path relative to the repository root
+            offset: Byte offset to start at
+            length: Maximum number of bytes to return
+            start_line: First line to return, instead of offset
+            line_count: Number of lines to return
+            cursor: Continuation cursor from a previous call
+
+        Returns:
+            Dictionary containing:
+            - path: The requested path
+            - offset: Byte offset of the slice
+            - end: Byte offset just past the slice
+            - total_size: Size of the whole file in bytes
+            - next_cursor: Cursor for the next slice, or null at the end of the file
+            - encoding: "utf-8", or "base64" for a binary file
+            - mime_type: Guessed media type (binary files only)
+            - content: Contents of the slice
+
+        Raises:
+            ToolError: If the file is not found, access is denied or the range is invalid
+        """
+        try:
+            file_range = await run_blocking(
+                read_range, repository, path, offset, length, start_line, line_count, cursor
+            )
+        except ValueError as e:
+            raise ToolError(str(e))
+        except FileNotFoundError:
+            raise ToolError(f"File '{path}' not found")
+
+        return {"path": path, **file_range.meta(), "content": file_range.text()}
+
+    @mcp.tool()
+    async def fetch_resource(uri: str, ctx: Context, if_none_match: Optional[str] = None) -> dict:
+        """Reads a resource unless the caller already has the current version.
+
+        Pass the ETag from a previous read (`_meta.etag` of a resource, or the
+        etag returned by this tool) as if_none_match. When it still matches,
+        the content is not read or sent again.
+
+        Args:
+            uri: Resource URI, e.g. "preferences://guide/style"
+            if_none_match: ETag of the version the caller already holds
+
+        Returns:
+            Dictionary containing:
+            - uri: The requested URI
+            - etag: Current ETag of the resource, if known
+            - not_modified: True if if_none_match matched the current ETag
+            - content: Resource content, base64-encoded for a binary file
+              (only when not_modified is False, as are the fields below)
+            - encoding: "utf-8", or "base64" for a binary file
+            - mime_type: Media type of the resource, if known
+            - meta: The resource's _meta, such as its ETag and, for slices
+              of preferences://files/, their offsets and next_cursor
+        """
+        etag = await current_etag(repository, uri)
+        if if_none_match is not None and etag is not None and if_none_match == etag:
+            return {"uri": uri, "etag": etag, "not_modified": True}
+
+        contents = await ctx.read_resource(uri)
+        item = contents[0] if contents else None
+        content = item.content if item is not None else ""
+        binary = isinstance(content, bytes)
+        return {
+            "uri": uri,
+            "etag": etag,
+            "not_modified": False,
+            "content": base64.b64encode(content).decode() if binary else content,
+            "encoding": "base64" if binary else "utf-8",
+            "mime_type": item.mime_type if item is not None else None,
+            "meta": dict(getattr(item, "meta", None) or {})
+        }
@@ -1,23 +1,36 @@
 """Utility functions for the preferences MCP server."""
 
+import os
+import stat
 from pathlib import Path
 from typing import Optional
 
+from .cache import FileSignature, cache_for
 
-def get_repo_root() -> Path:
-    """Get the repository root directory.
 
-    Returns the path from the REPO_PATH environment variable if set,
-    otherwise assumes the parent directory of the mcp package.
-    """
-    import os
+def get_repo_roots() -> list[Path]:
+    """Get the repository roots to serve, highest precedence first.
 
+    REPO_PATH may list several roots separated by os.pathsep (":" on Unix),
+    such as per-user overrides followed by a team-wide base. Without it the
+    parent directory of the mcp package is served.
+    """
     repo_path = os.getenv("REPO_PATH")
-    if repo_path:
-        return Path(repo_path).resolve()
+    roots = [Path(path).resolve() for path in repo_path.split(os.pathsep) if path] if repo_path else []
+    if roots:
+        return list(dict.fromkeys(roots))
 
     # Default: parent directory of mcp package
-    return Path(__file__).parent.parent.resolve()
+    return [Path(__file__).parent.parent.resolve()]
+
+
+def get_repo_root() -> Path:
+    """Get the repository root directory.
+
+    Returns the first root from REPO_PATH if set, otherwise assumes the
+    parent directory of the mcp package.
+    """
+    return get_repo_roots()[0]
 
 
 def ensure_path_in_repo(file_path: Path, repo_root: Path) -> Path:
@@ -41,69 +54,51 @@ def ensure_path_in_repo(file_path: Path, repo_root: Path) -> Path:
         raise ValueError(f"Access denied: path '{file_path}' is outside repository")
 
 
-def list_directory_files(directory: Path, pattern: str = "*") -> list[str]:
-    """List all files in a directory matching a pattern.
-
-    Args:
-        directory: Directory to search
-        pattern: Glob pattern to match (default: all files)
-
-    Returns:
-        List of relative file paths
-    """
-    if not directory.exists() or not directory.is_dir():
-        return []
-
-    files = []
-    for file_path in directory.rglob(pattern):
-        if file_path.is_file():
-            files.append(str(file_path.relative_to(directory)))
-
-    return sorted(files)
-
-
-def read_file_safe(file_path: Path, repo_root: Path) -> str:
-    """Safely read a file within the repository.
+def stat_file_safe(file_path: Path, repo_root: Path) -> tuple[Path, os.stat_result]:
+    """Resolve and stat a regular file within the repository.
 
     Args:
-        file_path: Path to the file to read
+        file_path: Path to the file
         repo_root: Repository root directory
 
     Returns:
-        File contents as string
+        Tuple of the resolved path and its stat result
 
     Raises:
-        ValueError: If path is outside repository
+        ValueError: If path is outside repository or is not a regular file
         FileNotFoundError: If file doesn't exist
     """
     # Security check
     resolved_path = ensure_path_in_repo(file_path, repo_root)
 
-    if not resolved_path.exists():
+    # A single stat covers the existence check, the file type check and the
+    # cache validation signature.
+    try:
+        st = resolved_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    if not resolved_path.is_file():
+    if not stat.S_ISREG(st.st_mode):
         raise ValueError(f"Not a file: {file_path}")
 
-    return resolved_path.read_text()
+    return resolved_path, st
 
 
-def search_in_file(file_path: Path, query: str, case_sensitive: bool = False) -> bool:
-    """Check if a query string appears in a file.
+def read_file_safe(file_path: Path, repo_root: Path) -> str:
+    """Safely read a file within the repository.
 
     Args:
-        file_path: Path to the file
-        query: Search query
-        case_sensitive: Whether to perform case-sensitive search
+        file_path: Path to the file to read
+        repo_root: Repository root directory
 
     Returns:
-        True if query is found, False otherwise
+        File contents as string, served from the root's content cache when
+        the file has not changed since it was last read
+
+    Raises:
+        ValueError: If path is outside repository
+        FileNotFoundError: If file doesn't exist
     """
-    try:
-        content = file_path.read_text()
-        if case_sensitive:
-            return query in content
-        else:
-            return query.lower() in content.lower()
-    except Exception:
-        return False
+    resolved_path, st = stat_file_safe(file_path, repo_root)
+    return cache_for(repo_root).read(resolved_path, FileSignature.from_stat(st))
+
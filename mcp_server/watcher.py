@@ -0,0 +1,260 @@
+"""Filesystem watchers for the preferences MCP server.
+
+Watchers run on a background thread and keep a RepositoryTree current by
+asking it to refresh the paths that changed. On Linux, inotify is used so
+changes are picked up as soon as they happen. Elsewhere, or when inotify is
+unavailable, the tree is rescanned on a fixed interval.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .repository import IGNORED_DIRS, RepositoryTree
+
+
+logger = logging.getLogger(__name__)
+
+# Inotify event masks, from <sys/inotify.h>.
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Time to wait for related events (e.g. a git checkout) before applying them.
+SETTLE_SECONDS = 0.05
+
+
+class PollingWatcher:
+    """Watcher that rescans the whole tree on a fixed interval.
+
+    Args:
+        tree: Repository tree to keep current
+        interval: Seconds between rescans
+    """
+
+    def __init__(self, tree: RepositoryTree, interval: float = 0.5):
+        self.tree = tree
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="preferences-poll-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and wait for it to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tree.refresh()
+            except Exception:
+                # Keep polling; the next rescan picks up what this one missed.
+                logger.exception("Failed to rescan %s", self.tree.root)
+
+
+class InotifyWatcher:
+    """Watcher backed by Linux inotify.
+
+    Every directory in the tree gets its own watch. Events are collected for
+    a short settle period, de-duplicated by path, and then applied as one
+    batch through RepositoryTree.refresh_many. A queue overflow triggers a
+    full rescan.
+
+    Args:
+        tree: Repository tree to keep current
+
+    Raises:
+        OSError: If inotify is not available
+    """
+
+    def __init__(self, tree: RepositoryTree):
+        self.tree = tree
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: dict[int, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        if not self._add_watches(""):
+            # Most likely fs.inotify.max_user_watches is exhausted.
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, "inotify_add_watch failed")
+        self._stop_read, self._stop_write = os.pipe()
+
+    def start(self):
+        """Start the background thread."""
+        self._thread = threading.Thread(target=self._run, name="preferences-inotify-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and release the inotify descriptor."""
+        os.write(self._stop_write, b"x")
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._fd, self._stop_read, self._stop_write):
+            os.close(fd)
+
+    def _add_watches(self, rel_dir: str) -> bool:
+        """Watch a directory and all of its subdirectories.
+
+        Returns:
+            True if every directory could be watched
+        """
+        ok = True
+        directory = self.tree.root / rel_dir if rel_dir else self.tree.root
+        for current, subdirs, _ in os.walk(directory):
+            rel_current = Path(current).relative_to(self.tree.root).as_posix()
+            prefix = "" if rel_current == "." else f"{rel_current}/"
+            subdirs[:] = [
+                d for d in subdirs if d not in IGNORED_DIRS and not self.tree.rules.excludes(prefix + d, True)
+            ]
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(current), WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = "" if rel_current == "." else rel_current
+            else:
+                ok = False
+        return ok
+
+    def _remove_watches(self, rel_dir: str):
+        """Stop watching a directory that was moved away, and its subdirectories."""
+        prefix = f"{rel_dir}/"
+        for wd, path in list(self._watches.items()):
+            if path == rel_dir or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([self._fd, self._stop_read], [], [])
+            if self._stop_read in ready:
+                return
+            # Give related events a moment to arrive so they are applied together.
+            select.select([self._stop_read], [], [], SETTLE_SECONDS)
+            paths, new_dirs, moved_dirs, overflow = self._drain()
+            try:
+                self._apply(paths, new_dirs, moved_dirs, overflow)
+            except Exception:
+                # Keep watching, so one bad batch does not leave the tree
+                # stale for good.
+                logger.exception("Failed to apply a batch of %d changed paths in %s", len(paths), self.tree.root)
+
+    def _apply(self, paths: set[str], new_dirs: set[str], moved_dirs: set[str], overflow: bool):
+        for rel_dir in moved_dirs:
+            self._remove_watches(rel_dir)
+        if overflow:
+            self.tree.refresh()
+            return
+        for rel_dir in new_dirs:
+            self._add_watches(rel_dir)
+        self.tree.refresh_many(paths)
+        if paths & set(self.tree.rules.names):
+            # Directories the old rules excluded may be included now.
+            self._add_watches("")
+
+    def _drain(self) -> tuple[set[str], set[str], set[str], bool]:
+        paths: set[str] = set()
+        new_dirs: set[str] = set()
+        moved_dirs: set[str] = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                rel_dir = self._watches.get(wd)
+                if rel_dir is None or not name:
+                    continue
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                paths.add(rel_path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name not in IGNORED_DIRS:
+                    new_dirs.add(rel_path)
+                if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                    moved_dirs.add(rel_path)
+        return paths, new_dirs, moved_dirs, overflow
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not supported by this libc")
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def create_watcher(tree: RepositoryTree, mode: str = "auto", poll_interval: float = 0.5):
+    """Create a watcher for a repository tree.
+
+    Args:
+        tree: Repository tree to keep current
+        mode: "auto" (inotify with polling fallback), "inotify", "polling" or "off"
+        poll_interval: Seconds between rescans for the polling watcher
+
+    Returns:
+        An unstarted watcher, or None if watching is disabled
+
+    Raises:
+        ValueError: If the mode is not recognised
+        OSError: If mode is "inotify" and inotify is not available
+    """
+    if mode == "off":
+        return None
+    if mode == "polling":
+        return PollingWatcher(tree, poll_interval)
+    if mode == "inotify":
+        return InotifyWatcher(tree)
+    if mode == "auto":
+        try:
+            return InotifyWatcher(tree)
+        except OSError:
+            return PollingWatcher(tree, poll_interval)
+    raise ValueError(f"Unknown watcher mode '{mode}'. Valid modes: auto, inotify, polling, off")
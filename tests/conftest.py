@@ -0,0 +1,34 @@
+"""Shared fixtures for the preferences MCP server tests."""
+
+from pathlib import Path
+
+import pytest
+
+
+# A small repository: three devcontainer templates and two guides.
+REPO_FILES = {
+    "README.md": "# Preferences\n\nTemplates for python and node projects.\n",
+    "CLAUDE.md": "# Guide\n\nPrefer uv for python projects.\n",
+    "templates/devcontainers/node/devcontainer.json": '{"name": "node", "forwardPorts": [3000]}\n',
+    "templates/devcontainers/node/Dockerfile": "FROM node:22\nRUN npm install -g pnpm\n",
+    "templates/devcontainers/node-postgres/devcontainer.json": '{"name": "node-postgres"}\n',
+    "templates/devcontainers/node-postgres/docker-compose.yml": "services:\n  db:\n    image: postgres:16\n",
+    "templates/devcontainers/python-uv/devcontainer.json": '{"name": "python-uv", "forwardPorts": [8000]}\n',
+    "templates/devcontainers/python-uv/Dockerfile": "FROM python:3.12\nRUN pip install uv\n",
+}
+
+
+def write_files(root: Path, files: dict[str, str]):
+    """Write files given by path relative to root, creating their directories."""
+    for rel_path, content in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+@pytest.fixture
+def repo_root(tmp_path: Path) -> Path:
+    """Root of a fresh copy of the small test repository."""
+    root = tmp_path / "repo"
+    write_files(root, REPO_FILES)
+    return root
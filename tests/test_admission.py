@@ -0,0 +1,174 @@
+"""Tests for request coalescing and per-handler concurrency limits."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_server.admission import AdmissionMiddleware, HandlerLimiter, SingleFlight, parse_limits
+from mcp_server.executor import ServerBusyError
+from mcp_server.metrics import HandlerMetrics, MetricsRegistry
+
+
+def test_parse_limits():
+    spec = "search_preferences=2:8, preferences://files/{filepath*}{?offset,length,cursor}=4,get_files=1:0"
+    assert parse_limits(spec) == {
+        "search_preferences": (2, 8),
+        "preferences://files/{filepath*}{?offset,length,cursor}": (4, 32),
+        "get_files": (1, 0),
+    }
+    assert parse_limits("") == {}
+
+
+@pytest.mark.parametrize("spec", ["search_preferences", "=2:8", "search_preferences=0:8", "get_files=x", "a=1:-1"])
+def test_invalid_limits_are_rejected(spec: str):
+    with pytest.raises(ValueError, match="Invalid handler limit"):
+        parse_limits(spec)
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_computation():
+    flights = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    waiting = [asyncio.ensure_future(flights.do("key", compute)) for _ in range(3)]
+    other = asyncio.ensure_future(flights.do("other", compute))
+    await asyncio.sleep(0)
+    assert len(flights) == 2
+    release.set()
+
+    assert await asyncio.gather(*waiting) == [("result", False), ("result", True), ("result", True)]
+    assert await other == ("result", False)
+    assert calls == 2
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_raised_to_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise FileNotFoundError("gone")
+
+    results = await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+
+    assert [type(result) for result in results] == [FileNotFoundError, FileNotFoundError]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return 42
+
+    first = asyncio.ensure_future(flights.do("key", compute))
+    second = asyncio.ensure_future(flights.do("key", compute))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == (42, True)
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_rejects():
+    metrics = HandlerMetrics()
+    limiter = HandlerLimiter(concurrency=1, queue_depth=1, metrics=metrics)
+    await limiter.acquire()
+    queued = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert (metrics.running, metrics.queued) == (1, 1)
+
+    with pytest.raises(ServerBusyError):
+        await limiter.acquire()
+    assert metrics.rejected == 1
+
+    # The slot is handed straight to the waiter.
+    limiter.release()
+    await queued
+    assert (metrics.running, metrics.queued) == (1, 0)
+    limiter.release()
+    assert metrics.running == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    metrics = HandlerMetrics()
+    limiter = HandlerLimiter(concurrency=1, queue_depth=2, metrics=metrics)
+    await limiter.acquire()
+    cancelled = asyncio.ensure_future(limiter.acquire())
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    assert metrics.queued == 1
+    limiter.release()
+    await waiting
+    limiter.release()
+
+    assert (metrics.running, metrics.queued) == (0, 0)
+
+
+def tool_call(name: str, arguments: dict) -> SimpleNamespace:
+    return SimpleNamespace(message=SimpleNamespace(name=name, arguments=arguments))
+
+
+@pytest.mark.asyncio
+async def test_middleware_coalesces_identical_tool_calls():
+    registry = MetricsRegistry()
+    middleware = AdmissionMiddleware(registry, concurrency=1, queue_depth=0)
+    calls = []
+
+    async def call_next(context):
+        calls.append(context.message.arguments)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    results = await asyncio.gather(
+        middleware.on_call_tool(tool_call("search_preferences", {"query": "uv", "limit": 5}), call_next),
+        middleware.on_call_tool(tool_call("search_preferences", {"limit": 5, "query": "uv"}), call_next),
+    )
+
+    assert results == [1, 1]
+    assert registry.handler("tool", "search_preferences").coalesced == 1
+
+    # Different arguments need a slot of their own; with no queue the second is rejected.
+    with pytest.raises(ServerBusyError):
+        await asyncio.gather(
+            middleware.on_call_tool(tool_call("search_preferences", {"query": "a"}), call_next),
+            middleware.on_call_tool(tool_call("search_preferences", {"query": "b"}), call_next),
+        )
+
+
+@pytest.mark.asyncio
+async def test_unshared_handlers_are_never_coalesced():
+    middleware = AdmissionMiddleware(MetricsRegistry())
+    calls = 0
+
+    async def call_next(context):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(
+        middleware.on_call_tool(tool_call("fetch_resource", {"uri": "preferences://catalog"}), call_next)
+        for _ in range(2)
+    ))
+
+    assert sorted(results) == [2, 2]
+    assert calls == 2
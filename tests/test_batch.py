@@ -0,0 +1,93 @@
+"""Tests for batch file reads."""
+
+import json
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+
+from conftest import REPO_FILES, write_files
+from mcp_server import executor
+from mcp_server.batch import MAX_BATCH_FILES, read_files, select_devcontainer_files
+from mcp_server.executor import BlockingExecutor
+from mcp_server.overlay import Overlay
+from mcp_server.repository import Repository
+from mcp_server.server import create_server
+
+
+@pytest.fixture
+def overlay(repo_root: Path, monkeypatch: pytest.MonkeyPatch) -> Overlay:
+    # A pool far smaller than a batch, as on a machine with few CPUs.
+    monkeypatch.setattr(executor, "io_executor", BlockingExecutor(max_workers=2, max_queue=2))
+    write_files(repo_root, {
+        f"templates/devcontainers/big/file{i:03}.txt": f"file {i}\n" for i in range(MAX_BATCH_FILES)
+    })
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return Overlay([repository])
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_read_without_busy_errors(overlay: Overlay):
+    paths = select_devcontainer_files(overlay.catalog, "big")
+    assert len(paths) == MAX_BATCH_FILES
+
+    result = await read_files(overlay, paths)
+
+    assert result["errors"] == []
+    assert [f["path"] for f in result["files"]] == paths
+    assert result["files"][7]["content"] == "file 7\n"
+
+
+@pytest.mark.asyncio
+async def test_unreadable_files_are_reported_without_failing_the_batch(overlay: Overlay):
+    result = await read_files(overlay, ["README.md", "missing.txt", "../outside.txt"])
+
+    assert [f["path"] for f in result["files"]] == ["README.md"]
+    assert [e["path"] for e in result["errors"]] == ["missing.txt", "../outside.txt"]
+    assert result["errors"][0]["error"] == "File 'missing.txt' not found"
+
+
+@pytest.mark.asyncio
+async def test_oversized_batch_is_rejected(overlay: Overlay):
+    with pytest.raises(ValueError, match="Too many files"):
+        await read_files(overlay, ["README.md"] * (MAX_BATCH_FILES + 1))
+
+
+@pytest.fixture
+def server(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    (repo_root / "templates/devcontainers/node/logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff")
+    return create_server(repo_root)
+
+
+@pytest.mark.asyncio
+async def test_get_files_selects_devcontainer_files_by_pattern(server):
+    async with Client(server) as client:
+        by_pattern = (await client.call_tool("get_files", {"devcontainer": "node", "pattern": "Docker*"})).data
+        whole = (await client.call_tool("get_files", {"devcontainer": "node"})).data
+        with pytest.raises(ToolError, match="either paths or devcontainer"):
+            await client.call_tool("get_files", {})
+
+    assert [f["path"] for f in by_pattern["files"]] == ["templates/devcontainers/node/Dockerfile"]
+    # Binary files are left out of whole-template fetches.
+    assert [f["path"] for f in whole["files"]] == [
+        "templates/devcontainers/node/Dockerfile", "templates/devcontainers/node/devcontainer.json",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bundle_resource_returns_every_text_file(server):
+    async with Client(server) as client:
+        [contents] = await client.read_resource("preferences://bundle/python-uv")
+
+    bundle = json.loads(contents.text)
+    assert bundle["devcontainer"] == "python-uv"
+    assert {f["path"]: f["content"] for f in bundle["files"]} == {
+        "templates/devcontainers/python-uv/Dockerfile": REPO_FILES["templates/devcontainers/python-uv/Dockerfile"],
+        "templates/devcontainers/python-uv/devcontainer.json":
+            REPO_FILES["templates/devcontainers/python-uv/devcontainer.json"],
+    }
+    assert bundle["errors"] == []
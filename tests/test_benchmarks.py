@@ -0,0 +1,57 @@
+"""Tests for the synthetic benchmark repositories and result comparison."""
+
+from pathlib import Path
+
+from benchmarks.compare import compare
+from benchmarks.synthetic import MARKER, generate_repository, template_name
+from mcp_server.repository import Repository
+
+
+def contents(root: Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in sorted(root.rglob("*")) if path.is_file() and path.name != MARKER
+    }
+
+
+def test_generation_is_deterministic(tmp_path: Path):
+    first = generate_repository(tmp_path / "first", 20, seed=3)
+    second = generate_repository(tmp_path / "second", 20, seed=3)
+    other = generate_repository(tmp_path / "other", 20, seed=4)
+
+    assert contents(first) == contents(second)
+    assert contents(first) != contents(other)
+
+
+def test_generated_repository_is_served_like_a_real_one(tmp_path: Path):
+    root = generate_repository(tmp_path / "repo", 15)
+    repository = Repository(root)
+    repository.snapshot_path = None
+    repository.warm_up()
+
+    assert repository.catalog.names == [template_name(i) for i in range(15)]
+    assert sorted(repository.catalog.guides) == ["CLAUDE.md", "README.md", "STYLE.md"]
+    assert all("Dockerfile" in entry.file_names() for entry in repository.catalog.devcontainers.values())
+
+
+def test_existing_repository_with_the_same_parameters_is_reused(tmp_path: Path):
+    root = generate_repository(tmp_path / "repo", 5)
+    (root / "STYLE.md").write_text("edited\n")
+
+    generate_repository(root, 5)
+    assert (root / "STYLE.md").read_text() == "edited\n"
+
+    generate_repository(root, 6)
+    assert (root / "STYLE.md").read_text() != "edited\n"
+    assert (root / "templates/devcontainers" / template_name(5)).is_dir()
+
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    baseline = {(100, "stdio", "search"): {"p95_ms": 10.0}, (100, "stdio", "read"): {"p95_ms": 2.0}}
+    current = {(100, "stdio", "search"): {"p95_ms": 13.0}, (100, "stdio", "read"): {"p95_ms": 2.2},
+               (100, "http", "read"): {"p95_ms": 1.0}}
+
+    rows = compare(baseline, current, "p95_ms", 0.2)
+
+    assert [(row["operation"], row["regression"]) for row in rows] == [("read", False), ("search", True)]
+    assert round(rows[1]["change"], 3) == 0.3
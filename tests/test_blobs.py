@@ -0,0 +1,81 @@
+"""Tests for deduplicating file contents by digest."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from conftest import write_files
+from mcp_server.blobs import BlobStore, content_digest
+from mcp_server.repository import Repository
+
+
+SHARED = "FROM debian:bookworm\nRUN apt-get update && apt-get install -y git curl\n"
+
+
+def test_digest_is_the_sha256_of_the_utf8_bytes():
+    assert content_digest("héllo") == hashlib.sha256("héllo".encode()).hexdigest()
+    assert content_digest("héllo".encode()) is content_digest("héllo")
+
+
+def test_store_keeps_one_copy_per_digest():
+    store = BlobStore()
+    first = "".join(["same ", "text"])
+    second = "".join(["same ", "te", "xt"])
+
+    digest, stored = store.acquire(first, 9)
+    _, shared = store.acquire(second, 9)
+
+    assert stored is first
+    assert shared is first
+    assert store.get(digest) is first
+    assert store.stats() == {"blobs": 1, "references": 2, "bytes": 9, "logical_bytes": 18, "saved_bytes": 9}
+
+
+def test_contents_are_freed_with_the_last_reference():
+    store = BlobStore()
+    digest, _ = store.acquire("text", 4)
+    store.acquire("text", 4)
+
+    store.release(digest)
+    assert store.get(digest) == "text"
+    store.release(digest)
+    assert store.get(digest) is None
+    assert store.stats() == {"blobs": 0, "references": 0, "bytes": 0, "logical_bytes": 0, "saved_bytes": 0}
+
+
+@pytest.fixture
+def repository(repo_root: Path) -> Repository:
+    write_files(repo_root, {f"templates/devcontainers/copy{i}/Dockerfile": SHARED for i in range(3)})
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+def test_identical_files_are_indexed_once(repository: Repository):
+    stats = repository.search_index.stats()
+
+    assert stats["documents"] == stats["contents"] + 2
+    assert stats["postings_saved"] == 2 * len({SHARED.lower()[i:i + 3] for i in range(len(SHARED) - 2)})
+    results = repository.search_index.search("apt-get", limit=10)["results"]
+    assert [r["name"] for r in results] == ["copy0", "copy1", "copy2"]
+
+
+def test_identical_files_share_their_digest_and_cached_contents(repository: Repository):
+    paths = [f"templates/devcontainers/copy{i}/Dockerfile" for i in range(3)]
+    files = [repository.catalog.file(path) for path in paths]
+    contents = [repository.read_text(path) for path in paths]
+
+    assert files[0].sha256 is files[1].sha256 is files[2].sha256
+    assert contents[0] is contents[1] is contents[2]
+
+
+def test_editing_one_copy_leaves_the_others_indexed(repository: Repository, repo_root: Path):
+    write_files(repo_root, {"templates/devcontainers/copy1/Dockerfile": "FROM alpine\n"})
+    repository.tree.refresh("templates/devcontainers/copy1/Dockerfile")
+
+    results = repository.search_index.search("apt-get", limit=10)["results"]
+    assert [r["name"] for r in results] == ["copy0", "copy2"]
+    assert [r["name"] for r in repository.search_index.search("alpine")["results"]] == ["copy1"]
+    assert repository.search_index.stats()["postings_saved"] > 0
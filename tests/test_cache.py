@@ -0,0 +1,106 @@
+"""Tests for the stat-validated content cache."""
+
+from pathlib import Path
+
+import pytest
+
+from mcp_server.blobs import BlobStore
+from mcp_server.cache import ContentCache, FileSignature, cache_for
+from mcp_server.utils import read_file_safe
+
+
+def signature(path: Path) -> FileSignature:
+    return FileSignature.from_stat(path.stat())
+
+
+def write(path: Path, content: str) -> Path:
+    path.write_text(content)
+    return path
+
+
+def test_unchanged_file_is_read_once(tmp_path: Path):
+    cache = ContentCache(store=BlobStore())
+    path = write(tmp_path / "a.txt", "first\n")
+
+    assert cache.read(path, signature(path)) == "first\n"
+    assert cache.read(path, signature(path)) == "first\n"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_signature_reads_the_file_again(tmp_path: Path):
+    cache = ContentCache(store=BlobStore())
+    path = write(tmp_path / "a.txt", "first\n")
+    cache.read(path, signature(path))
+
+    write(path, "second version\n")
+
+    assert cache.read(path, signature(path)) == "second version\n"
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    cache = ContentCache(max_bytes=10, store=BlobStore())
+    a, b, c = (write(tmp_path / f"{name}.txt", name * 4) for name in "abc")
+    cache.read(a, signature(a))
+    cache.read(b, signature(b))
+    cache.read(a, signature(a))
+
+    cache.read(c, signature(c))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 1
+    cache.read(a, signature(a))
+    assert cache.hits == 2
+    cache.read(b, signature(b))
+    assert cache.misses == 4
+
+
+def test_files_larger_than_the_budget_are_not_cached(tmp_path: Path):
+    cache = ContentCache(max_bytes=4, store=BlobStore())
+    path = write(tmp_path / "big.txt", "too large\n")
+
+    assert cache.read(path, signature(path)) == "too large\n"
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_identical_contents_count_against_the_budget_once(tmp_path: Path):
+    store = BlobStore()
+    cache = ContentCache(store=store)
+    a = write(tmp_path / "a.txt", "shared\n")
+    b = write(tmp_path / "b.txt", "shared\n")
+
+    assert cache.read(a, signature(a)) is cache.read(b, signature(b))
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == len("shared\n")
+
+    cache.clear()
+    assert len(store) == 0
+
+
+def test_read_file_safe_serves_from_the_root_cache(repo_root: Path):
+    cache = cache_for(repo_root)
+    hits = cache.hits
+
+    read_file_safe(repo_root / "CLAUDE.md", repo_root)
+    read_file_safe(repo_root / "CLAUDE.md", repo_root)
+
+    assert cache.hits == hits + 1
+
+
+def test_read_file_safe_rejects_paths_outside_the_root(repo_root: Path):
+    with pytest.raises(ValueError):
+        read_file_safe(repo_root / ".." / "elsewhere.txt", repo_root)
+    with pytest.raises(ValueError):
+        read_file_safe(repo_root / "templates", repo_root)
+    with pytest.raises(FileNotFoundError):
+        read_file_safe(repo_root / "missing.md", repo_root)
+
+
+def test_each_root_has_its_own_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("CONTENT_CACHE_MAX_BYTES", "1234")
+    first, second = tmp_path / "first", tmp_path / "second"
+
+    assert cache_for(first) is cache_for(first)
+    assert cache_for(first) is not cache_for(second)
+    assert cache_for(first).max_bytes == 1234
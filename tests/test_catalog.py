@@ -0,0 +1,147 @@
+"""Tests for building immutable catalog snapshots and classifying their files."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from conftest import REPO_FILES, write_files
+from mcp_server.catalog import Catalog, FileInfo, build_catalog, inspect_file
+from mcp_server.repository import Repository, RepositoryTree
+
+
+NODE_DOCKERFILE = "templates/devcontainers/node/Dockerfile"
+
+
+@pytest.fixture
+def tree(repo_root: Path) -> RepositoryTree:
+    tree = RepositoryTree(repo_root)
+    tree.refresh()
+    return tree
+
+
+def rebuild(tree: RepositoryTree, previous: Catalog, *paths: str) -> Catalog:
+    changes = tree.refresh_many(paths)
+    return build_catalog(tree, previous, [change.path for change in changes])
+
+
+def test_catalog_lists_templates_and_guides(tree: RepositoryTree):
+    catalog = build_catalog(tree)
+
+    assert catalog.names == ["node", "node-postgres", "python-uv"]
+    assert catalog.devcontainer("node").file_names() == ["Dockerfile", "devcontainer.json"]
+    assert sorted(catalog.guides) == ["CLAUDE.md", "README.md"]
+    assert catalog.file(NODE_DOCKERFILE).size == len(REPO_FILES[NODE_DOCKERFILE])
+    assert catalog.devcontainer("missing") is None
+
+
+def test_catalog_is_read_only(tree: RepositoryTree):
+    catalog = build_catalog(tree)
+    with pytest.raises(TypeError):
+        catalog.devcontainers["other"] = catalog.devcontainer("node")
+    with pytest.raises(AttributeError):
+        catalog.generation = 2
+
+
+def test_hidden_template_directories_are_skipped(tree: RepositoryTree, repo_root: Path):
+    write_files(repo_root, {"templates/devcontainers/.draft/Dockerfile": "FROM scratch\n"})
+    tree.refresh()
+    assert ".draft" not in build_catalog(tree).names
+
+
+def test_unchanged_tree_keeps_the_generation_and_hashes(tree: RepositoryTree):
+    first = build_catalog(tree)
+    second = build_catalog(tree, first)
+
+    assert second.generation == first.generation
+    assert second.etag == first.etag
+    # Unchanged files are carried over rather than read and hashed again.
+    assert second.devcontainer("node").files[0] is first.devcontainer("node").files[0]
+
+
+def test_changed_content_increments_the_generation(tree: RepositoryTree, repo_root: Path):
+    first = build_catalog(tree)
+    write_files(repo_root, {NODE_DOCKERFILE: "FROM node:24\n"})
+
+    second = rebuild(tree, first, NODE_DOCKERFILE)
+
+    assert second.generation == first.generation + 1
+    assert second.etag != first.etag
+    assert second.devcontainer("node").tree_hash != first.devcontainer("node").tree_hash
+    assert second.devcontainer("python-uv") is first.devcontainer("python-uv")
+    # The previous snapshot is left as it was.
+    assert first.file(NODE_DOCKERFILE).size == len(REPO_FILES[NODE_DOCKERFILE])
+
+
+def test_incremental_build_matches_a_full_build(tree: RepositoryTree, repo_root: Path):
+    first = build_catalog(tree)
+    write_files(repo_root, {
+        "templates/devcontainers/go/devcontainer.json": '{"name": "go"}\n',
+        "templates/devcontainers/node/scripts/setup.sh": "npm ci\n",
+        "STYLE.md": "# Style\n",
+    })
+    (repo_root / "templates/devcontainers/python-uv/Dockerfile").unlink()
+
+    incremental = rebuild(
+        tree, first, "templates/devcontainers/go", "templates/devcontainers/node/scripts",
+        "templates/devcontainers/python-uv/Dockerfile", "STYLE.md",
+    )
+    full_tree = RepositoryTree(repo_root)
+    full_tree.refresh()
+    full = build_catalog(full_tree)
+
+    assert incremental.tree_hash == full.tree_hash
+    assert incremental.names == ["go", "node", "node-postgres", "python-uv"]
+    assert incremental.devcontainer("node").file_names(recursive=False) == ["Dockerfile", "devcontainer.json"]
+    assert "STYLE.md" in incremental.guides
+
+
+def test_removed_template_is_dropped(tree: RepositoryTree, repo_root: Path):
+    first = build_catalog(tree)
+    for path in (repo_root / "templates/devcontainers/node-postgres").iterdir():
+        path.unlink()
+    (repo_root / "templates/devcontainers/node-postgres").rmdir()
+
+    second = rebuild(tree, first, "templates/devcontainers/node-postgres")
+
+    assert second.names == ["node", "python-uv"]
+
+
+# A character that spans the boundary between the first two chunks read.
+SPLIT_CHARACTER = b"a" * (1024 * 1024 - 1) + "é".encode()
+
+
+@pytest.mark.parametrize("data, encoding", [
+    (b"", "ascii"),
+    (b"FROM node:22\n", "ascii"),
+    ("naïve café\n".encode(), "utf-8"),
+    (SPLIT_CHARACTER, "utf-8"),
+    (b"text\0with a NUL", None),
+    (b"\x89PNG\r\n\x1a\n\xff", None),
+    ("café".encode()[:-1], None),
+])
+def test_inspect_file_classifies_and_hashes_in_one_read(tmp_path: Path, data: bytes, encoding):
+    path = tmp_path / "file"
+    path.write_bytes(data)
+
+    assert inspect_file(path) == FileInfo(len(data), hashlib.sha256(data).hexdigest(), encoding)
+
+
+def test_binary_files_are_recorded_and_never_decoded(repo_root: Path):
+    (repo_root / "templates/devcontainers/node/logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff\0")
+    (repo_root / "assets").mkdir()
+    (repo_root / "assets/icon.bin").write_bytes(b"\xff\xfe\0")
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+
+    assert repository.catalog.is_binary("templates/devcontainers/node/logo.png")
+    assert not repository.catalog.is_binary(NODE_DOCKERFILE)
+    with pytest.raises(ValueError, match="Binary file"):
+        repository.read_text("templates/devcontainers/node/logo.png")
+    assert "templates/devcontainers/node/logo.png" not in [
+        d.path for d in repository.search_index.candidates("png")
+    ]
+    # Files outside the catalog are classified on demand.
+    assert repository.file_info("assets/icon.bin").binary
+    assert repository.file_info("README.md").encoding == "ascii"
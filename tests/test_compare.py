@@ -0,0 +1,94 @@
+"""Tests for comparing devcontainer templates by content."""
+
+from pathlib import Path
+
+import pytest
+
+from conftest import write_files
+from mcp_server import compare
+from mcp_server.compare import ComparisonCache, compare_entries
+from mcp_server.overlay import Overlay
+from mcp_server.repository import Repository
+
+
+@pytest.fixture
+def overlay(repo_root: Path) -> Overlay:
+    write_files(repo_root, {
+        "templates/devcontainers/python-uv/.zshrc": "export EDITOR=vim\n",
+        "templates/devcontainers/python-poetry/.zshrc": "export EDITOR=vim\n",
+        "templates/devcontainers/python-poetry/Dockerfile": "FROM python:3.12\nRUN pip install poetry\n",
+        "templates/devcontainers/python-poetry/scripts/setup.sh": "poetry install\n",
+    })
+    (repo_root / "templates/devcontainers/python-uv/logo.png").write_bytes(b"\x89PNG\0\1")
+    (repo_root / "templates/devcontainers/python-poetry/logo.png").write_bytes(b"\x89PNG\0\2")
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return Overlay([repository])
+
+
+def compare_templates(overlay: Overlay, name1: str, name2: str) -> dict:
+    catalog = overlay.catalog
+    return compare_entries(overlay, catalog.devcontainer(name1), catalog.devcontainer(name2))
+
+
+def test_files_are_classified_by_content(overlay: Overlay):
+    result = compare_templates(overlay, "python-uv", "python-poetry")
+
+    assert result["common_files"] == [".zshrc", "Dockerfile", "logo.png"]
+    assert result["identical"] == [".zshrc"]
+    assert result["unique_to_1"] == ["devcontainer.json"]
+    assert result["unique_to_2"] == ["scripts/setup.sh"]
+    assert [change["path"] for change in result["changed"]] == ["Dockerfile", "logo.png"]
+
+
+def test_changed_text_files_get_a_unified_diff(overlay: Overlay):
+    dockerfile, logo = compare_templates(overlay, "python-uv", "python-poetry")["changed"]
+
+    assert dockerfile["diff"].splitlines() == [
+        "--- python-uv/Dockerfile",
+        "+++ python-poetry/Dockerfile",
+        "@@ -1,2 +1,2 @@",
+        " FROM python:3.12",
+        "-RUN pip install uv",
+        "+RUN pip install poetry",
+    ]
+    assert logo == {"path": "logo.png", "size1": 6, "size2": 6, "diff": None, "reason": "binary"}
+
+
+def test_large_files_are_not_diffed(overlay: Overlay, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(compare, "MAX_DIFF_BYTES", 10)
+
+    dockerfile = compare_templates(overlay, "python-uv", "python-poetry")["changed"][0]
+
+    assert (dockerfile["diff"], dockerfile["reason"]) == (None, "too large")
+
+
+def test_long_diffs_are_truncated(overlay: Overlay, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(compare, "MAX_DIFF_LINES", 3)
+
+    dockerfile = compare_templates(overlay, "python-uv", "python-poetry")["changed"][0]
+
+    assert len(dockerfile["diff"].splitlines()) == 3
+    assert dockerfile["truncated"]
+
+
+def test_cache_keys_change_with_the_templates(overlay: Overlay, repo_root: Path):
+    cache = ComparisonCache(max_entries=1)
+    catalog = overlay.catalog
+    key = cache.key(catalog.devcontainer("node"), catalog.devcontainer("python-uv"))
+    cache.put(key, {"identical": []})
+
+    assert cache.get(key) == {"identical": []}
+
+    write_files(repo_root, {"templates/devcontainers/node/Dockerfile": "FROM node:24\n"})
+    overlay.repositories[0].tree.refresh("templates/devcontainers/node/Dockerfile")
+    catalog = overlay.catalog
+    new_key = cache.key(catalog.devcontainer("node"), catalog.devcontainer("python-uv"))
+
+    assert new_key != key
+    assert cache.get(new_key) is None
+    cache.put(new_key, {"identical": ["x"]})
+    # The older comparison is evicted once the memo is full.
+    assert cache.get(key) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1, "max_entries": 1}
@@ -0,0 +1,89 @@
+"""Tests for resource ETags and conditional fetches."""
+
+import base64
+import hashlib
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+
+from mcp_server.server import create_server
+
+
+# A PNG signature followed by bytes that do not decode as UTF-8.
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+@pytest.fixture
+def server(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    (repo_root / "notes.txt").write_text("plain notes\n")
+    (repo_root / "templates/devcontainers/node/logo.png").write_bytes(PNG)
+    return create_server(repo_root)
+
+
+def sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("uri, path", [
+    ("preferences://guide/claude", "CLAUDE.md"),
+    ("preferences://devcontainer/node/dockerfile", "templates/devcontainers/node/Dockerfile"),
+    ("preferences://files/notes.txt", "notes.txt"),
+])
+async def test_resources_carry_content_hash_etag(server, repo_root: Path, uri: str, path: str):
+    async with Client(server) as client:
+        contents = await client.read_resource(uri)
+    assert contents[0].meta["etag"] == sha256(repo_root / path)
+
+
+@pytest.mark.asyncio
+async def test_catalog_pages_share_the_catalog_etag(server):
+    async with Client(server) as client:
+        first = await client.read_resource("preferences://catalog")
+        page = await client.read_resource("preferences://catalog?limit=1")
+    assert first[0].meta["etag"] == page[0].meta["etag"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_resource_skips_current_versions(server, repo_root: Path):
+    async with Client(server) as client:
+        fetched = (await client.call_tool("fetch_resource", {"uri": "preferences://guide/claude"})).data
+        again = (await client.call_tool(
+            "fetch_resource", {"uri": "preferences://guide/claude", "if_none_match": fetched["etag"]}
+        )).data
+        stale = (await client.call_tool(
+            "fetch_resource", {"uri": "preferences://guide/claude", "if_none_match": "0" * 64}
+        )).data
+
+    assert fetched["etag"] == sha256(repo_root / "CLAUDE.md")
+    assert fetched["content"] == (repo_root / "CLAUDE.md").read_text()
+    assert again == {"uri": "preferences://guide/claude", "etag": fetched["etag"], "not_modified": True}
+    assert not stale["not_modified"]
+    assert stale["content"] == fetched["content"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_resource_encodes_binary_content(server, repo_root: Path):
+    uri = "preferences://files/templates/devcontainers/node/logo.png"
+    async with Client(server) as client:
+        fetched = (await client.call_tool("fetch_resource", {"uri": uri})).data
+
+    assert base64.b64decode(fetched["content"]) == PNG
+    assert fetched["encoding"] == "base64"
+    assert fetched["mime_type"] == "image/png"
+    assert fetched["etag"] == sha256(repo_root / "templates/devcontainers/node/logo.png")
+
+
+@pytest.mark.asyncio
+async def test_fetch_resource_passes_range_meta_through(server):
+    async with Client(server) as client:
+        fetched = (await client.call_tool("fetch_resource", {"uri": "preferences://files/notes.txt?length=5"})).data
+
+    assert fetched["content"] == "plain"
+    assert fetched["encoding"] == "utf-8"
+    meta = fetched["meta"]
+    assert (meta["offset"], meta["end"], meta["total_size"]) == (0, 5, len("plain notes\n"))
+    assert meta["next_cursor"] is not None
+    assert meta["etag"] == fetched["etag"]
@@ -0,0 +1,65 @@
+"""Tests for the bounded executor that runs blocking work."""
+
+import asyncio
+import threading
+
+import pytest
+
+from mcp_server import executor
+from mcp_server.executor import BlockingExecutor, ServerBusyError, run_blocking
+
+
+async def wait_until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+@pytest.mark.asyncio
+async def test_calls_run_on_the_pool():
+    pool = BlockingExecutor(max_workers=2, max_queue=0)
+
+    name = await pool.run(lambda: threading.current_thread().name)
+
+    assert name.startswith("preferences-io")
+    assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_beyond_the_queue_are_rejected():
+    pool = BlockingExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+    await wait_until(lambda: pool.stats()["in_flight"] == 2)
+
+    with pytest.raises(ServerBusyError):
+        await pool.run(release.wait)
+    assert pool.stats() == {
+        "workers": 1, "max_queue": 1, "in_flight": 2, "queued": 1, "completed": 0, "rejected": 1
+    }
+
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert pool.stats()["in_flight"] == 0
+    # Capacity is available again once the running calls finish.
+    assert await pool.run(lambda: 42) == 42
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_raised_to_the_caller():
+    pool = BlockingExecutor(max_workers=1, max_queue=0)
+
+    with pytest.raises(FileNotFoundError):
+        await pool.run(open, "/nonexistent/file")
+    assert pool.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_uses_the_shared_executor(monkeypatch: pytest.MonkeyPatch):
+    pool = BlockingExecutor(max_workers=1, max_queue=0)
+    monkeypatch.setattr(executor, "io_executor", pool)
+
+    assert await run_blocking(max, 1, 2) == 2
+    assert pool.stats()["completed"] == 1
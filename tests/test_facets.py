@@ -0,0 +1,103 @@
+"""Tests for extracting template facets from Dockerfiles, devcontainer.json, compose files and Caddyfiles."""
+
+import json
+
+import pytest
+
+from mcp_server.facets import _load_jsonc, extract_facets
+
+
+DOCKERFILE = """\
+ARG PYTHON_VERSION=3.12
+FROM python:${PYTHON_VERSION}-slim AS base
+# A comment line
+RUN apt-get update && apt-get install -y \\
+    # A comment inside a continued RUN
+    git curl \\
+    && pip install uv==0.5.1
+EXPOSE 8000/tcp
+"""
+
+DEVCONTAINER_JSON = """\
+{
+  // Line comment
+  "name": "py", /* block comment */
+  "image": "mcr.microsoft.com/devcontainers/python:3.12",
+  "features": {"ghcr.io/devcontainers/features/node:1": {}},
+  "customizations": {"vscode": {"extensions": ["ms-python.python",],},},
+  "forwardPorts": [8000, "db:5432"],
+}
+"""
+
+COMPOSE = """\
+services:
+  app:
+    image: app:latest
+    ports: ["8080:80"]
+  db:
+    image: postgres:16
+    expose:
+      - 5432
+"""
+
+CADDYFILE = """\
+http://example.test {
+  # A comment
+  reverse_proxy app:8080
+  handle /api/* {
+    reverse_proxy @api backend:9000
+  }
+}
+"""
+
+
+def test_dockerfile_facets():
+    facets = extract_facets("py", {"Dockerfile": DOCKERFILE})
+    assert facets.base_images == ("python:3.12-slim",)
+    assert facets.versions == {"python": "3.12"}
+    assert facets.packages == ("curl", "git", "uv==0.5.1")
+    assert facets.tools == ("curl", "git", "python", "uv")
+    assert facets.ports == (8000,)
+
+
+def test_devcontainer_json_facets():
+    facets = extract_facets("py", {"devcontainer.json": DEVCONTAINER_JSON})
+    assert facets.base_images == ("mcr.microsoft.com/devcontainers/python:3.12",)
+    assert facets.features == ("ghcr.io/devcontainers/features/node:1",)
+    assert facets.extensions == ("ms-python.python",)
+    assert facets.ports == (5432, 8000)
+
+
+def test_compose_facets():
+    facets = extract_facets("py", {"docker-compose.yml": COMPOSE})
+    assert facets.services == ("app", "db")
+    assert facets.base_images == ("app:latest", "postgres:16")
+    assert facets.ports == (80, 5432, 8080)
+
+
+def test_caddyfile_facets():
+    facets = extract_facets("py", {"Caddyfile": CADDYFILE})
+    assert facets.proxies == ("app:8080", "backend:9000")
+    assert facets.ports == (80, 8080, 9000)
+
+
+def test_jsonc_keeps_comment_markers_inside_strings():
+    assert _load_jsonc('{"url": "http://x.test//a", /* c */ "b": [1, 2,],}') == {"url": "http://x.test//a", "b": [1, 2]}
+    assert _load_jsonc("{not json") is None
+
+
+@pytest.mark.parametrize("config", [
+    {"customizations": [1]},
+    {"customizations": {"vscode": [1]}},
+    {"customizations": {"vscode": {"extensions": "ms-python.python"}}},
+    {"forwardPorts": "x", "features": ["a"], "image": 3},
+])
+def test_malformed_devcontainer_json_contributes_nothing(config: dict):
+    facets = extract_facets("bad", {"devcontainer.json": json.dumps(config)})
+    assert facets.to_dict() == extract_facets("bad", {}).to_dict()
+
+
+def test_malformed_compose_services_are_skipped():
+    facets = extract_facets("bad", {"docker-compose.yml": "services:\n  a:\n    ports: '8080:80'\n  b: [1]\n"})
+    assert facets.services == ("a", "b")
+    assert facets.ports == ()
@@ -0,0 +1,70 @@
+"""Tests for the range metadata of file reads."""
+
+import base64
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+
+from mcp_server.server import create_server
+
+
+# A PNG signature followed by bytes that do not decode as UTF-8.
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+TEXT = "".join(f"line {i} héllo wörld ✓\n" for i in range(200))
+
+
+@pytest.fixture
+def server(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    (repo_root / "templates/devcontainers/node/logo.png").write_bytes(PNG)
+    (repo_root / "notes.txt").write_text(TEXT)
+    return create_server(repo_root)
+
+
+@pytest.mark.asyncio
+async def test_ranged_reads_follow_cursors_to_the_end(server):
+    parts = []
+    uri = "preferences://files/notes.txt?length=1000"
+    async with Client(server) as client:
+        while True:
+            contents = await client.read_resource(uri)
+            meta = contents[0].meta
+            parts.append(contents[0].text)
+            assert meta["total_size"] == len(TEXT.encode())
+            assert meta["encoding"] == "utf-8"
+            assert meta["end"] - meta["offset"] <= 1000
+            if meta["next_cursor"] is None:
+                break
+            uri = f"preferences://files/notes.txt?cursor={meta['next_cursor']}&length=1000"
+
+    assert len(parts) > 1
+    assert "".join(parts) == TEXT
+
+
+@pytest.mark.asyncio
+async def test_range_ends_on_a_character_boundary(server):
+    async with Client(server) as client:
+        # Byte 8 falls inside the two-byte "é" of the first line.
+        contents = await client.read_resource("preferences://files/notes.txt?length=9")
+    meta = contents[0].meta
+    assert contents[0].text == "line 0 h"
+    assert (meta["offset"], meta["end"]) == (0, len("line 0 h".encode()))
+
+
+@pytest.mark.asyncio
+async def test_binary_reads_are_base64_with_media_type(server):
+    async with Client(server) as client:
+        whole = await client.read_resource("preferences://files/templates/devcontainers/node/logo.png")
+        head = await client.read_resource("preferences://files/templates/devcontainers/node/logo.png?length=100")
+
+    assert base64.b64decode(whole[0].blob) == PNG
+    assert whole[0].mimeType == "image/png"
+    assert whole[0].meta["encoding"] == "base64"
+    assert whole[0].meta["next_cursor"] is None
+
+    assert base64.b64decode(head[0].blob) == PNG[:100]
+    assert head[0].meta["mime_type"] == "image/png"
+    assert (head[0].meta["offset"], head[0].meta["end"], head[0].meta["total_size"]) == (0, 100, len(PNG))
+    assert head[0].meta["next_cursor"] is not None
@@ -0,0 +1,69 @@
+"""Tests for the liveness and readiness probes."""
+
+from pathlib import Path
+
+import httpx
+import pytest
+from fastmcp import FastMCP
+
+from mcp_server.health import ReadinessMiddleware, register_health_routes
+from mcp_server.overlay import Overlay
+from mcp_server.repository import Repository
+
+
+@pytest.fixture
+def overlay(repo_root: Path) -> Overlay:
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    return Overlay([repository])
+
+
+async def get(overlay: Overlay, path: str) -> httpx.Response:
+    mcp = FastMCP("health-test")
+    register_health_routes(mcp, overlay)
+    transport = httpx.ASGITransport(app=mcp.http_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.get(path)
+
+
+@pytest.mark.asyncio
+async def test_health_answers_before_warm_up(overlay: Overlay):
+    response = await get(overlay, "/health")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    assert not overlay.is_ready
+
+
+@pytest.mark.asyncio
+async def test_ready_is_unavailable_until_warm_up_completes(overlay: Overlay):
+    response = await get(overlay, "/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "warming_up"}
+    # Probing readiness must not start the warm-up itself.
+    assert not overlay.is_ready
+
+    overlay.warm_up()
+    response = await get(overlay, "/ready")
+
+    assert response.status_code == 200
+    state = response.json()
+    assert state["status"] == "ready"
+    assert state["catalog"]["devcontainers"] == 3
+    assert state["snapshot_loaded"] is False
+    assert {"scan", "catalog", "search_index"} <= set(state["warmup_phases"])
+
+
+@pytest.mark.asyncio
+async def test_calls_wait_for_warm_up(overlay: Overlay):
+    seen = []
+
+    async def call_next(context):
+        seen.append(overlay.is_ready)
+        return "result"
+
+    middleware = ReadinessMiddleware(overlay)
+
+    assert await middleware.on_call_tool(None, call_next) == "result"
+    assert await middleware.on_read_resource(None, call_next) == "result"
+    assert seen == [True, True]
@@ -0,0 +1,71 @@
+"""Tests for the .gitignore and .dockerignore exclusion rules."""
+
+from pathlib import Path
+
+import pytest
+
+from mcp_server.ignore import IgnoreFile, IgnoreRules
+
+
+def gitignore(*lines: str) -> IgnoreFile:
+    return IgnoreFile(lines, anchored=False)
+
+
+def dockerignore(*lines: str) -> IgnoreFile:
+    return IgnoreFile(lines, anchored=True)
+
+
+@pytest.mark.parametrize("path, is_dir, ignored", [
+    ("debug.log", False, True),
+    ("templates/node/debug.log", False, True),
+    ("build", True, True),
+    ("templates/build", True, True),
+    ("build", False, False),
+    ("docs/private/notes.md", False, True),
+    ("private/notes.md", False, False),
+    ("keep.log", False, False),
+])
+def test_gitignore_semantics(path: str, is_dir: bool, ignored: bool):
+    rules = gitignore("# comment", "", "*.log", "!keep.log", "build/", "docs/private/**")
+    assert rules.matches(path, is_dir) == ignored
+
+
+@pytest.mark.parametrize("path, ignored", [
+    ("secrets.env", True),
+    ("templates/secrets.env", False),
+    ("cache/a/b.bin", True),
+    ("templates/a/tmp", True),
+    ("templates/a/b/tmp", False),
+    ("file?.txt", False),
+    ("file1.txt", True),
+])
+def test_dockerignore_patterns_are_relative_to_the_root(path: str, ignored: bool):
+    rules = dockerignore("*.env", "/cache/**", "templates/*/tmp", "file[0-9].txt")
+    assert rules.matches(path, False) == ignored
+
+
+def test_last_matching_rule_wins():
+    rules = gitignore("*.md", "!README.md", "docs/README.md")
+    assert rules.matches("CLAUDE.md", False)
+    assert not rules.matches("README.md", False)
+    assert rules.matches("docs/README.md", False)
+
+
+def test_rules_combine_both_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("IGNORE_FILES", raising=False)
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / ".dockerignore").write_text("scratch\n")
+    rules = IgnoreRules.load(tmp_path)
+
+    assert rules.excludes("a/b.log", False)
+    assert rules.excludes("scratch", True)
+    assert not rules.excludes("a/scratch", True)
+    assert not rules.excludes(".gitignore", False)
+    assert rules.excludes_path("scratch/inner/file.txt", False)
+
+
+def test_ignore_files_can_be_configured(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    monkeypatch.setenv("IGNORE_FILES", "")
+
+    assert not IgnoreRules.load(tmp_path).excludes("a.log", False)
@@ -0,0 +1,43 @@
+"""Tests for paginated catalog listings."""
+
+from pathlib import Path
+
+import pytest
+
+from mcp_server.listing import list_devcontainers
+from mcp_server.repository import Repository
+
+
+@pytest.fixture
+def catalog(repo_root: Path):
+    repository = Repository(repo_root)
+    repository.warm_up()
+    return repository.catalog
+
+
+def test_cursor_pages_cover_all_templates_once(catalog):
+    names, cursor = [], None
+    while True:
+        page = list_devcontainers(catalog, limit=1, cursor=cursor)
+        assert page["total"] == 3
+        names.extend(page["devcontainers"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == ["node", "node-postgres", "python-uv"]
+
+
+def test_prefix_and_projection(catalog):
+    page = list_devcontainers(catalog, fields=["file_count"], prefix="node", limit=1)
+    assert page["devcontainers"] == [{"name": "node", "file_count": 2}]
+    assert page["total"] == 2
+
+    page = list_devcontainers(catalog, fields=["file_count"], prefix="node", cursor=page["next_cursor"])
+    assert page["devcontainers"] == [{"name": "node-postgres", "file_count": 2}]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.parametrize("kwargs", [{"limit": 0}, {"fields": ["nope"]}, {"cursor": "abc"}])
+def test_invalid_arguments_are_rejected(catalog, kwargs: dict):
+    with pytest.raises(ValueError):
+        list_devcontainers(catalog, **kwargs)
@@ -0,0 +1,80 @@
+"""Tests for resolving served paths through the repository manifest."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from conftest import write_files
+from mcp_server.repository import Repository
+
+
+@pytest.fixture
+def repository(repo_root: Path, monkeypatch: pytest.MonkeyPatch) -> Repository:
+    monkeypatch.delenv("IGNORE_FILES", raising=False)
+    write_files(repo_root, {
+        ".gitignore": "*.log\nbuild/\n",
+        "debug.log": "secret\n",
+        "build/output.txt": "built\n",
+        "node_modules/pkg/index.js": "module.exports = 1;\n",
+        "docs/notes.md": "notes\n",
+    })
+    (repo_root.parent / "outside.txt").write_text("outside\n")
+    os.symlink(repo_root / "docs/notes.md", repo_root / "notes-link.md")
+    os.symlink(repo_root.parent / "outside.txt", repo_root / "outside-link.txt")
+    os.symlink(repo_root / "docs", repo_root / "docs-link")
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+def test_files_resolve_to_their_path(repository: Repository):
+    entry = repository.resolve("./docs/../README.md")
+    assert entry.path == "README.md"
+    assert repository.read_text("docs/notes.md") == "notes\n"
+
+
+@pytest.mark.parametrize("path", ["../outside.txt", "/etc/passwd", "docs/../../outside.txt"])
+def test_paths_outside_the_root_are_denied(repository: Repository, path: str):
+    with pytest.raises(ValueError, match="Access denied"):
+        repository.resolve(path)
+
+
+@pytest.mark.parametrize("path", [".", "docs", "templates/devcontainers"])
+def test_directories_are_not_files(repository: Repository, path: str):
+    with pytest.raises(ValueError, match="Not a file"):
+        repository.resolve(path)
+
+
+@pytest.mark.parametrize("path", [
+    "missing.md", "debug.log", "build/output.txt", "node_modules/pkg/index.js",
+    "outside-link.txt", "docs-link/notes.md",
+])
+def test_missing_excluded_and_escaping_paths_are_not_found(repository: Repository, path: str):
+    with pytest.raises(FileNotFoundError):
+        repository.resolve(path)
+
+
+def test_symlink_to_a_file_inside_the_root_is_served(repository: Repository, repo_root: Path):
+    entry = repository.resolve("notes-link.md")
+    assert entry.resolved == (repo_root / "docs/notes.md").resolve()
+    assert repository.read_text("notes-link.md") == "notes\n"
+
+
+def test_file_created_after_the_scan_is_found(repository: Repository, repo_root: Path):
+    write_files(repo_root, {"docs/new.md": "new\n"})
+    assert repository.read_text("docs/new.md") == "new\n"
+    # Excluded files stay excluded when re-checked on disk.
+    write_files(repo_root, {"docs/new.log": "new\n"})
+    with pytest.raises(FileNotFoundError):
+        repository.resolve("docs/new.log")
+
+
+def test_editing_the_ignore_file_reapplies_the_rules(repository: Repository, repo_root: Path):
+    write_files(repo_root, {".gitignore": "docs/\n"})
+    repository.tree.refresh(".gitignore")
+
+    assert repository.read_text("debug.log") == "secret\n"
+    with pytest.raises(FileNotFoundError):
+        repository.resolve("docs/notes.md")
@@ -0,0 +1,91 @@
+"""Tests for per-handler metrics and the /metrics route."""
+
+from pathlib import Path
+
+import httpx
+import pytest
+from fastmcp import Client
+from mcp.shared.exceptions import McpError
+
+from mcp_server.metrics import Histogram, MetricsRegistry, response_size
+from mcp_server.server import create_server
+
+
+@pytest.fixture
+def server(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    return create_server(repo_root)
+
+
+async def scrape(server) -> str:
+    transport = httpx.ASGITransport(app=server.http_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return response.text
+
+
+def samples(text: str) -> dict[str, float]:
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+
+    assert histogram.render("h", 'kind="tool"') == [
+        'h_bucket{kind="tool",le="1"} 2',
+        'h_bucket{kind="tool",le="10"} 3',
+        'h_bucket{kind="tool",le="+Inf"} 4',
+        'h_sum{kind="tool"} 56.5',
+        'h_count{kind="tool"} 4',
+    ]
+
+
+def test_labels_are_escaped_and_collectors_are_rendered():
+    registry = MetricsRegistry()
+    registry.handler("tool", 'say "hi"').requests += 1
+    registry.add_collector(lambda: {"extra_gauge": 7})
+
+    text = registry.render()
+
+    assert 'preferences_requests_total{kind="tool",name="say \\"hi\\""} 1' in text
+    assert "extra_gauge 7" in text.splitlines()
+
+
+def test_response_size_counts_tool_and_prompt_text():
+    class Block:
+        text = "héllo"
+
+    class Result:
+        content = [Block(), Block()]
+
+    assert response_size(Result()) == 12
+
+
+@pytest.mark.asyncio
+async def test_requests_are_counted_by_handler(server):
+    async with Client(server) as client:
+        await client.read_resource("preferences://devcontainer/node/dockerfile")
+        await client.read_resource("preferences://devcontainer/python-uv/dockerfile")
+        await client.call_tool("list_devcontainer_files", {"name": "node"})
+        with pytest.raises(McpError):
+            await client.read_resource("preferences://devcontainer/missing/dockerfile")
+
+    metrics = samples(await scrape(server))
+
+    # Resources are labelled by URI template, not by the URI read.
+    resource = 'kind="resource",name="preferences://devcontainer/{name}/{file}"'
+    assert metrics[f"preferences_requests_total{{{resource}}}"] == 3
+    assert metrics[f"preferences_request_errors_total{{{resource}}}"] == 1
+    assert metrics[f"preferences_request_duration_seconds_count{{{resource}}}"] == 3
+    tool = 'kind="tool",name="list_devcontainer_files"'
+    assert metrics[f"preferences_requests_total{{{tool}}}"] == 1
+    assert metrics[f"preferences_response_size_bytes_count{{{tool}}}"] == 1
+    assert metrics["preferences_ready"] == 1
+    assert metrics["preferences_catalog_devcontainers"] == 3
@@ -0,0 +1,117 @@
+"""Tests for serving layered repository roots as one."""
+
+from pathlib import Path
+
+import pytest
+
+from conftest import write_files
+from mcp_server.overlay import Overlay
+from mcp_server.repository import Repository
+
+
+# Per-user overrides layered over the shared test repository.
+USER_FILES = {
+    "CLAUDE.md": "# My guide\n\nPrefer poetry for python projects.\n",
+    "templates/devcontainers/node/Dockerfile": "FROM node:24\nRUN npm install -g yarn\n",
+    "templates/devcontainers/node/.zshrc": "export NODE_ENV=development\n",
+    "templates/devcontainers/rust/Dockerfile": "FROM rust:1\nRUN cargo install just\n",
+}
+
+
+def repository(root: Path) -> Repository:
+    repository = Repository(root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+@pytest.fixture
+def overlay(repo_root: Path, tmp_path: Path) -> Overlay:
+    user_root = tmp_path / "user"
+    write_files(user_root, USER_FILES)
+    return Overlay([repository(user_root), repository(repo_root)])
+
+
+async def all_pages(overlay: Overlay, query: str, **kwargs) -> list[dict]:
+    results, cursor = [], None
+    while True:
+        page = await overlay.search(query, cursor=cursor, **kwargs)
+        results += page["results"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return results
+
+
+def test_files_are_served_from_the_first_root_that_has_them(overlay: Overlay):
+    assert overlay.read_text("CLAUDE.md") == USER_FILES["CLAUDE.md"]
+    assert overlay.read_text("README.md").startswith("# Preferences")
+    assert overlay.locate("templates/devcontainers/node/Dockerfile")[0] is overlay.repositories[0]
+    assert overlay.locate("templates/devcontainers/node/devcontainer.json")[0] is overlay.repositories[1]
+    with pytest.raises(FileNotFoundError):
+        overlay.read_text("missing.md")
+
+
+def test_catalog_merges_templates_file_by_file(overlay: Overlay):
+    catalog = overlay.catalog
+
+    assert catalog.names == ["node", "node-postgres", "python-uv", "rust"]
+    assert catalog.devcontainer("node").file_names() == [".zshrc", "Dockerfile", "devcontainer.json"]
+    node_dockerfile = catalog.file("templates/devcontainers/node/Dockerfile")
+    assert node_dockerfile.size == len(USER_FILES["templates/devcontainers/node/Dockerfile"])
+    assert catalog.guides["CLAUDE.md"] is overlay.repositories[0].catalog.guides["CLAUDE.md"]
+    assert overlay.catalog is catalog
+
+
+def test_merged_catalog_follows_changes_in_any_root(overlay: Overlay, repo_root: Path):
+    before = overlay.catalog
+    write_files(repo_root, {"templates/devcontainers/go/devcontainer.json": '{"name": "go"}\n'})
+    overlay.repositories[1].tree.refresh("templates/devcontainers/go")
+
+    after = overlay.catalog
+    assert after is not before
+    assert "go" in after.names
+    assert after.generation == before.generation + 1
+
+
+@pytest.mark.asyncio
+async def test_search_leaves_out_shadowed_files(overlay: Overlay):
+    results = (await overlay.search("FROM node", limit=50))["results"]
+
+    assert [r["path"] for r in results] == ["templates/devcontainers/node/Dockerfile"]
+    assert results[0]["matches"][0]["snippet"] == "FROM node:24"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("order", ["path", "score"])
+async def test_cursor_pages_across_roots_cover_every_result_once(overlay: Overlay, order: str):
+    everything = (await overlay.search("e", order=order, limit=50))["results"]
+
+    paged = await all_pages(overlay, "e", order=order, limit=2)
+
+    assert len(everything) > 6
+    assert [r["path"] for r in paged] == [r["path"] for r in everything]
+    assert len({r["path"] for r in paged}) == len(paged)
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(overlay: Overlay):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        await overlay.search("e", cursor="abc")
+
+
+@pytest.mark.asyncio
+async def test_rank_prefers_the_file_as_served(overlay: Overlay):
+    results = (await overlay.rank("python poetry", limit=50))["results"]
+    paths = [r["path"] for r in results]
+
+    assert paths[0] == "CLAUDE.md"
+    assert len(paths) == len(set(paths))
+
+
+def test_single_root_is_served_as_is(repo_root: Path):
+    root = repository(repo_root)
+    overlay = Overlay([root])
+
+    assert overlay.catalog is root.catalog
+    with pytest.raises(ValueError):
+        Overlay([])
@@ -0,0 +1,98 @@
+"""Tests for the opt-in sampling profiler."""
+
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from fastmcp import Client
+
+from mcp_server.profiler import Profile, Profiler, collapse
+from mcp_server.server import create_server
+
+
+def busy_for(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profiling_is_off_by_default(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("PROFILING", raising=False)
+    monkeypatch.delenv("PROFILE_SAMPLE_RATE", raising=False)
+    assert Profiler.from_env() is None
+
+    monkeypatch.setenv("PROFILING", "on")
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "2")
+    profiler = Profiler.from_env()
+    assert (profiler.sample_rate, profiler.interval) == (0.0, 0.002)
+
+    with pytest.raises(ValueError):
+        Profiler(sample_rate=1.5)
+
+
+def test_running_request_is_sampled():
+    profiler = Profiler(interval=0.001)
+
+    profile = profiler.start(("tool", "search_preferences"))
+    busy_for(0.1)
+    profiler.stop(profile)
+
+    assert profile.seconds >= 0.1
+    assert any("test_profiler.py:busy_for" in stack for stack in profile.stacks)
+    assert profiler.profiles("search_preferences") == [profile]
+    assert profiler.profiles("other") == []
+    assert profiler.stats()["active"] == 0
+    # The sampling thread exits once nothing is being profiled.
+    time.sleep(0.05)
+    assert profiler._thread is None
+
+
+def test_collapse_merges_profiles_most_frequent_first():
+    first = Profile(1, ("tool", "a"), 0.0)
+    first.stacks.update({"main;f": 2, "main;g": 1})
+    second = Profile(2, ("tool", "a"), 0.0)
+    second.stacks.update({"main;g": 3})
+
+    assert collapse([first, second]) == "main;g 4\nmain;f 2\n"
+
+
+@pytest.fixture
+def profiler() -> Profiler:
+    return Profiler(sample_rate=1.0, interval=0.001)
+
+
+@pytest.fixture
+def server(repo_root: Path, profiler: Profiler, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return create_server(repo_root, profiler)
+
+
+@pytest.mark.asyncio
+async def test_get_profile_reports_sampled_requests(server, profiler: Profiler):
+    async with Client(server) as client:
+        await client.call_tool("search_preferences", {"query": "python"})
+        result = (await client.call_tool("get_profile", {"handler": "search_preferences", "clear": True})).data
+
+    [summary] = result["profiles"]
+    assert (summary["kind"], summary["handler"]) == ("tool", "search_preferences")
+    assert summary["seconds"] > 0
+    # Only the get_profile call itself, which finished after clearing, is left.
+    assert [p.handler for p in profiler.profiles()] == [("tool", "get_profile")]
+
+
+@pytest.mark.asyncio
+async def test_profile_route_requires_the_admin_token(server, profiler: Profiler):
+    profile = profiler.start(("tool", "search_preferences"))
+    profile.stacks["main;search"] += 3
+    profiler.stop(profile)
+    transport = httpx.ASGITransport(app=server.http_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        denied = await http.get("/admin/profile", headers={"Authorization": "Bearer wrong"})
+        collapsed = await http.get("/admin/profile", headers={"Authorization": "Bearer secret"})
+        listed = await http.get("/admin/profile?format=json&id=x", headers={"Authorization": "Bearer secret"})
+
+    assert denied.status_code == 403
+    assert "main;search 3\n" in collapsed.text
+    assert listed.status_code == 400
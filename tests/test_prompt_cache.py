@@ -0,0 +1,118 @@
+"""Tests for section-aware guide rendering and its memo."""
+
+import pytest
+
+from mcp_server.prompt_cache import PromptCache, condense, parse_guide, split_sections
+
+
+GUIDE = """# Style
+
+Write clearly.
+
+## General
+
+Wrap lines at 120 characters.
+
+## Python
+
+Use type hints.
+
+```python
+def f(x: int) -> int:
+    return x
+```
+
+## TypeScript
+
+### Formatting
+
+Use prettier.
+
+### Imports
+
+```ts
+import x from "y";
+```
+
+## Rust
+
+Run clippy.
+"""
+
+
+def test_sections_split_at_level_2_and_3_headings():
+    sections = split_sections(GUIDE)
+
+    assert [titles for titles, _ in sections] == [
+        (), ("General",), ("Python",), ("TypeScript",), ("TypeScript", "Formatting"), ("TypeScript", "Imports"),
+        ("Rust",),
+    ]
+    assert "".join(text for _, text in sections) == GUIDE
+
+
+def test_headings_in_code_blocks_do_not_split():
+    text = "## Shell\n\n```sh\n## not a heading\n```\n"
+    assert split_sections(text) == [(("Shell",), text)]
+
+
+def test_condense_drops_code_examples_but_not_code_only_sections():
+    python = split_sections(GUIDE)[2][1]
+    imports = split_sections(GUIDE)[5][1]
+
+    assert condense(python) == "## Python\n\nUse type hints.\n\n"
+    assert condense(imports) == imports
+
+
+@pytest.mark.parametrize("language, titles", [
+    ("python", [(), ("General",), ("Python",)]),
+    ("ts", [(), ("General",), ("TypeScript",), ("TypeScript", "Formatting"), ("TypeScript", "Imports")]),
+    ("cobol", [(), ("General",)]),
+])
+def test_select_keeps_general_and_matching_sections(language: str, titles: list):
+    guide = parse_guide("STYLE.md", GUIDE)
+    assert [s.titles for s in guide.select(language)] == titles
+    assert guide.select(language) is guide.select(language)
+
+
+def test_unchanged_sections_are_reused_after_an_edit():
+    old = parse_guide("STYLE.md", GUIDE)
+    new = parse_guide("STYLE.md", GUIDE.replace("Run clippy.", "Run clippy and rustfmt."), old)
+
+    assert new.digest != old.digest
+    assert all(a is b for a, b in zip(new.sections[:-1], old.sections[:-1]))
+    assert new.sections[-1] is not old.sections[-1]
+
+
+def test_renderings_are_memoized_by_section():
+    cache = PromptCache()
+    old = cache.parse("STYLE.md", GUIDE)
+    first = cache.render_guide(old, "<", ">", "preferences://guide/style", "python")
+    assert cache.render_guide(old, "<", ">", "preferences://guide/style", "python") is first
+    assert cache.stats()["hits"] == 1
+
+    # An edit to a section the rendering does not include keeps it valid.
+    new = cache.parse("STYLE.md", GUIDE.replace("Run clippy.", "Run clippy and rustfmt."))
+    assert cache.guide("STYLE.md", new.digest) is new
+    assert cache.guide("STYLE.md", old.digest) is None
+    assert cache.render_guide(new, "<", ">", "preferences://guide/style", "python") is first
+    assert cache.stats()["renders"] == 1
+
+
+def test_over_budget_prompts_are_condensed_then_cut():
+    cache = PromptCache()
+    guide = cache.parse("STYLE.md", GUIDE)
+    full = cache.render_guide(guide, "", "", "preferences://guide/style")
+
+    condensed = cache.render_guide(guide, "", "", "preferences://guide/style", max_tokens=len(full) // 4 - 5)
+    assert "def f" not in condensed
+    assert "Use type hints." in condensed
+    assert "Run clippy." in condensed
+
+    cut = cache.render_guide(guide, "", "", "preferences://guide/style", max_tokens=50)
+    assert len(cut.encode()) <= 50 * 4
+    assert cut.startswith("# Style\n\nWrite clearly.")
+    assert "(Left out to fit the budget: TypeScript; Rust." in cut
+    assert "Read preferences://guide/style for them." in cut
+
+    with pytest.raises(ValueError):
+        cache.render_guide(guide, "", "", "preferences://guide/style", max_tokens=0)
@@ -0,0 +1,45 @@
+"""Tests for the guide prompts."""
+
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+
+from mcp_server.server import create_server
+
+
+@pytest.fixture
+def server(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    return create_server(repo_root)
+
+
+async def style_prompt(server) -> str:
+    async with Client(server) as client:
+        result = await client.get_prompt("coding_style_guidelines")
+    return result.messages[0].content.text
+
+
+@pytest.mark.asyncio
+async def test_style_prompt_renders_the_guide(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    (repo_root / "STYLE.md").write_text("# Style\n\nWrap lines at 120 characters.\n")
+    monkeypatch.setenv("WATCHER", "off")
+
+    text = await style_prompt(create_server(repo_root))
+
+    assert "Wrap lines at 120 characters." in text
+
+
+@pytest.mark.asyncio
+async def test_missing_style_guide_falls_back_to_defaults(server):
+    assert (await style_prompt(server)).startswith("Style guidelines not found.")
+
+
+@pytest.mark.asyncio
+async def test_binary_style_guide_is_treated_as_missing(repo_root: Path, monkeypatch: pytest.MonkeyPatch):
+    (repo_root / "STYLE.md").write_bytes(b"\xff\xfe# Style\x00\x81\n")
+    monkeypatch.setenv("WATCHER", "off")
+
+    text = await style_prompt(create_server(repo_root))
+
+    assert text.startswith("Style guidelines not found.")
@@ -0,0 +1,84 @@
+"""Tests for recording request traffic to a trace file and replaying it."""
+
+import json
+from pathlib import Path
+
+import pytest
+from fastmcp import Client
+
+from benchmarks.replay import load_trace, replay
+from mcp_server.recorder import TrafficRecorder
+from mcp_server.server import create_server
+
+
+def read_trace(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_trace_is_written_out_when_the_server_stops(repo_root: Path, tmp_path: Path,
+                                                          monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    trace = tmp_path / "trace.jsonl"
+    recorder = TrafficRecorder(trace)
+    server = create_server(repo_root, recorder=recorder)
+
+    async with Client(server) as client:
+        await client.read_resource("preferences://guide/claude")
+        await client.call_tool("list_devcontainer_files", {"name": "node"})
+        # Buffered until the flush interval passes or the server stops.
+        assert trace.read_text() == ""
+
+    records = read_trace(trace)
+    assert [(r["kind"], r["session"]) for r in records] == [("resource", 1), ("tool", 1)]
+    assert records[0]["name"] == "preferences://guide/claude"
+    assert records[1]["name"] == "list_devcontainer_files"
+    assert recorder._file is None
+
+
+@pytest.mark.asyncio
+async def test_restarted_server_appends_to_the_trace(repo_root: Path, tmp_path: Path,
+                                                     monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    trace = tmp_path / "trace.jsonl"
+    server = create_server(repo_root, recorder=TrafficRecorder(trace))
+
+    for _ in range(2):
+        async with Client(server) as client:
+            await client.read_resource("preferences://guide/claude")
+
+    assert len(read_trace(trace)) == 2
+
+
+def test_load_trace_orders_records_and_rejects_other_lines(tmp_path: Path):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text(
+        '{"t": 2.0, "kind": "tool", "name": "search_preferences"}\n\n'
+        '{"t": 1.0, "kind": "resource", "name": "preferences://catalog"}\n'
+    )
+    assert [record["t"] for record in load_trace(trace)] == [1.0, 2.0]
+
+    trace.write_text('{"t": 1.0, "kind": "tool", "name": "a"}\n{"t": "soon", "kind": "tool"}\n')
+    with pytest.raises(ValueError, match=":2: not a request record"):
+        load_trace(trace)
+
+
+@pytest.mark.asyncio
+async def test_recorded_trace_replays_against_a_server(repo_root: Path, tmp_path: Path,
+                                                       monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("WATCHER", "off")
+    trace = tmp_path / "trace.jsonl"
+    server = create_server(repo_root, recorder=TrafficRecorder(trace))
+    async with Client(server) as client:
+        await client.read_resource("preferences://devcontainer/node/dockerfile")
+        await client.call_tool("search_preferences", {"query": "python"})
+        await client.get_prompt("coding_style_guidelines")
+
+    rows, summary = await replay(create_server(repo_root), load_trace(trace), rate=0, concurrency=2)
+
+    assert summary["requests"] == 3
+    assert summary["errors"] == 0
+    assert [row["operation"] for row in rows] == [
+        "preferences://devcontainer/{name}/{file}", "prompt:coding_style_guidelines", "search_preferences",
+    ]
+    assert all(row["count"] == 1 and row["recorded_p50_ms"] > 0 for row in rows)
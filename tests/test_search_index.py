@@ -0,0 +1,158 @@
+"""Tests for the trigram search index, its pagination and the regular expression guards."""
+
+import time
+from pathlib import Path
+
+import pytest
+import regex
+
+from mcp_server.search_index import (
+    MAX_REGEX_LENGTH, Document, TrigramIndex, _scan, build_search_index, compile_matcher, document_for_path, trigrams
+)
+
+
+@pytest.fixture
+def index(repo_root: Path) -> TrigramIndex:
+    paths = [path.relative_to(repo_root).as_posix() for path in repo_root.rglob("*") if path.is_file()]
+    return build_search_index(repo_root, paths)
+
+
+def collect_pages(index: TrigramIndex, query: str, **kwargs) -> tuple[list[str], int]:
+    """Follow next_cursor through every page and return the result paths and page count."""
+    paths, pages, cursor = [], 0, None
+    while True:
+        page = index.search(query, cursor=cursor, **kwargs)
+        paths.extend(result["path"] for result in page["results"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return paths, pages
+
+
+def brute_force(repo_root: Path, query: str) -> list[str]:
+    """Return the searchable paths whose contents contain the query, ignoring case."""
+    return sorted(
+        rel_path for rel_path in (path.relative_to(repo_root).as_posix() for path in repo_root.rglob("*"))
+        if document_for_path(rel_path) is not None and query.lower() in (repo_root / rel_path).read_text().lower()
+    )
+
+
+def test_trigrams_are_lowercase():
+    assert trigrams("FROM") == {"fro", "rom"}
+    assert trigrams("ab") == set()
+
+
+@pytest.mark.parametrize("rel_path, document", [
+    ("CLAUDE.md", Document("CLAUDE.md", "guide", "CLAUDE.md")),
+    ("templates/devcontainers/node/Dockerfile",
+     Document("templates/devcontainers/node/Dockerfile", "devcontainer", "node")),
+    ("templates/devcontainers/.hidden/Dockerfile", None),
+    ("templates/devcontainers/Dockerfile", None),
+    ("notes.txt", None),
+])
+def test_document_for_path(rel_path: str, document):
+    assert document_for_path(rel_path) == document
+
+
+@pytest.mark.parametrize("query", ["python", "PNPM", "name", "FROM node", "postgres:16", "missing"])
+def test_search_matches_a_full_scan(index: TrigramIndex, repo_root: Path, query: str):
+    results = index.search(query, limit=100)["results"]
+    assert [result["path"] for result in results] == brute_force(repo_root, query)
+
+
+def test_candidates_contain_every_trigram(index: TrigramIndex):
+    assert [d.path for d in index.candidates("pnpm")] == ["templates/devcontainers/node/Dockerfile"]
+    assert len(index.candidates("py")) == len(index)
+
+
+def test_results_carry_lines_and_spans(index: TrigramIndex):
+    [result] = index.search("pnpm")["results"]
+    assert result["name"] == "node"
+    assert result["matches"] == [{"line": 2, "snippet": "RUN npm install -g pnpm", "spans": [[19, 23]]}]
+
+
+def test_category_filters_results(index: TrigramIndex):
+    for category in ("guide", "devcontainer"):
+        results = index.search("python", category=category, limit=100)["results"]
+        assert {result["type"] for result in results} == {category}
+
+
+def test_reindexing_replaces_and_removing_drops_a_document(index: TrigramIndex):
+    document = document_for_path("CLAUDE.md")
+    index.add(document, "# Guide\n\nPrefer poetry now.\n")
+
+    assert [d.path for d in index.candidates("poetry")] == ["CLAUDE.md"]
+    assert "CLAUDE.md" not in [d.path for d in index.candidates("uv for")]
+
+    index.remove("CLAUDE.md")
+    assert index.candidates("poetry") == []
+    assert "CLAUDE.md" not in [d.path for d in index.candidates("gu")]
+
+
+@pytest.mark.parametrize("order", ["path", "score"])
+def test_cursor_pages_cover_all_results_once(index: TrigramIndex, order: str):
+    everything = [result["path"] for result in index.search("o", order=order, limit=100)["results"]]
+    paths, pages = collect_pages(index, "o", order=order, limit=2)
+
+    assert len(everything) > 4
+    assert paths == everything
+    assert pages == (len(everything) + 1) // 2
+
+
+def test_path_order_returns_sorted_paths(index: TrigramIndex):
+    paths, _ = collect_pages(index, "o", limit=3)
+    assert paths == sorted(paths)
+
+
+def test_score_order_ranks_by_match_count(index: TrigramIndex):
+    scores = [result["score"] for result in index.search("o", order="score", limit=100)["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_last_page_has_no_cursor(index: TrigramIndex):
+    page = index.search("pnpm", limit=10)
+    assert [result["path"] for result in page["results"]] == ["templates/devcontainers/node/Dockerfile"]
+    assert page["next_cursor"] is None
+    assert not page["timed_out"]
+
+
+@pytest.mark.parametrize("cursor", ["abc", "", "eyJvZmZzZXQiOjB9"])
+def test_invalid_cursor_is_rejected(index: TrigramIndex, cursor: str):
+    # The last cursor is valid base64 JSON, but for the score order.
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        index.search("o", cursor=cursor)
+
+
+def test_exhausted_budget_marks_page_timed_out(index: TrigramIndex):
+    page = index.search("o", time_budget=0)
+    assert page["timed_out"]
+    assert page["next_cursor"] is not None
+
+
+@pytest.mark.parametrize("query", [
+    "(a+)+", "(\\w+\\s?)*$", "(a|b*)+", "(a|a)+b", "(.|.)+QQQ", "(a|ab)+", "(x|)*y", "((a|b)|a)+",
+    "x" * (MAX_REGEX_LENGTH + 1),
+])
+def test_dangerous_regexes_are_rejected(query: str):
+    with pytest.raises(ValueError):
+        compile_matcher(query, "regex")
+
+
+@pytest.mark.parametrize("query", [
+    "FROM\\s+\\S+", "(ab{2})+", "(node|python)+", "\\d{3}-\\d+", "(\\w|\\d)+x", "(?:[a-c]x|[d-f]y)+",
+])
+def test_safe_regexes_are_accepted(query: str):
+    compile_matcher(query, "regex")
+
+
+def test_regex_matching_stops_at_the_deadline():
+    matcher = compile_matcher("a", "regex")
+    # An expression the guard would reject, to exercise the timeout itself.
+    matcher.pattern = regex.compile("(a|a)+b")
+    start = time.monotonic()
+
+    score, matches, cut = _scan("a" * 40 + "\n", matcher, start + 0.2)
+
+    assert cut
+    assert (score, matches) == (0, [])
+    assert time.monotonic() - start < 1
@@ -0,0 +1,108 @@
+"""Tests for BM25 ranking and related-document search."""
+
+import math
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from mcp_server import similarity
+from mcp_server.search_index import document_for_path
+from mcp_server.similarity import B, K1, SimilarityIndex, build_similarity_index, tokenize
+
+
+@pytest.fixture(params=["python", "numpy"])
+def scoring(request, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Run a test with the pure-Python scoring and, if installed, with NumPy."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(similarity, "_numpy", lambda: None)
+    return request.param
+
+
+@pytest.fixture
+def index(repo_root: Path, scoring: str) -> SimilarityIndex:
+    paths = [path.relative_to(repo_root).as_posix() for path in repo_root.rglob("*") if path.is_file()]
+    return build_similarity_index(repo_root, paths)
+
+
+def reference_scores(repo_root: Path, query: str) -> dict[str, float]:
+    """Score every searchable file with the textbook BM25 formula."""
+    documents = {}
+    for path in repo_root.rglob("*"):
+        rel_path = path.relative_to(repo_root).as_posix()
+        if path.is_file() and document_for_path(rel_path) is not None:
+            documents[rel_path] = Counter(tokenize(path.read_text()) + tokenize(rel_path))
+    average = sum(sum(counts.values()) for counts in documents.values()) / len(documents)
+    scores = {}
+    for rel_path, counts in documents.items():
+        score = 0.0
+        for term in set(tokenize(query)):
+            frequency = sum(term in other for other in documents.values())
+            if not counts[term]:
+                continue
+            idf = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+            norm = K1 * (1 - B + B * sum(counts.values()) / average)
+            score += idf * counts[term] * (K1 + 1) / (counts[term] + norm)
+        if score > 0:
+            scores[rel_path] = score
+    return scores
+
+
+def test_tokenize_keeps_words_of_two_or_more_characters():
+    assert tokenize("FROM node:22 -- a RUN npm") == ["from", "node", "22", "run", "npm"]
+
+
+@pytest.mark.parametrize("query", ["python uv", "node pnpm install", "postgres"])
+def test_rank_matches_the_bm25_formula(index: SimilarityIndex, repo_root: Path, query: str):
+    expected = reference_scores(repo_root, query)
+
+    results = index.rank(query, limit=50)["results"]
+
+    assert {r["path"] for r in results} == set(expected)
+    for result in results:
+        assert result["score"] == pytest.approx(expected[result["path"]], abs=1e-3)
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_rank_filters_by_category_and_reports_known_terms(index: SimilarityIndex):
+    page = index.rank("python unknownword", category="guide")
+
+    assert page["terms"] == ["python"]
+    assert {r["type"] for r in page["results"]} == {"guide"}
+
+
+@pytest.mark.parametrize("query, limit", [("python", 0), ("python", similarity.MAX_RANK_LIMIT + 1), ("a !", 5)])
+def test_invalid_queries_are_rejected(index: SimilarityIndex, query: str, limit: int):
+    with pytest.raises(ValueError):
+        index.rank(query, limit=limit)
+
+
+def test_related_documents_rank_copies_first(index: SimilarityIndex, repo_root: Path):
+    copy = "templates/devcontainers/node-copy/Dockerfile"
+    index.add(document_for_path(copy), (repo_root / "templates/devcontainers/node/Dockerfile").read_text())
+
+    page = index.related("templates/devcontainers/node/Dockerfile")
+
+    paths = [r["path"] for r in page["results"]]
+    assert "templates/devcontainers/node/Dockerfile" not in paths
+    assert paths[0] == copy
+    assert page["results"][0]["similarity"] == pytest.approx(1, abs=0.05)
+    assert all(0 < r["similarity"] <= 1.05 for r in page["results"])
+    with pytest.raises(KeyError):
+        index.related("missing.md")
+
+
+def test_incremental_updates_match_a_fresh_build(index: SimilarityIndex, repo_root: Path):
+    guide = document_for_path("CLAUDE.md")
+    index.add(guide, "# Guide\n\nPrefer poetry for python projects.\n")
+    index.remove("templates/devcontainers/node/Dockerfile")
+    (repo_root / "CLAUDE.md").write_text("# Guide\n\nPrefer poetry for python projects.\n")
+    (repo_root / "templates/devcontainers/node/Dockerfile").unlink()
+    paths = [path.relative_to(repo_root).as_posix() for path in repo_root.rglob("*") if path.is_file()]
+    fresh = build_similarity_index(repo_root, paths)
+
+    for query in ("python poetry", "node", "pnpm"):
+        assert index.rank(query, limit=50) == fresh.rank(query, limit=50)
+    assert index.stats()["documents"] == fresh.stats()["documents"] == len(paths)
@@ -0,0 +1,91 @@
+"""Tests for reusing and invalidating startup snapshots."""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from mcp_server.cache import cache_for
+from mcp_server.repository import Repository
+from mcp_server.snapshot import SNAPSHOT_VERSION, load_snapshot, write_snapshot
+
+
+DOCKERFILE = "templates/devcontainers/node/Dockerfile"
+
+
+@pytest.fixture
+def snapshot_path(repo_root: Path, tmp_path: Path) -> Path:
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    path = tmp_path / "snapshot.json.gz"
+    write_snapshot(repository, path)
+    return path
+
+
+def restart(repo_root: Path, snapshot_path: Path) -> Repository:
+    """Warm up a new repository from the snapshot, as a restarted server would."""
+    cache_for(repo_root).clear()
+    repository = Repository(repo_root)
+    repository.snapshot_path = snapshot_path
+    repository.warm_up()
+    return repository
+
+
+def fresh(repo_root: Path) -> Repository:
+    """Warm up a new repository without a snapshot."""
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+def test_unchanged_tree_is_served_from_snapshot(repo_root: Path, snapshot_path: Path):
+    repository = restart(repo_root, snapshot_path)
+    assert repository.snapshot_loaded
+    assert repository.catalog.tree_hash == fresh(repo_root).catalog.tree_hash
+
+
+def test_added_modified_and_deleted_files_are_picked_up(repo_root: Path, snapshot_path: Path):
+    (repo_root / DOCKERFILE).write_text("FROM node:24\n")
+    (repo_root / "templates/devcontainers/python-uv/Dockerfile").unlink()
+    (repo_root / "templates/devcontainers/python-uv/notes.txt").write_text("giraffe\n")
+
+    repository = restart(repo_root, snapshot_path)
+
+    assert repository.snapshot_loaded
+    assert repository.catalog.tree_hash == fresh(repo_root).catalog.tree_hash
+    assert [r["path"] for r in repository.search_index.search("node:24")["results"]] == [DOCKERFILE]
+    assert repository.search_index.search("pip install uv")["results"] == []
+    assert len(repository.search_index.search("giraffe")["results"]) == 1
+
+
+def test_rewrite_with_same_size_and_mtime_is_detected(repo_root: Path, snapshot_path: Path):
+    path = repo_root / DOCKERFILE
+    st = path.stat()
+    path.write_text(path.read_text().replace("pnpm", "yarn"))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert path.stat().st_size == st.st_size
+
+    repository = restart(repo_root, snapshot_path)
+
+    assert repository.catalog.file(DOCKERFILE).sha256 == fresh(repo_root).catalog.file(DOCKERFILE).sha256
+    assert len(repository.search_index.search("yarn")["results"]) == 1
+    assert repository.search_index.search("pnpm")["results"] == []
+
+
+def test_snapshot_of_another_root_is_ignored(repo_root: Path, snapshot_path: Path, tmp_path: Path):
+    assert load_snapshot(snapshot_path, repo_root) is not None
+    assert load_snapshot(snapshot_path, tmp_path) is None
+
+
+def test_snapshot_of_another_version_is_ignored(repo_root: Path, snapshot_path: Path):
+    with gzip.open(snapshot_path, "rb") as f:
+        state = json.loads(f.read())
+    state["version"] = SNAPSHOT_VERSION - 1
+    with gzip.open(snapshot_path, "wb") as f:
+        f.write(json.dumps(state).encode())
+
+    assert load_snapshot(snapshot_path, repo_root) is None
+    assert not restart(repo_root, snapshot_path).snapshot_loaded
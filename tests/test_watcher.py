@@ -0,0 +1,191 @@
+"""Tests for applying batches of filesystem changes to the repository."""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from conftest import write_files
+from mcp_server.repository import FileChange, Repository
+from mcp_server.watcher import InotifyWatcher, PollingWatcher
+
+
+@pytest.fixture
+def repository(repo_root: Path) -> Repository:
+    repository = Repository(repo_root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+def record_batches(repository: Repository) -> list[list[FileChange]]:
+    batches = []
+    repository.tree.subscribe(batches.append)
+    return batches
+
+
+def full_build(root: Path) -> Repository:
+    repository = Repository(root)
+    repository.snapshot_path = None
+    repository.warm_up()
+    return repository
+
+
+def test_batch_notifies_listeners_once(repository: Repository, repo_root: Path):
+    batches = record_batches(repository)
+    generation = repository.catalog.generation
+    write_files(repo_root, {
+        "templates/devcontainers/node/Dockerfile": "FROM node:24\n",
+        "templates/devcontainers/go/devcontainer.json": '{"name": "go"}\n',
+    })
+    (repo_root / "templates/devcontainers/python-uv/Dockerfile").unlink()
+
+    changes = repository.tree.refresh_many([
+        "templates/devcontainers/node/Dockerfile",
+        "templates/devcontainers/go",
+        "templates/devcontainers/python-uv/Dockerfile",
+    ])
+
+    assert batches == [changes]
+    assert set(changes) == {
+        FileChange("modified", "templates/devcontainers/node/Dockerfile"),
+        FileChange("added", "templates/devcontainers/go/devcontainer.json"),
+        FileChange("deleted", "templates/devcontainers/python-uv/Dockerfile"),
+    }
+    assert repository.catalog.generation == generation + 1
+
+
+def test_batch_updates_catalog_like_a_full_build(repository: Repository, repo_root: Path):
+    write_files(repo_root, {
+        "templates/devcontainers/node/Dockerfile": "FROM node:24\n",
+        "templates/devcontainers/go/devcontainer.json": '{"name": "go"}\n',
+        "README.md": "# Preferences\n",
+    })
+    for path in (repo_root / "templates/devcontainers/node-postgres").iterdir():
+        path.unlink()
+    (repo_root / "templates/devcontainers/node-postgres").rmdir()
+
+    repository.tree.refresh_many([
+        "README.md",
+        "templates/devcontainers/go",
+        "templates/devcontainers/node/Dockerfile",
+        "templates/devcontainers/node-postgres",
+    ])
+
+    catalog = repository.catalog
+    assert list(catalog.devcontainers) == ["go", "node", "python-uv"]
+    assert catalog.tree_hash == full_build(repo_root).catalog.tree_hash
+    assert [r["path"] for r in repository.search_index.search("node:24")["results"]] == [
+        "templates/devcontainers/node/Dockerfile"
+    ]
+
+
+def test_paths_under_a_rescanned_directory_are_read_once(repository: Repository, repo_root: Path):
+    batches = record_batches(repository)
+    write_files(repo_root, {
+        "templates/devcontainers/go/devcontainer.json": '{"name": "go"}\n',
+        "templates/devcontainers/go/Dockerfile": "FROM golang:1.23\n",
+    })
+
+    changes = repository.tree.refresh_many([
+        "templates/devcontainers/go/Dockerfile",
+        "templates/devcontainers/go",
+        "templates/devcontainers/go/devcontainer.json",
+    ])
+
+    assert len(batches) == 1
+    assert sorted(changes) == [
+        FileChange("added", "templates/devcontainers/go/Dockerfile"),
+        FileChange("added", "templates/devcontainers/go/devcontainer.json"),
+    ]
+
+
+def test_unchanged_paths_notify_nobody(repository: Repository):
+    batches = record_batches(repository)
+    generation = repository.catalog.generation
+
+    assert repository.tree.refresh_many(["README.md", "templates/devcontainers/node"]) == []
+    assert batches == []
+    assert repository.catalog.generation == generation
+
+
+def test_inotify_watcher_applies_a_burst_as_few_batches(repository: Repository, repo_root: Path):
+    try:
+        inotify = InotifyWatcher(repository.tree)
+    except OSError:
+        pytest.skip("inotify is not available")
+    batches = record_batches(repository)
+    inotify.start()
+    try:
+        write_files(repo_root, {f"templates/devcontainers/burst/file{i}.txt": f"{i}\n" for i in range(50)})
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            entry = repository.catalog.devcontainer("burst")
+            if entry is not None and len(entry.files) == 50:
+                break
+            time.sleep(0.02)
+    finally:
+        inotify.stop()
+
+    assert len(repository.catalog.devcontainer("burst").files) == 50
+    assert sum(len(batch) for batch in batches) == 50
+    assert len(batches) < 10
+
+
+def test_failing_listener_does_not_stop_the_others(repository: Repository, repo_root: Path, caplog):
+    def fail(changes):
+        raise RuntimeError("listener failed")
+
+    repository.tree.subscribe(fail)
+    batches = record_batches(repository)
+    write_files(repo_root, {"templates/devcontainers/node/Dockerfile": "FROM node:24\n"})
+
+    changes = repository.tree.refresh_many(["templates/devcontainers/node/Dockerfile"])
+
+    assert batches == [changes]
+    assert "listener failed" in caplog.text
+
+
+def wait_for_devcontainer(repository: Repository, name: str) -> bool:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if repository.catalog.devcontainer(name) is not None:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_watchers_survive_a_failing_batch(repository: Repository, repo_root: Path, monkeypatch, caplog):
+    try:
+        watchers = [InotifyWatcher(repository.tree)]
+    except OSError:
+        watchers = []
+    watchers.append(PollingWatcher(repository.tree, interval=0.05))
+
+    for index, watcher in enumerate(watchers):
+        failures = []
+        refresh, refresh_many = repository.tree.refresh, repository.tree.refresh_many
+
+        def fail_once(apply):
+            def wrapper(*args):
+                if not failures:
+                    failures.append(args)
+                    raise RuntimeError("batch failed")
+                return apply(*args)
+            return wrapper
+
+        monkeypatch.setattr(repository.tree, "refresh", fail_once(refresh))
+        monkeypatch.setattr(repository.tree, "refresh_many", fail_once(refresh_many))
+        watcher.start()
+        try:
+            write_files(repo_root, {f"templates/devcontainers/first{index}/Dockerfile": "FROM debian\n"})
+            deadline = time.monotonic() + 5
+            while not failures and time.monotonic() < deadline:
+                time.sleep(0.02)
+            write_files(repo_root, {f"templates/devcontainers/second{index}/Dockerfile": "FROM debian\n"})
+            assert wait_for_devcontainer(repository, f"second{index}")
+            assert watcher._thread.is_alive()
+        finally:
+            watcher.stop()
+            monkeypatch.undo()
+        assert "batch failed" in caplog.text